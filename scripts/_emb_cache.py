@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Disk-backed query embedding cache for benchmark scripts.
+Repeated benchmark runs (ef_search / blend sweeps) re-encode the same query
+strings against an unchanged model — this keeps (model, query) -> vector
+in a small SQLite file so only the first run pays for encoding.
+
+Usage:
+    from _emb_cache import install_query_cache
+    install_query_cache()   # before calling search_with_activation
+"""
+import os
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+EMB_CACHE_PATH = os.getenv("EMB_CACHE_PATH", "/app/data/query_emb_cache.db")
+EMB_CACHE_SIZE = int(os.getenv("EMB_CACHE_SIZE", "1024"))  # in-memory LRU entries
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU in front of a SQLite table keyed on (model, query)."""
+
+    def __init__(self, path=EMB_CACHE_PATH, model_id=None, maxsize=EMB_CACHE_SIZE):
+        self.model_id = model_id or os.getenv(
+            "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+        )
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb_cache ("
+            "model TEXT, q TEXT, v BLOB, PRIMARY KEY (model, q))"
+        )
+        # Vectors from another model are useless — drop them on open
+        self.conn.execute("DELETE FROM emb_cache WHERE model != ?", (self.model_id,))
+        self.conn.commit()
+
+    def get(self, query):
+        if query in self._lru:
+            self._lru.move_to_end(query)
+            self.hits += 1
+            return self._lru[query]
+        row = self.conn.execute(
+            "SELECT v FROM emb_cache WHERE model = ? AND q = ?", (self.model_id, query)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        vec = np.frombuffer(row[0], dtype=np.float32).reshape(1, -1)
+        self._remember(query, vec)
+        return vec
+
+    def put(self, query, vec):
+        vec = np.ascontiguousarray(vec, dtype=np.float32).reshape(1, -1)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO emb_cache (model, q, v) VALUES (?, ?, ?)",
+            (self.model_id, query, vec.tobytes())
+        )
+        self.conn.commit()
+        self._remember(query, vec)
+        return vec
+
+    def _remember(self, query, vec):
+        self._lru[query] = vec
+        self._lru.move_to_end(query)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def close(self):
+        self.conn.close()
+
+
+def install_query_cache(path=EMB_CACHE_PATH):
+    """
+    Wrap the shared embedding model's encode() so single-string queries
+    are served from the cache. Batch calls (lists) pass straight through.
+    Returns the cache so callers can report hits/misses.
+    """
+    from stable_embeddings import get_model
+
+    model = get_model()
+    if getattr(model, "_query_cache", None) is not None:
+        return model._query_cache
+
+    cache = QueryEmbeddingCache(path)
+    encode = model.encode
+
+    def cached_encode(sentences):
+        if not isinstance(sentences, str):
+            return encode(sentences)
+        vec = cache.get(sentences)
+        if vec is None:
+            vec = cache.put(sentences, encode(sentences))
+        return vec
+
+    model.encode = cached_encode
+    model._query_cache = cache
+    return cache
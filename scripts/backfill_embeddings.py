@@ -16,9 +16,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 sys.path.insert(0, '/app')  # Docker path
 
 import sqlite3
-import numpy as np
 import json
 from stable_embeddings import StableEmbeddingModel
+from database import unit_embedding
 
 DB_PATH = os.getenv('DB_PATH', '/app/data/memory.db')
 
@@ -46,7 +46,7 @@ def backfill():
     for i, (note_id, content) in enumerate(missing):
         try:
             embedding = model.encode(content)
-            blob = np.array(embedding, dtype=np.float32).tobytes()
+            blob = unit_embedding(embedding).tobytes()
             cursor.execute('UPDATE nodes SET embedding = ? WHERE id = ?', (blob, note_id))
             success += 1
             
@@ -7,6 +7,7 @@ Run inside Docker: docker exec hippograph python3 /app/src/benchmark_search.py
 import sys
 sys.path.insert(0, '/app/src')
 from graph_engine import search_with_activation
+from _emb_cache import install_query_cache
 
 # (query, expected_note_ids_in_top5)
 BENCHMARKS = [
@@ -23,6 +24,7 @@ BENCHMARKS = [
 ]
 
 def run_benchmark():
+    emb_cache = install_query_cache()
     total_p5 = 0
     total_top1 = 0
     
@@ -47,6 +49,7 @@ def run_benchmark():
     print(f"\n{'='*50}")
     print(f"P@5:   {p5_avg:.0%}  ({int(total_p5)}/{n} queries)")
     print(f"Top-1: {top1_avg:.0%}  ({total_top1}/{n} queries)")
+    print(f"Query embedding cache: {emb_cache.hits} hits, {emb_cache.misses} misses")
     print(f"{'='*50}")
     return p5_avg, top1_avg
 
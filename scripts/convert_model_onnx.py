@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Export the embedding model to ONNX and quantize it to int8 (dynamic, AVX512-VNNI).
+The result is picked up by stable_embeddings when EMBED_BACKEND=onnx_int8.
+
+Requires: pip install "optimum[onnxruntime]"
+Usage: docker exec hippograph python3 /app/scripts/convert_model_onnx.py [output_dir]
+
+⚠️  int8 vectors differ slightly from fp32 ones — re-run
+    regenerate_all_embeddings.py after switching backends.
+"""
+import os
+import sys
+
+from transformers import AutoTokenizer
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+OUTPUT_DIR = os.getenv("EMBED_ONNX_PATH", "/app/data/onnx_int8")
+
+
+def main(output_dir):
+    fp32_dir = output_dir.rstrip("/") + "_fp32"
+    trust_remote = os.getenv("TRUST_REMOTE_CODE", "false").lower() == "true"
+
+    print(f"📦 Exporting {MODEL_NAME} to ONNX → {fp32_dir}")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, trust_remote_code=trust_remote)
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        MODEL_NAME, export=True, trust_remote_code=trust_remote
+    )
+    model.save_pretrained(fp32_dir)
+    tokenizer.save_pretrained(fp32_dir)
+
+    print(f"🔢 Quantizing to int8 (dynamic, avx512_vnni) → {output_dir}")
+    quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    tokenizer.save_pretrained(output_dir)
+
+    print(f"\n✅ Done. Enable with: EMBED_BACKEND=onnx_int8 EMBED_ONNX_PATH={output_dir}")
+    print("⚠️  Regenerate embeddings and restart container to rebuild ANN index!")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR)
@@ -1,7 +1,26 @@
 #!/usr/bin/env python3
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# (path keyword, skill-name keyword, category) — first match wins
+CATEGORY_RULES = (
+    ("security", "audit", "security-critical"),
+    ("android", "mobile", "development"),
+    ("anthropic", "mcp", "ml-architecture"),
+)
+
+def detect_category(path_lower, skill_name):
+    for path_kw, name_kw, category in CATEGORY_RULES:
+        if path_kw in path_lower or name_kw in skill_name:
+            return category
+    return "development"
+
 def parse_skill_md(path):
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
@@ -11,14 +30,7 @@ def parse_skill_md(path):
     
     skill_name = path.parent.name
     
-    if "security" in str(path).lower() or "audit" in skill_name:
-        category = "security-critical"
-    elif "android" in str(path).lower() or "mobile" in skill_name:
-        category = "development"
-    elif "anthropic" in str(path).lower() or "mcp" in skill_name:
-        category = "ml-architecture"
-    else:
-        category = "development"
+    category = detect_category(str(path).lower(), skill_name)
     
     # Extract first meaningful paragraph
     lines = [l.strip() for l in content.split("\n") if l.strip()]
@@ -44,16 +56,21 @@ skill_files = list(skills_dir.rglob("SKILL.md"))
 
 print(f"Found {len(skill_files)} skills")
 
+# File reads dominate, so overlap them on a thread pool; map() keeps input order
 skills = []
-for path in skill_files:
-    skill = parse_skill_md(path)
+with ThreadPoolExecutor(max_workers=32) as ex:
+    parsed = list(ex.map(parse_skill_md, skill_files))
+for skill in parsed:
     if skill:
         skills.append(skill)
         name = skill["name"]
         print(f"  ✓ {name}")
 
 output = skills_dir / "all_skills.json"
-with open(output, "w") as f:
-    json.dump(skills, f, indent=2)
+if orjson is not None:
+    output.write_bytes(orjson.dumps(skills, option=orjson.OPT_INDENT_2))
+else:
+    with open(output, "w") as f:
+        json.dump(skills, f, indent=2)
 
 print(f"\n✅ Saved {len(skills)} skills to all_skills.json")
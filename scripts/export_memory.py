@@ -10,6 +10,23 @@ import sys
 import os
 from datetime import datetime
 
+try:
+    import orjson  # optional: ~5-10x faster serialization for large exports
+except ImportError:
+    orjson = None
+
+FETCH_BATCH = 2000
+
+
+def fetch_dicts(conn, query):
+    """Run query and collect rows as dicts, materializing FETCH_BATCH rows per driver call"""
+    cur = conn.execute(query)
+    cur.arraysize = FETCH_BATCH
+    rows = []
+    while batch := cur.fetchmany():
+        rows.extend(dict(r) for r in batch)
+    return rows
+
 
 def export_database(db_path, output_path=None):
     """Export complete database to JSON"""
@@ -29,32 +46,24 @@ def export_database(db_path, output_path=None):
     
     # Export nodes (without embeddings)
     print("   Loading nodes...")
-    nodes = []
-    for row in conn.execute("""
+    nodes = fetch_dicts(conn, """
         SELECT id, content, category, timestamp, importance,
                emotional_tone, emotional_intensity, emotional_reflection,
                last_accessed, access_count
         FROM nodes ORDER BY id
-    """):
-        nodes.append(dict(row))
+    """)
     
     # Export edges
     print("   Loading edges...")
-    edges = []
-    for row in conn.execute("SELECT * FROM edges ORDER BY source_id, target_id"):
-        edges.append(dict(row))
+    edges = fetch_dicts(conn, "SELECT * FROM edges ORDER BY source_id, target_id")
     
     # Export entities
     print("   Loading entities...")
-    entities = []
-    for row in conn.execute("SELECT * FROM entities ORDER BY id"):
-        entities.append(dict(row))
+    entities = fetch_dicts(conn, "SELECT * FROM entities ORDER BY id")
     
     # Export node_entities
     print("   Loading relationships...")
-    node_entities = []
-    for row in conn.execute("SELECT * FROM node_entities"):
-        node_entities.append(dict(row))
+    node_entities = fetch_dicts(conn, "SELECT * FROM node_entities")
     
     conn.close()
     
@@ -76,8 +85,12 @@ def export_database(db_path, output_path=None):
     
     # Write JSON
     print(f"   Writing to: {output_path}")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(export_data, f, indent=2, ensure_ascii=False)
     
     file_size = os.path.getsize(output_path)
     
@@ -6,6 +6,7 @@ Edge Pruning - OPTIONAL Enterprise Feature
    Weak connections may become important as your memory grows
 """
 import sqlite3, sys
+import numpy as np
 
 def analyze(db):
     conn = sqlite3.connect(db)
@@ -13,16 +14,24 @@ def analyze(db):
     sem = conn.execute('SELECT COUNT(*) FROM edges WHERE edge_type="semantic"').fetchone()[0]
     ent = total - sem
     
-    weights = sorted([r[0] for r in conn.execute('SELECT weight FROM edges WHERE edge_type="semantic"')])
+    # Single scan into a float array; sorted once so every threshold is a binary search
+    weights = np.fromiter(
+        (r[0] for r in conn.execute('SELECT weight FROM edges WHERE edge_type="semantic"')),
+        dtype=np.float64
+    )
+    weights.sort()
     
     print(f'Total: {total:,} edges')
     print(f'  Semantic: {sem:,}\n  Entity: {ent:,}')
-    if weights:
-        print(f'\nSemantic weights: min={min(weights):.3f} median={weights[len(weights)//2]:.3f} max={max(weights):.3f}')
+    if weights.size:
+        median = weights[weights.size // 2]
+        print(f'\nSemantic weights: min={weights[0]:.3f} median={median:.3f} max={weights[-1]:.3f}')
         print('\nBelow threshold:')
-        for t in [0.50, 0.55, 0.60, 0.65]:
-            c = sum(1 for w in weights if w < t)
-            print(f'  <{t}: {c:,} ({c/len(weights)*100:.1f}%)')
+        thresholds = [0.50, 0.55, 0.60, 0.65]
+        counts = np.searchsorted(weights, thresholds, side='left')
+        for t, c in zip(thresholds, counts):
+            c = int(c)
+            print(f'  <{t}: {c:,} ({c/weights.size*100:.1f}%)')
     conn.close()
 
 def prune(db, threshold, confirm):
@@ -13,23 +13,43 @@ sys.path.insert(0, '/app/src')
 from entity_extractor import extract_entities, detect_language
 
 DB_PATH = os.getenv('DB_PATH', '/app/data/memory.db')
+FETCH_BATCH = 1000
+# Commit (and record progress) this often; everything in between is one transaction
+CHECKPOINT_EVERY = int(os.getenv('CHECKPOINT_EVERY', '5000'))
 
-def get_or_create_entity(cursor, name, entity_type):
-    """Get existing entity ID or create new one.
+
+def iter_rows(cursor):
+    """Yield rows from cursor, fetching cursor.arraysize rows per driver call."""
+    while batch := cursor.fetchmany():
+        yield from batch
+
+
+def load_entity_cache(cursor):
+    """Load the whole entities table as {name: id}.
     Note: entities table has UNIQUE on name only (not name+type).
     """
-    cursor.execute(
-        "SELECT id FROM entities WHERE name = ?",
-        (name,)
-    )
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-    cursor.execute(
-        "INSERT INTO entities (name, entity_type) VALUES (?, ?)",
-        (name, entity_type)
-    )
-    return cursor.lastrowid
+    cursor.execute("SELECT id, name FROM entities")
+    return {name: eid for eid, name in cursor.fetchall()}
+
+
+def resolve_entity_ids(cursor, entity_cache, entities):
+    """Map (name, type) pairs to entity ids, creating missing entities in one batch.
+    Returns (ids in input order, number of entities created).
+    """
+    pending = {}
+    for name, entity_type in entities:
+        if name not in entity_cache and name not in pending:
+            pending[name] = entity_type
+    if pending:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO entities (name, entity_type) VALUES (?, ?)",
+            list(pending.items())
+        )
+        names = list(pending)
+        placeholders = ','.join('?' * len(names))
+        cursor.execute(f"SELECT id, name FROM entities WHERE name IN ({placeholders})", names)
+        entity_cache.update({name: eid for eid, name in cursor.fetchall()})
+    return [entity_cache[name] for name, _ in entities], len(pending)
 
 
 def find_shared_entity_nodes(cursor, entity_id, exclude_node_id):
@@ -44,14 +64,23 @@ def find_shared_entity_nodes(cursor, entity_id, exclude_node_id):
 def main():
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     cursor = conn.cursor()
 
-    # Get all notes
-    cursor.execute("SELECT id, content FROM nodes ORDER BY id")
-    notes = cursor.fetchall()
-    total = len(notes)
+    # PRAGMA user_version holds the last checkpointed note id of an interrupted run
+    resume_after = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if resume_after:
+        print(f"Resuming after note #{resume_after} (checkpoint from interrupted run)")
+
+    # Stream all notes on a dedicated cursor (the main cursor is reused for writes)
+    total = cursor.execute("SELECT COUNT(*) FROM nodes WHERE id > ?", (resume_after,)).fetchone()[0]
+    note_cursor = conn.execute("SELECT id, content FROM nodes WHERE id > ? ORDER BY id", (resume_after,))
+    note_cursor.arraysize = FETCH_BATCH
     print(f"Processing {total} notes...")
 
+    conn.execute("BEGIN IMMEDIATE")
+    entity_cache = load_entity_cache(cursor)
+
     # Stats
     stats = {
         'processed': 0,
@@ -65,7 +94,7 @@ def main():
         'errors': 0,
     }
 
-    for i, (note_id, content) in enumerate(notes):
+    for i, (note_id, content) in enumerate(iter_rows(note_cursor)):
         try:
             lang = detect_language(content)
             if lang == 'ru':
@@ -91,8 +120,9 @@ def main():
             entities = extract_entities(content)
 
             # Step 4: Create node_entities and entity edges
-            for entity_text, entity_type in entities:
-                entity_id = get_or_create_entity(cursor, entity_text, entity_type)
+            entity_ids, created = resolve_entity_ids(cursor, entity_cache, entities)
+            stats['new_entities_created'] += created
+            for entity_id in entity_ids:
                 # Link node to entity
                 cursor.execute(
                     "INSERT OR IGNORE INTO node_entities (node_id, entity_id) VALUES (?, ?)",
@@ -132,13 +162,15 @@ def main():
             # Progress every 50 notes
             if (i + 1) % 50 == 0:
                 print(f"  [{i+1}/{total}] lang={lang} entities={len(entities)}")
-                conn.commit()
 
         except Exception as e:
             stats['errors'] += 1
             print(f"  ERROR note #{note_id}: {e}")
 
-    conn.commit()
+        if (i + 1) % CHECKPOINT_EVERY == 0:
+            conn.execute(f"PRAGMA user_version = {int(note_id)}")
+            conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
 
     # Clean up orphaned entities (entities with no node_entities links)
     cursor.execute("""
@@ -147,6 +179,8 @@ def main():
         )
     """)
     orphaned = cursor.rowcount
+    # Finished cleanly — clear the resume checkpoint
+    conn.execute("PRAGMA user_version = 0")
     conn.commit()
     conn.close()
 
@@ -158,6 +192,7 @@ def main():
     print(f"  Russian notes:        {stats['ru_notes']}")
     print(f"Old entity edges removed: {stats['old_entity_edges_removed']}")
     print(f"Old node_entities removed: {stats['old_node_entities_removed']}")
+    print(f"New entities created:      {stats['new_entities_created']}")
     print(f"New node_entities created: {stats['new_node_entities_created']}")
     print(f"New entity edges created:  {stats['new_entity_edges_created']}")
     print(f"Orphaned entities cleaned: {orphaned}")
@@ -25,7 +25,7 @@ def recompute_all():
     for i, node in enumerate(nodes):
         content = node["content"]
         embedding = model.encode(content)[0]
-        update_node(node["id"], embedding=embedding.tobytes())
+        update_node(node["id"], embedding=embedding)
         
         if (i + 1) % 10 == 0:
             print(f"   Processed {i + 1}/{len(nodes)}")
@@ -6,10 +6,10 @@ Usage: docker exec hippograph python3 /app/scripts/regenerate_all_embeddings.py
 import sqlite3
 import sys
 import os
-import numpy as np
 
 sys.path.insert(0, '/app/src')
 from stable_embeddings import get_model
+from database import unit_embedding
 
 DB_PATH = os.getenv('DB_PATH', '/app/data/memory.db')
 
@@ -30,10 +30,10 @@ def main():
     
     for i, node in enumerate(nodes):
         try:
-            emb = model.encode(node['content']).flatten()
+            emb = unit_embedding(model.encode(node['content']))
             cursor.execute(
                 "UPDATE nodes SET embedding = ? WHERE id = ?",
-                (emb.astype(np.float32).tobytes(), node['id'])
+                (emb.tobytes(), node['id'])
             )
             success += 1
             if (i + 1) % batch_size == 0:
@@ -2,6 +2,9 @@
 """
 ANN (Approximate Nearest Neighbor) Index using hnswlib
 Provides O(log n) similarity search with INCREMENTAL updates
+
+Optional backend: HNSW_BACKEND=faiss_ivfpq stores PQ codes instead of raw
+float32 vectors (~16x smaller) for collections that outgrow RAM with HNSW.
 """
 
 import numpy as np
@@ -17,6 +20,113 @@ HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
 HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "50"))
 MAX_ELEMENTS = int(os.getenv("HNSW_MAX_ELEMENTS", "50000"))
 
+# Index backend: hnswlib (default) or faiss_ivfpq (compressed, needs faiss-cpu)
+ANN_BACKEND = os.getenv("HNSW_BACKEND", "hnswlib").lower()
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "256"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))  # sub-quantizers; lowered to a divisor of dim
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_MIN_TRAIN = int(os.getenv("FAISS_MIN_TRAIN", str(FAISS_IVF_NLIST * 39)))
+
+# Cosine is served by an inner-product index over vectors we L2-normalize
+# ourselves: one vectorized pass over the whole matrix at build time instead of
+# hnswlib normalizing every vector on insert. Distances are identical (1 - cos).
+_INDEX_SPACE = "ip" if HNSW_SPACE == "cosine" else HNSW_SPACE
+
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    """L2-normalize rows of a float32 matrix in place. Zero rows are left as-is."""
+    norms = np.einsum("ij,ij->i", mat, mat)
+    np.sqrt(norms, out=norms)
+    norms[norms == 0] = 1.0
+    mat /= norms[:, None]
+    return mat
+
+
+class FaissIVFPQIndex:
+    """
+    faiss IVF-PQ index behind the subset of the hnswlib.Index API used here
+    (add_items, knn_query, get_current_count, save_index, load_index, get_ids_list).
+
+    IVF-PQ needs training data, so vectors start in an exact flat index; once
+    FAISS_MIN_TRAIN vectors are present the coarse quantizer and PQ codebooks
+    are trained on them and everything moves into the compressed index.
+    Distances follow hnswlib conventions: 1 - dot for ip, squared L2 for l2.
+    """
+
+    def __init__(self, space: str, dim: int):
+        import faiss
+        self._faiss = faiss
+        self.space = space
+        self.dim = dim
+        self.metric = faiss.METRIC_L2 if space == "l2" else faiss.METRIC_INNER_PRODUCT
+        self.index = faiss.IndexIDMap2(faiss.IndexFlat(dim, self.metric))
+        self.is_trained = False
+        self._ids: List[int] = []
+        self.pq_m = max(m for m in range(1, min(FAISS_PQ_M, dim) + 1) if dim % m == 0)
+
+    def _train(self, vectors: np.ndarray, ids: np.ndarray):
+        faiss = self._faiss
+        quantizer = faiss.IndexFlat(self.dim, self.metric)
+        ivfpq = faiss.IndexIVFPQ(quantizer, self.dim, FAISS_IVF_NLIST,
+                                 self.pq_m, FAISS_PQ_NBITS, self.metric)
+        ivfpq.train(vectors)
+        ivfpq.add_with_ids(vectors, ids)
+        ivfpq.nprobe = FAISS_NPROBE
+        self.index = ivfpq
+        self.is_trained = True
+        print(f"✅ Trained faiss IVF{FAISS_IVF_NLIST},PQ{self.pq_m}x{FAISS_PQ_NBITS} on {len(ids)} vectors")
+
+    def add_items(self, data, ids):
+        data = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, self.dim)
+        new_ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        # hnswlib replaces an existing label in place; keep the last vector for
+        # ids repeated in this batch and drop stored copies before re-adding.
+        _, last = np.unique(new_ids[::-1], return_index=True)
+        if len(last) < len(new_ids):
+            keep = np.sort(len(new_ids) - 1 - last)
+            data, new_ids = data[keep], new_ids[keep]
+        present = new_ids[np.isin(new_ids, np.asarray(self._ids, dtype=np.int64))]
+        if len(present):
+            self.index.remove_ids(present)
+            stale = set(present.tolist())
+            self._ids = [i for i in self._ids if i not in stale]
+        if not self.is_trained and self.index.ntotal + len(new_ids) >= FAISS_MIN_TRAIN:
+            all_data, all_ids = data, new_ids
+            if self.index.ntotal:
+                flat = self.index.index.reconstruct_n(0, self.index.ntotal)
+                all_data = np.vstack([flat, data])
+                all_ids = np.concatenate([self._faiss.vector_to_array(self.index.id_map), new_ids])
+            self._train(all_data, all_ids)
+        else:
+            self.index.add_with_ids(data, new_ids)
+        self._ids.extend(new_ids.tolist())
+
+    def knn_query(self, data, k=1):
+        data = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, self.dim)
+        scores, labels = self.index.search(data, k)
+        if self.metric == self._faiss.METRIC_INNER_PRODUCT:
+            return labels, 1.0 - scores
+        return labels, scores
+
+    def get_current_count(self) -> int:
+        return int(self.index.ntotal)
+
+    def get_ids_list(self) -> List[int]:
+        return list(self._ids)
+
+    def save_index(self, path: str):
+        self._faiss.write_index(self.index, path)
+        np.save(path + ".ids.npy", np.asarray(self._ids, dtype=np.int64))
+
+    def load_index(self, path: str, max_elements: int = 0):
+        self.index = self._faiss.read_index(path)
+        self.is_trained = not isinstance(self.index, self._faiss.IndexIDMap2)
+        if self.is_trained:
+            self.index.nprobe = FAISS_NPROBE
+        ids_path = path + ".ids.npy"
+        self._ids = np.load(ids_path).tolist() if os.path.exists(ids_path) else []
+
 
 class ANNIndex:
     """hnswlib-based ANN index for fast similarity search with incremental updates."""
@@ -29,11 +139,22 @@ class ANNIndex:
         self.node_ids = []
         self.enabled = USE_ANN_INDEX
         
+        self.backend = "hnswlib"
+        
         if not self.enabled:
             print("ℹ️  ANN indexing disabled (USE_ANN_INDEX=false)")
             return
         
-        self.index = hnswlib.Index(space=HNSW_SPACE, dim=dimension)
+        if ANN_BACKEND == "faiss_ivfpq":
+            try:
+                self.index = FaissIVFPQIndex(space=_INDEX_SPACE, dim=dimension)
+                self.backend = "faiss_ivfpq"
+                print(f"✅ Created faiss IVF-PQ {HNSW_SPACE.upper()} index (nlist={FAISS_IVF_NLIST}, m={self.index.pq_m}, nprobe={FAISS_NPROBE}, dim={dimension})")
+                return
+            except ImportError as e:
+                print(f"⚠️  faiss unavailable ({e}), falling back to hnswlib")
+        
+        self.index = hnswlib.Index(space=_INDEX_SPACE, dim=dimension)
         self.index.init_index(
             max_elements=MAX_ELEMENTS,
             ef_construction=HNSW_EF_CONSTRUCTION,
@@ -71,6 +192,8 @@ class ANNIndex:
             return 0
         
         embeddings_matrix = np.array(embeddings, dtype=np.float32)
+        if HNSW_SPACE == "cosine":
+            _normalize_rows(embeddings_matrix)
         self.index.add_items(embeddings_matrix, node_ids)
         self.node_ids = node_ids
         
@@ -97,7 +220,9 @@ class ANNIndex:
             except Exception:
                 return False
 
-        embedding_2d = emb_flat.reshape(1, -1)
+        embedding_2d = np.array(emb_flat, dtype=np.float32).reshape(1, -1)
+        if HNSW_SPACE == "cosine":
+            _normalize_rows(embedding_2d)
         try:
             self.index.add_items(embedding_2d, [node_id])
             self.node_ids.append(node_id)
@@ -109,32 +234,44 @@ class ANNIndex:
     def search(self, query_embedding: np.ndarray, k: int = 10, 
                min_similarity: float = 0.3) -> List[Tuple[int, float]]:
         """Search for k nearest neighbors."""
+        results = self.search_batch(np.asarray(query_embedding).reshape(1, -1), k, min_similarity)
+        return results[0] if results else []
+    
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 10,
+                     min_similarity: float = 0.3) -> List[List[Tuple[int, float]]]:
+        """
+        Search k nearest neighbors for every row of an (m, D) query matrix
+        with a single knn_query call (one index.search for faiss, one
+        multi-threaded pass for hnswlib). Returns one result list per row,
+        or [] on failure / empty index.
+        """
         if not self.enabled or self.index is None or len(self.node_ids) == 0:
             return []
         
-        if query_embedding.ndim == 1:
-            query_embedding = query_embedding.reshape(1, -1)
+        queries = np.array(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if len(queries) == 0:
+            return []
+        if HNSW_SPACE == "cosine":
+            _normalize_rows(queries)
         
         try:
             actual_k = min(k, self.index.get_current_count())
             if actual_k == 0:
                 return []
-            labels, distances = self.index.knn_query(query_embedding, k=actual_k)
+            labels, distances = self.index.knn_query(queries, k=actual_k)
             
-            results = []
-            for label, dist in zip(labels[0], distances[0]):
-                if label == -1:
-                    continue
-                
-                if HNSW_SPACE == "cosine" or HNSW_SPACE == "ip":
-                    similarity = 1.0 - dist
-                else:
-                    similarity = 1.0 / (1.0 + dist)
-                
-                if similarity >= min_similarity:
-                    results.append((int(label), float(similarity)))
+            if HNSW_SPACE == "cosine" or HNSW_SPACE == "ip":
+                similarities = 1.0 - distances
+            else:
+                similarities = 1.0 / (1.0 + distances)
+            keep = (labels != -1) & (similarities >= min_similarity)
             
-            return results
+            return [
+                [(int(label), float(sim)) for label, sim in zip(row_labels[row_keep], row_sims[row_keep])]
+                for row_labels, row_sims, row_keep in zip(labels, similarities, keep)
+            ]
         except Exception as e:
             print(f"⚠️  Search failed: {e}")
             return []
@@ -161,7 +298,21 @@ class ANNIndex:
         """Get index statistics."""
         if not self.enabled or self.index is None:
             return {"enabled": False}
+        if self.backend == "faiss_ivfpq":
+            return {
+                "enabled": True,
+                "backend": self.backend,
+                "space": HNSW_SPACE,
+                "dimension": self.dimension,
+                "vectors": len(self.node_ids),
+                "trained": self.index.is_trained,
+                "nlist": FAISS_IVF_NLIST,
+                "pq_m": self.index.pq_m,
+                "pq_nbits": FAISS_PQ_NBITS,
+                "nprobe": FAISS_NPROBE
+            }
         return {
+            "backend": self.backend,
             "enabled": True,
             "space": HNSW_SPACE,
             "dimension": self.dimension,
@@ -206,6 +357,7 @@ def fix_dimension_mismatch(db_path: str = None) -> int:
     """
     import sqlite3
     from stable_embeddings import get_model
+    from database import unit_embedding, mark_embeddings_changed
 
     ann_index = get_ann_index()
     expected_dim = ann_index.dimension
@@ -238,7 +390,7 @@ def fix_dimension_mismatch(db_path: str = None) -> int:
         for node_id, content in to_fix:
             try:
                 new_emb = model.encode(content)[0]
-                conn.execute("UPDATE nodes SET embedding=? WHERE id=?", (new_emb.tobytes(), node_id))
+                conn.execute("UPDATE nodes SET embedding=? WHERE id=?", (unit_embedding(new_emb).tobytes(), node_id))
                 # Add to live index
                 ann_index.add_vector(node_id, new_emb)
                 fixed += 1
@@ -250,6 +402,7 @@ def fix_dimension_mismatch(db_path: str = None) -> int:
         conn.close()
 
         if fixed:
+            mark_embeddings_changed()
             print(f"✅ fix_dimension_mismatch: repaired {fixed} nodes")
 
     except Exception as e:
@@ -7,58 +7,530 @@ SQLite with graph schema: nodes, edges, entities
 import sqlite3
 import os
 import json
+import atexit
+import queue
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime
 from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import numpy as np
 
 DB_PATH = os.getenv("DB_PATH", "/app/data/memory.db")
 ENABLE_EMOTIONAL_MEMORY = os.getenv("ENABLE_EMOTIONAL_MEMORY", "false").lower() == "true"
 
+# Connection pools: connections are opened and configured once and reused,
+# instead of connect()/close() on every call.
+#   read_connection()  - read-only connections (mode=ro), many concurrent readers
+#   write_connection() - the single writer, BEGIN IMMEDIATE per outermost block
+#   get_connection()   - general read/write pool for callers outside this module
+# WAL allows many readers next to exactly one writer, so readers never queue
+# behind writes. If a pool is empty (e.g. nested calls) an extra connection is
+# opened and closed on return, so readers never block on the pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(os.cpu_count() or 4)))
+# Per-connection prepared statement cache (sqlite3 default is 128). Pooled
+# connections live for the whole process, so hot queries are parsed once.
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "512"))
 
-@contextmanager
-def get_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH, timeout=30)
+# Hot-path SQL, kept as module constants so every call passes the same string
+# and hits the connection's statement cache.
+# Local-time ISO timestamp computed by SQLite, same layout as
+# datetime.now().isoformat() (millisecond precision). Used on hot write paths
+# so they don't build a datetime per row in Python.
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+SQL_GET_NODE = "SELECT * FROM nodes WHERE id = ?"
+SQL_TOUCH_NODE = f"UPDATE nodes SET last_accessed = {SQL_NOW}, access_count = access_count + ? WHERE id = ?"
+# Two index-anchored halves instead of an OR join (which scans edges);
+# UNION keeps the DISTINCT semantics of the original query. Only the small
+# columns get_node_graph shows are selected - the rows live in the neighbour
+# LRU, and embedding BLOBs there would be dead weight.
+SQL_CONNECTED_NODES = """SELECT n.id, n.content, n.category, n.importance, e.weight, e.edge_type
+               FROM edges e JOIN nodes n ON n.id = e.target_id
+               WHERE e.source_id = ? AND e.target_id != ?
+               UNION
+               SELECT n.id, n.content, n.category, n.importance, e.weight, e.edge_type
+               FROM edges e JOIN nodes n ON n.id = e.source_id
+               WHERE e.target_id = ? AND e.source_id != ?"""
+SQL_ENTITY_BY_LOWER_NAME = "SELECT id FROM entities WHERE LOWER(name) = ? AND entity_type = ?"
+SQL_LINK_NODE_ENTITY = ("INSERT INTO node_entities (node_id, entity_id) VALUES (?, ?) "
+                        "ON CONFLICT DO NOTHING RETURNING 1")
+# The ring slot follows the per-note seq counter, never created_at: wall-clock
+# timestamps can step backwards (DST, NTP) and would pick the wrong newest row.
+# (WHERE true keeps the upsert clause from parsing as a join constraint.)
+SQL_SAVE_NOTE_VERSION = """
+            INSERT INTO note_versions 
+            (note_id, seq, version_number, content, category, importance, 
+             emotional_tone, emotional_intensity, emotional_reflection, created_at)
+            SELECT ?, next.seq, (next.seq - 1) % ? + 1, ?, ?, ?, ?, ?, ?, ?
+            FROM (SELECT COALESCE(MAX(seq), 0) + 1 AS seq FROM note_versions WHERE note_id = ?) AS next
+            WHERE true
+            ON CONFLICT(note_id, version_number) DO UPDATE SET
+                seq = excluded.seq, content = excluded.content, category = excluded.category,
+                importance = excluded.importance, emotional_tone = excluded.emotional_tone,
+                emotional_intensity = excluded.emotional_intensity,
+                emotional_reflection = excluded.emotional_reflection,
+                created_at = excluded.created_at
+            RETURNING version_number"""
+SQL_INSERT_NODE = """INSERT INTO nodes (content, category, timestamp, embedding, last_accessed, access_count, 
+               importance, emotional_tone, emotional_intensity, emotional_reflection,
+               t_event_start, t_event_end, temporal_expressions, tags) 
+               VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)"""
+# Upsert keeps the higher weight of an existing edge - one statement, no
+# IntegrityError round-trip on the duplicate path.
+SQL_UPSERT_EDGE_BULK = f"""INSERT INTO edges (source_id, target_id, weight, edge_type, created_at)
+               VALUES (?, ?, ?, ?, {SQL_NOW})
+               ON CONFLICT(source_id, target_id, edge_type)
+               DO UPDATE SET weight = MAX(weight, excluded.weight)"""
+SQL_UPSERT_EDGE = SQL_UPSERT_EDGE_BULK + " RETURNING id"
+SQL_LINK_NODE_ENTITY_BULK = ("INSERT INTO node_entities (node_id, entity_id) VALUES (?, ?) "
+                             "ON CONFLICT DO NOTHING")
+
+
+def _open_connection(readonly=False):
+    """Open and configure a new connection to DB_PATH (PRAGMAs run once per connection)"""
+    if readonly:
+        uri = "file:" + pathname2url(os.path.abspath(DB_PATH)) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False,
+                               cached_statements=DB_CACHED_STATEMENTS)
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False,
+                               cached_statements=DB_CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA journal_mode = WAL")
+    if not readonly:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")  # WAL-safe: no fsync per COMMIT
+        conn.execute("PRAGMA wal_autocheckpoint = 1000")
     conn.execute("PRAGMA busy_timeout = 10000")
-    conn.execute("PRAGMA wal_autocheckpoint = 1000")
+    conn.execute("PRAGMA cache_size = -20000")  # ~20 MB page cache (default 2 MB)
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB memory-mapped reads
+    return conn
+
+
+class _ConnectionPool:
+    """Non-blocking LIFO pool of connections to one database path"""
+
+    def __init__(self, path, size, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.closed = False
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _open_connection(self.readonly)
+
+    def release(self, conn):
+        if self.closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+# Single writer connection; re-entrant within the owning thread so helpers
+# called from a write block join the caller's transaction.
+_writer = None
+_writer_path = None
+_writer_depth = 0
+_writer_lock = threading.RLock()
+
+
+def _get_pool(kind, size, readonly=False):
+    """Return the pool for the current DB_PATH, replacing it if DB_PATH changed"""
+    pool = _pools.get(kind)
+    if pool is None or pool.path != DB_PATH:
+        with _pool_lock:
+            pool = _pools.get(kind)
+            if pool is None or pool.path != DB_PATH:
+                if pool is not None:
+                    pool.close()
+                pool = _ConnectionPool(DB_PATH, size, readonly)
+                _pools[kind] = pool
+    return pool
+
+
+def close_connections():
+    """Close all idle pooled connections and the writer (shutdown / tests)"""
+    global _writer, _writer_path
+    _flush_touches_on_timer()
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+    with _writer_lock:
+        if _writer is not None and _writer_depth == 0:
+            _writer.close()
+            _writer = None
+            _writer_path = None
+
+
+# get_stats() result cache. Any commit that changed rows through this module's
+# connections sets the dirty flag; get_stats recomputes only when it is set.
+# Writes through other connections (sleep_compute, maintenance scripts) show
+# up after the next in-process write or an invalidate_caches() call.
+_stats_cache = {}
+_stats_dirty = threading.Event()
+_stats_dirty.set()
+_stats_lock = threading.Lock()
+# Bumped by the same commits; keys get_entity_counts_batch()'s cache
+_write_generation = 0
+_entity_counts_cache = {}
+_entity_counts_lock = threading.Lock()
+
+
+# One-hop neighbourhood cache for get_connected_nodes(): LRU keyed on node_id,
+# with a reverse index (member node_id -> keys whose result contains it) so a
+# change to any node or edge drops every list it appears in. Writes through
+# write_connection() invalidate precisely at commit; unknown writes through
+# get_connection() clear the whole cache.
+NEIGHBOR_CACHE_SIZE = int(os.getenv("NEIGHBOR_CACHE_SIZE", "4096"))  # 0 = disabled
+_neighbors_cache = OrderedDict()   # node_id -> (rows, member_ids)
+_neighbors_rev = {}                # member node_id -> set of cached node_ids
+_neighbors_lock = threading.Lock()
+_neighbors_generation = 0          # bumped on invalidation; stale fills are dropped
+_neighbors_pending = set()         # node ids to invalidate at the writer's commit
+_neighbors_path = None             # DB_PATH the cached lists belong to
+
+
+def _neighbors_drop(key):
+    entry = _neighbors_cache.pop(key, None)
+    if entry is None:
+        return
+    for member in entry[1]:
+        keys = _neighbors_rev.get(member)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _neighbors_rev[member]
+
+
+def _neighbors_invalidate(node_ids):
+    """Drop cached neighbour lists of node_ids and every list containing them"""
+    global _neighbors_generation
+    with _neighbors_lock:
+        _neighbors_generation += 1
+        for nid in node_ids:
+            _neighbors_drop(nid)
+            for key in list(_neighbors_rev.get(nid, ())):
+                _neighbors_drop(key)
+
+
+def _neighbors_clear():
+    global _neighbors_generation
+    with _neighbors_lock:
+        _neighbors_generation += 1
+        _neighbors_cache.clear()
+        _neighbors_rev.clear()
+
+
+def _neighbors_touched(*node_ids):
+    """Record node ids changed by the current write; invalidated at commit"""
+    with _neighbors_lock:
+        _neighbors_pending.update(node_ids)
+
+
+def _neighbors_flush_pending():
+    with _neighbors_lock:
+        pending = list(_neighbors_pending)
+        _neighbors_pending.clear()
+    if pending:
+        _neighbors_invalidate(pending)
+
+
+# Stored-embedding version for in-memory embedding matrices (graph_engine).
+# Inserts/deletes show up in COUNT(*)/MAX(id); in-place embedding rewrites
+# bump _embeddings_generation at commit (or via mark_embeddings_changed()).
+_embeddings_generation = 0
+_embeddings_pending = False
+
+
+def mark_embeddings_changed():
+    """Signal that stored embeddings were rewritten outside update_node()"""
+    global _embeddings_generation
+    _embeddings_generation += 1
+
+
+def _embeddings_flush_pending():
+    global _embeddings_pending
+    if _embeddings_pending:
+        _embeddings_pending = False
+        mark_embeddings_changed()
+
+
+def get_embeddings_version():
+    """Cheap token that changes whenever the stored embeddings may have changed"""
+    with read_connection() as conn:
+        count, max_id = conn.execute("SELECT COUNT(*), MAX(id) FROM nodes").fetchone()
+    return (DB_PATH, count, max_id, _embeddings_generation)
+
+
+def _after_commit(conn, changes_before):
+    """Invalidate result caches if the committed transaction changed rows"""
+    global _write_generation
+    if conn.total_changes != changes_before:
+        _stats_dirty.set()
+        _write_generation += 1
+
+
+def invalidate_caches():
+    """Drop every read cache (neighbour lists, get_stats, entity counts,
+    entity ids) after writes made through connections other than this
+    module's, e.g. sleep_compute's raw sqlite3 connections in this process.
+    """
+    global _write_generation
+    _neighbors_clear()
+    _stats_dirty.set()
+    _write_generation += 1
+    with _entity_cache_lock:
+        _entity_cache.clear()
+
+
+@contextmanager
+def _reuse_or(conn, factory):
+    """Yield the caller's open connection, or open one from factory.
+    Lets dependent helpers run inside the caller's transaction.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        with factory() as opened:
+            yield opened
+
+
+@contextmanager
+def get_connection():
+    """Context manager for database connections (pooled, read/write)"""
+    pool = _get_pool("rw", DB_POOL_SIZE)
+    conn = pool.acquire()
+    changes_before = conn.total_changes
     try:
         yield conn
         conn.commit()
+        if conn.total_changes != changes_before:
+            _neighbors_clear()
+        _after_commit(conn, changes_before)
     except Exception:
         conn.rollback()
         raise
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def read_connection():
+    """Context manager for read-only queries (pooled, mode=ro)"""
+    pool = _get_pool("ro", DB_READ_POOL_SIZE, readonly=True)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        pool.release(conn)
+
+
+@contextmanager
+def write_connection():
+    """Context manager for writes through the single writer connection.
+    The outermost block runs BEGIN IMMEDIATE ... COMMIT; nested blocks in the
+    same thread share that transaction.
+    """
+    global _writer, _writer_path, _writer_depth
+    with _writer_lock:
+        if _writer_depth == 0 and (_writer is None or _writer_path != DB_PATH):
+            if _writer is not None:
+                _writer.close()
+            _writer = _open_connection()
+            _writer_path = DB_PATH
+        conn = _writer
+        outermost = _writer_depth == 0
+        if outermost:
+            conn.execute("BEGIN IMMEDIATE")
+            changes_before = conn.total_changes
+        _writer_depth += 1
+        try:
+            yield conn
+            if outermost:
+                conn.commit()
+                _after_commit(conn, changes_before)
+        except Exception:
+            if outermost:
+                conn.rollback()
+            raise
+        finally:
+            _writer_depth -= 1
+            if outermost:
+                _neighbors_flush_pending()
+                _embeddings_flush_pending()
+
+
+# Physical column order of nodes: small scalars first, short TEXT next, then the
+# large content TEXT and the embedding BLOB last. SQLite decodes a record in
+# column order, so reading importance/access_count never walks overflow pages.
+NODES_COLUMNS = (
+    ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("category", "TEXT DEFAULT 'general'"),
+    ("importance", "TEXT DEFAULT 'normal'"),
+    ("access_count", "INTEGER DEFAULT 0"),
+    ("emotional_intensity", "INTEGER DEFAULT 5"),
+    ("timestamp", "TEXT"),
+    ("last_accessed", "TEXT"),
+    ("t_event_start", "TEXT"),
+    ("t_event_end", "TEXT"),
+    ("emotional_tone", "TEXT"),
+    ("tags", "TEXT"),
+    ("emotional_reflection", "TEXT"),
+    ("temporal_expressions", "TEXT"),
+    ("content", "TEXT NOT NULL"),
+    ("embedding", "BLOB"),
+)
+
+
+def _nodes_ddl(table):
+    cols = ",\n".join(f"                {name} {decl}" for name, decl in NODES_COLUMNS)
+    return f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+{cols}
+            )
+        """
+
+
+def _migrate_nodes_column_order():
+    """Rebuild nodes in NODES_COLUMNS order (databases created before the reorder)"""
+    wanted = [name for name, _ in NODES_COLUMNS]
+    conn = _open_connection()
+    try:
+        current = [row[1] for row in conn.execute("PRAGMA table_info(nodes)")]
+        if current == wanted:
+            return
+        if set(current) != set(wanted):
+            print(f"⚠️  nodes has unexpected columns, column reorder skipped: {sorted(set(current) ^ set(wanted))}")
+            return
+        cols = ", ".join(wanted)
+        # DROP TABLE nodes must not cascade into edges/node_entities.
+        # foreign_keys can only be switched outside a transaction.
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS nodes_reordered")
+            conn.execute(_nodes_ddl("nodes_reordered"))
+            seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'nodes'").fetchone()
+            conn.execute(f"INSERT INTO nodes_reordered ({cols}) SELECT {cols} FROM nodes")
+            conn.execute("DROP TABLE nodes")
+            conn.execute("ALTER TABLE nodes_reordered RENAME TO nodes")
+            if seq:
+                # Keep AUTOINCREMENT from reusing ids of deleted notes
+                conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'nodes'", (seq[0],))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print("  ↳ Reordered nodes columns (embedding BLOB last)")
     finally:
         conn.close()
 
 
+NOTE_VERSIONS_KEEP = 5
+
+_NOTE_VERSIONS_DDL = """
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                note_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                version_number INTEGER NOT NULL,
+                content TEXT,
+                category TEXT,
+                importance TEXT,
+                emotional_tone TEXT,
+                emotional_intensity INTEGER,
+                emotional_reflection TEXT,
+                created_at TEXT,
+                UNIQUE(note_id, version_number)
+            )
+        """
+
+
+def _migrate_note_versions_ring():
+    """Renumber old monotonically numbered versions into ring slots and add UNIQUE(note_id, version_number)"""
+    with write_connection() as conn:
+        for index in conn.execute("PRAGMA index_list(note_versions)").fetchall():
+            if index["unique"]:
+                cols = [c["name"] for c in conn.execute(f"PRAGMA index_info({index['name']})")]
+                if cols == ["note_id", "version_number"]:
+                    _migrate_note_versions_seq(conn)
+                    return
+        conn.execute("DROP TABLE IF EXISTS note_versions_ring")
+        conn.execute(_NOTE_VERSIONS_DDL.format(table="note_versions_ring"))
+        # Keep the newest NOTE_VERSIONS_KEEP per note, renumbered 1..k oldest first,
+        # so the ring continues at slot k+1
+        conn.execute("""
+            INSERT INTO note_versions_ring
+                (note_id, seq, version_number, content, category, importance,
+                 emotional_tone, emotional_intensity, emotional_reflection, created_at)
+            SELECT note_id,
+                   ROW_NUMBER() OVER (PARTITION BY note_id ORDER BY version_number),
+                   ROW_NUMBER() OVER (PARTITION BY note_id ORDER BY version_number),
+                   content, category, importance,
+                   emotional_tone, emotional_intensity, emotional_reflection, created_at
+            FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY note_id ORDER BY version_number DESC) AS rn
+                  FROM note_versions)
+            WHERE rn <= ?
+        """, (NOTE_VERSIONS_KEEP,))
+        conn.execute("DROP TABLE note_versions")
+        conn.execute("ALTER TABLE note_versions_ring RENAME TO note_versions")
+    print("  ↳ Converted note_versions to ring slots")
+
+
+def _migrate_note_versions_seq(conn):
+    """Add the per-note seq counter to ring-slot tables that predate it.
+
+    Slots up to the newest one (by created_at, the only order available here)
+    are the current lap and get seq = slot + NOTE_VERSIONS_KEEP; later slots
+    are the previous lap, so the next save lands on the same slot as before.
+    """
+    columns = [col["name"] for col in conn.execute("PRAGMA table_info(note_versions)")]
+    if "seq" in columns:
+        return
+    conn.execute("ALTER TABLE note_versions ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE note_versions SET seq = version_number + CASE
+            WHEN version_number <= (SELECT newest.version_number FROM note_versions AS newest
+                                    WHERE newest.note_id = note_versions.note_id
+                                    ORDER BY newest.created_at DESC LIMIT 1)
+            THEN ? ELSE 0 END
+    """, (NOTE_VERSIONS_KEEP,))
+    print("  ↳ Added seq column to note_versions")
+
+
 def init_database():
     """Initialize database schema"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
         
         # Nodes table (notes)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS nodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                category TEXT DEFAULT 'general',
-                timestamp TEXT,
-                embedding BLOB,
-                last_accessed TEXT,
-                access_count INTEGER DEFAULT 0,
-                importance TEXT DEFAULT 'normal',
-                emotional_tone TEXT,
-                emotional_intensity INTEGER DEFAULT 5,
-                emotional_reflection TEXT,
-                t_event_start TEXT,
-                t_event_end TEXT,
-                temporal_expressions TEXT
-            )
-        """)
+        cursor.execute(_nodes_ddl("nodes"))
         
         # Migration: add importance column if missing (for existing databases)
         cursor.execute("PRAGMA table_info(nodes)")
@@ -114,6 +586,10 @@ def init_database():
             )
         """)
         
+        # note_versions: last NOTE_VERSIONS_KEEP states of each note, stored as a
+        # ring of slots 1..NOTE_VERSIONS_KEEP (see save_note_version)
+        cursor.execute(_NOTE_VERSIONS_DDL.format(table="note_versions"))
+        
         # anchor_policies: user-defined categories protected from decay/deletion
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS anchor_policies (
@@ -127,24 +603,57 @@ def init_database():
         """)
 
         # Indexes for performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_edges_source ON edges(source_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_node_entities_node ON node_entities(node_id)")
+        # Covering indexes for neighbourhood lookups in either direction: each
+        # half of SQL_CONNECTED_NODES reads the index only. They supersede the
+        # old single-column source/target indexes (same leading column).
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_edges_source_cov ON edges(source_id, target_id, weight, edge_type)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_edges_target_cov ON edges(target_id, source_id, weight, edge_type)")
+        cursor.execute("DROP INDEX IF EXISTS idx_edges_source")
+        cursor.execute("DROP INDEX IF EXISTS idx_edges_target")
+        # node_id lookups and get_entity_counts_batch's GROUP BY node_id are served
+        # (index-only) by the PRIMARY KEY (node_id, entity_id) autoindex; a separate
+        # node_id index only added write cost
+        cursor.execute("DROP INDEX IF EXISTS idx_node_entities_node")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_node_entities_entity ON node_entities(entity_id)")
-        
+        # Expression index for case-insensitive entity lookups: WHERE LOWER(name) = ?
+        # is an index seek instead of calling LOWER() on every row. Not UNIQUE -
+        # older databases can hold case variants until merge_entities cleans them up.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_entities_name_ci ON entities(LOWER(name), entity_type)")
+    
+    _migrate_nodes_column_order()
+    _migrate_note_versions_ring()
+    normalize_stored_embeddings()
     print(f"✅ Database initialized: {DB_PATH}")
 
 
-def create_node(content, category="general", embedding=None, importance="normal", 
-                emotional_tone=None, emotional_intensity=5, emotional_reflection=None,
-                t_event_start=None, t_event_end=None, temporal_expressions=None, tags=None):
-    """Create a new node (note). 
-    Importance: 'critical', 'normal', or 'low'
-    Emotional fields: tone (keywords), intensity (0-10), reflection (narrative) - only if ENABLE_EMOTIONAL_MEMORY=true
-    Bi-temporal: t_event_start/end (nullable) = when event happened, temporal_expressions = JSON array of extracted expressions
+def unit_embedding(embedding):
+    """float32 copy of embedding scaled to unit L2 norm (zero vectors stay zero).
+    Stored embeddings are kept unit length so cosine similarity is a plain dot product.
     """
-    timestamp = datetime.now().isoformat()
-    
+    emb = np.array(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(emb)
+    if norm > 0:
+        emb /= norm
+    return emb
+
+
+def _embedding_param(embedding):
+    """Bind value for the embedding BLOB column.
+    numpy arrays and raw float32 bytes are normalized (unit_embedding) and
+    bound through the buffer protocol, so no intermediate bytes copy is made;
+    None passes through. Read back with np.frombuffer(blob, dtype=np.float32).
+    """
+    if isinstance(embedding, (bytes, bytearray, memoryview)):
+        embedding = np.frombuffer(embedding, dtype=np.float32)
+    if isinstance(embedding, np.ndarray):
+        return memoryview(unit_embedding(embedding)).cast("B")
+    return embedding
+
+
+def _node_row(timestamp, content, category="general", embedding=None, importance="normal",
+              emotional_tone=None, emotional_intensity=5, emotional_reflection=None,
+              t_event_start=None, t_event_end=None, temporal_expressions=None, tags=None):
+    """Build the SQL_INSERT_NODE parameter tuple (emotional gating + temporal extraction)"""
     # Apply emotional fields only if feature is enabled
     if not ENABLE_EMOTIONAL_MEMORY:
         emotional_tone = None
@@ -164,32 +673,79 @@ def create_node(content, category="general", embedding=None, importance="normal"
         except Exception:
             pass  # Graceful degradation — temporal is optional
     
-    with get_connection() as conn:
+    return (content, category, timestamp, _embedding_param(embedding), timestamp, importance, 
+            emotional_tone, emotional_intensity, emotional_reflection,
+            t_event_start, t_event_end, temporal_expressions, tags)
+
+
+def create_node(content, category="general", embedding=None, importance="normal", 
+                emotional_tone=None, emotional_intensity=5, emotional_reflection=None,
+                t_event_start=None, t_event_end=None, temporal_expressions=None, tags=None,
+                conn=None):
+    """Create a new node (note). 
+    Importance: 'critical', 'normal', or 'low'
+    Emotional fields: tone (keywords), intensity (0-10), reflection (narrative) - only if ENABLE_EMOTIONAL_MEMORY=true
+    Bi-temporal: t_event_start/end (nullable) = when event happened, temporal_expressions = JSON array of extracted expressions
+    Temporal extraction runs before the write lock is taken; pass conn to insert
+    inside the caller's transaction.
+    """
+    row = _node_row(datetime.now().isoformat(), content, category, embedding, importance,
+                    emotional_tone, emotional_intensity, emotional_reflection,
+                    t_event_start, t_event_end, temporal_expressions, tags)
+    with _reuse_or(conn, write_connection) as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            """INSERT INTO nodes (content, category, timestamp, embedding, last_accessed, access_count, 
-               importance, emotional_tone, emotional_intensity, emotional_reflection,
-               t_event_start, t_event_end, temporal_expressions, tags) 
-               VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (content, category, timestamp, embedding, timestamp, importance, 
-             emotional_tone, emotional_intensity, emotional_reflection,
-             t_event_start, t_event_end, temporal_expressions, tags)
-        )
+        cursor.execute(SQL_INSERT_NODE, row)
         return cursor.lastrowid
 
 
-def get_node(node_id):
-    """Get node by ID"""
-    with get_connection() as conn:
+def create_nodes_bulk(nodes, conn=None):
+    """Insert many nodes in one transaction.
+    nodes: iterable of dicts with create_node() keyword arguments (content required).
+    Returns the new node ids, in input order.
+    """
+    timestamp = datetime.now().isoformat()
+    rows = [_node_row(timestamp, **node) for node in nodes]
+    if not rows:
+        return []
+    with _reuse_or(conn, write_connection) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(SQL_INSERT_NODE, rows)
+        # Single writer inside one transaction -> rowids are contiguous
+        last = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(rows) + 1, last + 1))
+
+
+def get_node(node_id, conn=None):
+    """Get node by ID (pass conn to read inside an open transaction)"""
+    with _reuse_or(conn, read_connection) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
+        cursor.execute(SQL_GET_NODE, (node_id,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
 
+# Columns update_node() can set, in SET-clause order. The UPDATE statement for
+# each combination of fields is built once and reused (same string each call,
+# so it also stays in the connection's statement cache).
+_UPDATABLE_FIELDS = ("content", "category", "embedding", "importance",
+                     "emotional_tone", "emotional_intensity", "emotional_reflection", "tags")
+_UPDATE_SQL = {}
+
+
+def _update_node_sql(fields):
+    sql = _UPDATE_SQL.get(fields)
+    if sql is None:
+        sets = "".join(f"{field} = ?, " for field in fields)
+        sql = _UPDATE_SQL.setdefault(fields, f"UPDATE nodes SET {sets}timestamp = ? WHERE id = ?")
+    return sql
+
+
 def update_node(node_id, content=None, category=None, embedding=None, importance=None,
-                emotional_tone=None, emotional_intensity=None, emotional_reflection=None, tags=None):
-    """Update existing node. Emotional fields only if ENABLE_EMOTIONAL_MEMORY=true"""
+                emotional_tone=None, emotional_intensity=None, emotional_reflection=None, tags=None, conn=None):
+    """Update existing node. Emotional fields only if ENABLE_EMOTIONAL_MEMORY=true.
+    Version save and UPDATE run in one transaction (the caller's, if conn is given).
+    """
+    global _embeddings_pending
     
     # Ignore emotional fields if feature is disabled
     if not ENABLE_EMOTIONAL_MEMORY:
@@ -197,43 +753,21 @@ def update_node(node_id, content=None, category=None, embedding=None, importance
         emotional_intensity = None
         emotional_reflection = None
     
-    with get_connection() as conn:
+    values = (content, category, _embedding_param(embedding), importance,
+              emotional_tone, emotional_intensity, emotional_reflection, tags)
+    fields = tuple(field for field, value in zip(_UPDATABLE_FIELDS, values) if value is not None)
+    if not fields:
+        return False
+    params = [value for value in values if value is not None]
+    params.append(datetime.now().isoformat())
+    params.append(node_id)
+    
+    with _reuse_or(conn, write_connection) as conn:
         cursor = conn.cursor()
         
-        updates = []
-        params = []
-        
-        if content is not None:
-            updates.append("content = ?")
-            params.append(content)
-        if category is not None:
-            updates.append("category = ?")
-            params.append(category)
-        if embedding is not None:
-            updates.append("embedding = ?")
-            params.append(embedding)
-        if importance is not None:
-            updates.append("importance = ?")
-            params.append(importance)
-        if emotional_tone is not None:
-            updates.append("emotional_tone = ?")
-            params.append(emotional_tone)
-        if emotional_intensity is not None:
-            updates.append("emotional_intensity = ?")
-            params.append(emotional_intensity)
-        if emotional_reflection is not None:
-            updates.append("emotional_reflection = ?")
-            params.append(emotional_reflection)
-        if tags is not None:
-            updates.append("tags = ?")
-            params.append(tags)
-        
-        if not updates:
-            return False
-        
         # Save current state as version before updating (if content changes)
         if content is not None:
-            current = get_node(node_id)
+            current = get_node(node_id, conn=conn)
             if current:
                 save_note_version(
                     node_id,
@@ -242,15 +776,14 @@ def update_node(node_id, content=None, category=None, embedding=None, importance
                     current['importance'],
                     current.get('emotional_tone'),
                     current.get('emotional_intensity'),
-                    current.get('emotional_reflection')
+                    current.get('emotional_reflection'),
+                    conn=conn
                 )
         
-        updates.append("timestamp = ?")
-        params.append(datetime.now().isoformat())
-        params.append(node_id)
-        
-        sql = "UPDATE nodes SET " + ", ".join(updates) + " WHERE id = ?"
-        cursor.execute(sql, params)
+        cursor.execute(_update_node_sql(fields), params)
+        _neighbors_touched(node_id)
+        if embedding is not None:
+            _embeddings_pending = True
         return cursor.rowcount > 0
 
 
@@ -259,7 +792,7 @@ def get_anchor_policies() -> list:
     """Get all user-defined anchor policies from DB.
     Returns list of dicts with category, policy_type, description, created_at.
     """
-    with get_connection() as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         rows = cursor.execute(
             'SELECT category, policy_type, description, created_at, created_by '
@@ -290,7 +823,7 @@ def add_anchor_policy(category: str, description: str = '', policy_type: str = '
         return {'error': "policy_type must be 'protect'"}
     from datetime import datetime
     now = datetime.now().isoformat()
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
         existing = cursor.execute(
             'SELECT id FROM anchor_policies WHERE category = ?', (category,)
@@ -313,7 +846,7 @@ def remove_anchor_policy(category: str) -> dict:
     if not category or not category.strip():
         return {'error': 'Category name required'}
     category = category.strip().lower()
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
         existing = cursor.execute(
             'SELECT id FROM anchor_policies WHERE category = ?', (category,)
@@ -331,7 +864,7 @@ def merge_entities(keep_id: int, remove_id: int) -> dict:
     Conservative: checks both exist, transfers links, deduplicates, deletes remove_id.
     Returns summary of what was done. Never touches notes/nodes.
     """
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
 
         keep = cursor.execute(
@@ -372,6 +905,7 @@ def merge_entities(keep_id: int, remove_id: int) -> dict:
 
         cursor.execute('DELETE FROM node_entities WHERE entity_id = ?', (remove_id,))
         cursor.execute('DELETE FROM entities WHERE id = ?', (remove_id,))
+        _entity_cache_evict([remove_id])
 
         return {
             'kept': {'id': keep_id, 'name': keep['name'], 'type': keep['entity_type']},
@@ -385,7 +919,7 @@ def merge_entities(keep_id: int, remove_id: int) -> dict:
 
 def list_entity_candidates() -> dict:
     """List entity merge candidates (read-only). Returns case variants grouped by lower(name)+type."""
-    with get_connection() as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         rows = cursor.execute("""
             SELECT lower(name) as lname, entity_type,
@@ -414,74 +948,293 @@ def set_importance(node_id, importance):
     """Set importance level for a node: 'critical', 'normal', or 'low'"""
     if importance not in ('critical', 'normal', 'low'):
         raise ValueError("Importance must be 'critical', 'normal', or 'low'")
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE nodes SET importance = ? WHERE id = ?", (importance, node_id))
+        _neighbors_touched(node_id)
         return cursor.rowcount > 0
 
 
 def delete_node(node_id):
     """Delete node and return its data"""
-    with get_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT content, category FROM nodes WHERE id = ?", (node_id,))
+        # One statement: the deleted row comes back via RETURNING (SQLite 3.35+)
+        cursor.execute("DELETE FROM nodes WHERE id = ? RETURNING content, category", (node_id,))
         node = cursor.fetchone()
         if not node:
             return None
-        cursor.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+        _neighbors_touched(node_id)
         return dict(node)
 
 
-def get_all_nodes():
-    """Get all nodes ordered by timestamp"""
-    with get_connection() as conn:
+# Default projection for iter_nodes(): everything except the embedding BLOB and
+# the temporal_expressions JSON, which most full scans never look at.
+NODE_ALL_COLUMNS = tuple(name for name, _ in NODES_COLUMNS)
+NODE_DEFAULT_COLUMNS = tuple(c for c in NODE_ALL_COLUMNS if c not in ("embedding", "temporal_expressions"))
+ITER_FETCH_SIZE = 1000
+
+
+def _iter_rows(sql, params=()):
+    """Stream rows as dicts in ITER_FETCH_SIZE batches from one read connection"""
+    with read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM nodes ORDER BY timestamp DESC")
-        return [dict(row) for row in cursor.fetchall()]
+        cursor.arraysize = ITER_FETCH_SIZE
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+
+
+def iter_nodes(columns=None):
+    """Yield nodes (newest first) as dicts with only the requested columns.
+    Defaults to NODE_DEFAULT_COLUMNS (no embedding). Consume fully or close()
+    the generator so its connection goes back to the pool.
+    """
+    columns = tuple(columns or NODE_DEFAULT_COLUMNS)
+    unknown = set(columns) - set(NODE_ALL_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown nodes columns: {sorted(unknown)}")
+    return _iter_rows(f"SELECT {', '.join(columns)} FROM nodes ORDER BY timestamp DESC")
+
+
+# Bound parameters per IN (...) query; SQLite's default limit is 999 on older builds
+SQL_IN_BATCH = 900
+
+
+def get_nodes_by_ids(node_ids, columns=None, row_type=None):
+    """Fetch the given nodes as {id: dict} with only the requested columns
+    (default NODE_DEFAULT_COLUMNS, no embedding). Missing ids are skipped.
+    With row_type (a namedtuple class whose fields are nodes columns, id
+    included) rows come back as row_type instances instead of dicts.
+    """
+    if row_type is not None:
+        if "id" not in row_type._fields:
+            raise ValueError("row_type needs an 'id' field")
+        columns = row_type._fields
+        make = row_type._make
+    else:
+        make = dict
+    columns = tuple(columns or NODE_DEFAULT_COLUMNS)
+    unknown = set(columns) - set(NODE_ALL_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown nodes columns: {sorted(unknown)}")
+    if "id" not in columns:
+        columns = ("id",) + columns
+    ids = list(dict.fromkeys(node_ids))
+    nodes = {}
+    with read_connection() as conn:
+        for start in range(0, len(ids), SQL_IN_BATCH):
+            batch = ids[start:start + SQL_IN_BATCH]
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM nodes WHERE id IN ({','.join('?' * len(batch))})", batch)
+            for row in rows:
+                nodes[row["id"]] = make(row)
+    return nodes
+
+
+EMBEDDING_NORM_TOLERANCE = 1e-4
+
+
+def normalize_stored_embeddings():
+    """Rescale stored embeddings that are not unit length (rows written before
+    embeddings were normalized on insert, or by raw-SQL scripts). Returns the
+    number of rows rewritten.
+    """
+    rows = []
+    for node in iter_nodes(("id", "embedding")):
+        blob = node["embedding"]
+        if blob is None or len(blob) % 4:
+            continue
+        emb = np.frombuffer(blob, dtype=np.float32)
+        norm = np.linalg.norm(emb)
+        if norm > 0 and abs(norm - 1.0) > EMBEDDING_NORM_TOLERANCE:
+            rows.append(((emb / norm).tobytes(), node["id"]))
+    if rows:
+        with write_connection() as conn:
+            conn.executemany("UPDATE nodes SET embedding = ? WHERE id = ?", rows)
+        mark_embeddings_changed()
+        print(f"  ↳ Normalized {len(rows)} stored embeddings to unit length")
+    return len(rows)
+
+
+def get_all_nodes():
+    """Get all nodes ordered by timestamp (all columns, including embedding)"""
+    return list(iter_nodes(NODE_ALL_COLUMNS))
+
+
+# touch_node() write-behind buffer: access updates are coalesced per node and
+# written in one transaction once TOUCH_BATCH_SIZE touches are pending or
+# TOUCH_FLUSH_MS after the first one. access_count/last_accessed may lag by
+# up to TOUCH_FLUSH_MS; call flush_touches() where exact values matter.
+TOUCH_BATCH_SIZE = int(os.getenv("TOUCH_BATCH_SIZE", "64"))  # <= 1 = write through
+TOUCH_FLUSH_MS = int(os.getenv("TOUCH_FLUSH_MS", "500"))
+_touch_pending = Counter()  # (db_path, node_id) -> touches since last flush
+_touch_total = 0
+_touch_timer = None
+_touch_lock = threading.Lock()
+
+
+def _apply_touches(path, rows):
+    """Write (hits, node_id) rows to the database at path in one transaction"""
+    if path == DB_PATH:
+        with write_connection() as conn:
+            conn.executemany(SQL_TOUCH_NODE, rows)
+            _neighbors_touched(*(node_id for _, node_id in rows))
+        return
+    # DB_PATH was switched after these touches were buffered - write them where they came from
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.executemany(SQL_TOUCH_NODE, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def flush_touches():
+    """Write buffered touch_node() updates now. Returns the number of nodes updated."""
+    global _touch_total, _touch_timer
+    with _touch_lock:
+        pending = dict(_touch_pending)
+        _touch_pending.clear()
+        _touch_total = 0
+        timer, _touch_timer = _touch_timer, None
+    if timer is not None:
+        timer.cancel()
+    by_path = {}
+    for (path, node_id), hits in pending.items():
+        by_path.setdefault(path, []).append((hits, node_id))
+    for path, rows in by_path.items():
+        _apply_touches(path, rows)
+    return len(pending)
+
+
+def _flush_touches_on_timer():
+    try:
+        flush_touches()
+    except Exception as e:
+        print(f"⚠️  touch_node flush failed: {e}")
 
 
 def touch_node(node_id):
-    """Update last_accessed and increment access_count"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE nodes SET last_accessed = ?, access_count = access_count + 1 WHERE id = ?",
-            (datetime.now().isoformat(), node_id)
-        )
+    """Update last_accessed and increment access_count (buffered, see TOUCH_BATCH_SIZE)"""
+    global _touch_total, _touch_timer
+    if TOUCH_BATCH_SIZE <= 1:
+        _apply_touches(DB_PATH, [(1, node_id)])
+        return
+    with _touch_lock:
+        _touch_pending[(DB_PATH, node_id)] += 1
+        _touch_total += 1
+        full = _touch_total >= TOUCH_BATCH_SIZE
+        if not full and _touch_timer is None:
+            _touch_timer = threading.Timer(TOUCH_FLUSH_MS / 1000, _flush_touches_on_timer)
+            _touch_timer.daemon = True
+            _touch_timer.start()
+    if full:
+        flush_touches()
+
+
+atexit.register(_flush_touches_on_timer)
 
 
 def create_edge(source_id, target_id, weight=0.5, edge_type="semantic"):
-    """Create edge between nodes (or update weight if exists)"""
-    with get_connection() as conn:
+    """Create edge between nodes (or keep the higher weight if it exists).
+    Returns the edge id in both cases.
+    """
+    with write_connection() as conn:
         cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO edges (source_id, target_id, weight, edge_type, created_at) VALUES (?, ?, ?, ?, ?)",
-                (source_id, target_id, weight, edge_type, datetime.now().isoformat())
-            )
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Edge exists, update weight if higher
-            cursor.execute(
-                "UPDATE edges SET weight = MAX(weight, ?) WHERE source_id = ? AND target_id = ? AND edge_type = ?",
-                (weight, source_id, target_id, edge_type)
-            )
-            return None
+        cursor.execute(SQL_UPSERT_EDGE, (source_id, target_id, weight, edge_type))
+        _neighbors_touched(source_id, target_id)
+        return cursor.fetchone()[0]
+
+
+def create_edges_bulk(edges, conn=None):
+    """Create/upsert many edges in one transaction.
+    edges: iterable of (source_id, target_id, weight, edge_type) tuples.
+    Existing edges keep the higher weight, as in create_edge(). Returns rows processed.
+    """
+    rows = [(s, t, w, et) for s, t, w, et in edges]
+    if not rows:
+        return 0
+    with _reuse_or(conn, write_connection) as conn:
+        conn.cursor().executemany(SQL_UPSERT_EDGE_BULK, rows)
+        _neighbors_touched(*{nid for row in rows for nid in row[:2]})
+        return len(rows)
 
 
 def get_connected_nodes(node_id):
-    """Get all nodes connected to given node"""
-    with get_connection() as conn:
+    """Get all nodes connected to given node (served from the neighbour LRU when cached)
+    Rows carry id, content, category, importance plus the edge's weight and edge_type.
+    """
+    global _neighbors_path
+    if NEIGHBOR_CACHE_SIZE > 0:
+        if _neighbors_path != DB_PATH:
+            _neighbors_clear()
+            _neighbors_path = DB_PATH
+        with _neighbors_lock:
+            entry = _neighbors_cache.get(node_id)
+            if entry is not None:
+                _neighbors_cache.move_to_end(node_id)
+                return [dict(row) for row in entry[0]]
+            generation = _neighbors_generation
+    
+    with read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            """SELECT DISTINCT n.*, e.weight, e.edge_type
-               FROM nodes n
-               JOIN edges e ON (n.id = e.target_id AND e.source_id = ?)
-                            OR (n.id = e.source_id AND e.target_id = ?)
-               WHERE n.id != ?""",
-            (node_id, node_id, node_id)
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        cursor.execute(SQL_CONNECTED_NODES, (node_id, node_id, node_id, node_id))
+        rows = [dict(row) for row in cursor.fetchall()]
+    
+    if NEIGHBOR_CACHE_SIZE > 0:
+        with _neighbors_lock:
+            # Skip the fill if a write invalidated anything while we were reading
+            if generation == _neighbors_generation and node_id not in _neighbors_cache:
+                members = {node_id} | {row["id"] for row in rows}
+                _neighbors_cache[node_id] = ([dict(row) for row in rows], members)
+                for member in members:
+                    _neighbors_rev.setdefault(member, set()).add(node_id)
+                while len(_neighbors_cache) > NEIGHBOR_CACHE_SIZE:
+                    _neighbors_drop(next(iter(_neighbors_cache)))
+    return rows
+
+
+# get_or_create_entity() id cache: (lowercased name, entity_type) -> entity id.
+# Entities are never renamed and only deleted by merge_entities() (which evicts)
+# or by offline maintenance scripts; a stale id is evicted when linking fails.
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "50000"))
+_entity_cache = OrderedDict()
+_entity_cache_path = None
+_entity_cache_lock = threading.Lock()
+
+
+def _entity_cache_get(key):
+    global _entity_cache_path
+    with _entity_cache_lock:
+        if _entity_cache_path != DB_PATH:
+            _entity_cache.clear()
+            _entity_cache_path = DB_PATH
+            return None
+        entity_id = _entity_cache.get(key)
+        if entity_id is not None:
+            _entity_cache.move_to_end(key)
+        return entity_id
+
+
+def _entity_cache_put(key, entity_id):
+    with _entity_cache_lock:
+        if _entity_cache_path != DB_PATH:
+            return
+        _entity_cache[key] = entity_id
+        if len(_entity_cache) > ENTITY_CACHE_SIZE:
+            _entity_cache.popitem(last=False)
+
+
+def _entity_cache_evict(entity_ids):
+    entity_ids = set(entity_ids)
+    with _entity_cache_lock:
+        for key in [k for k, v in _entity_cache.items() if v in entity_ids]:
+            del _entity_cache[key]
 
 
 def get_or_create_entity(name, entity_type="concept"):
@@ -490,8 +1243,14 @@ def get_or_create_entity(name, entity_type="concept"):
     Case normalization: lookup by lower(name) + entity_type.
     If found, reuse existing entity regardless of original case.
     This prevents case variants (git/Git/GIT) from creating duplicate nodes.
+    Repeated lookups are answered from an in-memory id cache.
     """
     name_lower = name.lower().strip()
+    cache_key = (name_lower, entity_type)
+    if ENTITY_CACHE_SIZE > 0:
+        cached = _entity_cache_get(cache_key)
+        if cached is not None:
+            return cached
     # Concept Merging (item #46): resolve synonyms to canonical form at entity creation.
     # "ML" -> "machine learning", "нейронная сеть" -> "neural network", etc.
     # Same SYNONYMS dict used by normalize_query() — no extra dependencies.
@@ -500,53 +1259,70 @@ def get_or_create_entity(name, entity_type="concept"):
         name_lower = SYNONYMS.get(name_lower, name_lower)
     except Exception:
         pass  # never block add_note on normalization errors
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        # Match by normalized name AND type - different types are different entities
-        cursor.execute(
-            "SELECT id FROM entities WHERE LOWER(name) = ? AND entity_type = ?",
-            (name_lower, entity_type)
-        )
-        row = cursor.fetchone()
-        if row:
-            return row["id"]
-        # Store with normalized (lowercase) name to keep graph consistent
-        cursor.execute(
-            "INSERT OR IGNORE INTO entities (name, entity_type) VALUES (?, ?)",
-            (name_lower, entity_type)
-        )
-        # lastrowid is 0 if INSERT was ignored (row already existed)
-        if cursor.lastrowid:
-            return cursor.lastrowid
-        # Row already existed - fetch it
-        row2 = cursor.execute(
-            "SELECT id FROM entities WHERE name = ? AND entity_type = ?",
-            (name_lower, entity_type)
-        ).fetchone()
-        if row2:
-            return row2["id"]
-        # Final fallback: search by lower(name) (old data may have different case)
-        row3 = cursor.execute(
-            "SELECT id FROM entities WHERE LOWER(name) = ? AND entity_type = ?",
-            (name_lower, entity_type)
-        ).fetchone()
-        return row3["id"] if row3 else None
+    with write_connection() as conn:
+        # Only cache ids from a transaction this call commits itself -
+        # an enclosing transaction may still roll the INSERT back
+        owns_transaction = _writer_depth == 1
+        entity_id = _lookup_or_insert_entity(conn.cursor(), name_lower, entity_type)
+    if entity_id is not None and owns_transaction and ENTITY_CACHE_SIZE > 0:
+        _entity_cache_put(cache_key, entity_id)
+    return entity_id
+
+
+def _lookup_or_insert_entity(cursor, name_lower, entity_type):
+    # Match by normalized name AND type - different types are different entities
+    cursor.execute(SQL_ENTITY_BY_LOWER_NAME, (name_lower, entity_type))
+    row = cursor.fetchone()
+    if row:
+        return row["id"]
+    # Store with normalized (lowercase) name to keep graph consistent
+    cursor.execute(
+        "INSERT OR IGNORE INTO entities (name, entity_type) VALUES (?, ?)",
+        (name_lower, entity_type)
+    )
+    # lastrowid is 0 if INSERT was ignored (row already existed)
+    if cursor.lastrowid:
+        return cursor.lastrowid
+    # Row already existed - fetch it
+    row2 = cursor.execute(
+        "SELECT id FROM entities WHERE name = ? AND entity_type = ?",
+        (name_lower, entity_type)
+    ).fetchone()
+    if row2:
+        return row2["id"]
+    # Final fallback: search by lower(name) (old data may have different case)
+    row3 = cursor.execute(SQL_ENTITY_BY_LOWER_NAME, (name_lower, entity_type)).fetchone()
+    return row3["id"] if row3 else None
 
 
 def link_node_to_entity(node_id, entity_id):
-    """Link node to entity"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("INSERT INTO node_entities (node_id, entity_id) VALUES (?, ?)", (node_id, entity_id))
-            return True
-        except sqlite3.IntegrityError:
-            return False
+    """Link node to entity. Returns False if the link already existed."""
+    try:
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_LINK_NODE_ENTITY, (node_id, entity_id))
+            return cursor.fetchone() is not None
+    except sqlite3.IntegrityError:
+        # Foreign key failure: the entity (or node) is gone, e.g. removed by an
+        # offline cleanup script while its id sat in the entity cache
+        _entity_cache_evict([entity_id])
+        return False
+
+
+def link_node_to_entity_bulk(links, conn=None):
+    """Link many (node_id, entity_id) pairs in one transaction. Returns new links created."""
+    links = list(links)
+    if not links:
+        return 0
+    with _reuse_or(conn, write_connection) as conn:
+        before = conn.total_changes
+        conn.cursor().executemany(SQL_LINK_NODE_ENTITY_BULK, links)
+        return conn.total_changes - before
 
 
 def get_nodes_by_entity(entity_id):
     """Get all nodes linked to an entity"""
-    with get_connection() as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT n.* FROM nodes n JOIN node_entities ne ON n.id = ne.node_id WHERE ne.entity_id = ?",
@@ -556,16 +1332,48 @@ def get_nodes_by_entity(entity_id):
 
 
 def get_entity_counts_batch():
-    """Get entity count per node as dict {node_id: count}"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT node_id, COUNT(*) FROM node_entities GROUP BY node_id")
-        return {row[0]: row[1] for row in cursor.fetchall()}
+    """Get entity count per node as dict {node_id: count} (covering PK index scan).
+
+    Cached until the next in-process commit that changes rows; callers
+    share the returned dict and must not modify it.
+    """
+    key = (DB_PATH, _write_generation)
+    with _entity_counts_lock:
+        if _entity_counts_cache.get("key") == key:
+            return _entity_counts_cache["counts"]
+    with read_connection() as conn:
+        cursor = conn.execute("SELECT node_id, COUNT(entity_id) FROM node_entities GROUP BY node_id")
+        counts = dict(cursor)
+    with _entity_counts_lock:
+        # Keyed on the generation read before the query: a commit racing
+        # with it leaves the entry stale and the next call recomputes
+        _entity_counts_cache["key"] = key
+        _entity_counts_cache["counts"] = counts
+    return counts
 
 
 def get_stats():
-    """Get database statistics"""
-    with get_connection() as conn:
+    """Get database statistics (cached until the next write)"""
+    with _stats_lock:
+        if _stats_dirty.is_set() or _stats_cache.get("db_path") != DB_PATH:
+            # Clear before computing: a write racing with the queries re-dirties it
+            _stats_dirty.clear()
+            try:
+                _stats_cache["stats"] = _compute_stats()
+            except Exception:
+                _stats_dirty.set()
+                raise
+            _stats_cache["db_path"] = DB_PATH
+        stats = _stats_cache["stats"]
+    return {
+        **stats,
+        "nodes_by_category": dict(stats["nodes_by_category"]),
+        "edges_by_type": dict(stats["edges_by_type"]),
+    }
+
+
+def _compute_stats():
+    with read_connection() as conn:
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(*) as count FROM nodes")
@@ -592,63 +1400,47 @@ def get_stats():
         }
 
 
+def iter_edges():
+    """Yield edges (source_id, target_id, weight, edge_type) without building a list"""
+    return _iter_rows("SELECT source_id, target_id, weight, edge_type FROM edges")
+
+
 def get_all_edges():
     """Get all edges from database for graph cache"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            """SELECT source_id, target_id, weight, edge_type
-               FROM edges"""
-        )
-        return [dict(row) for row in cursor.fetchall()]
+    return list(iter_edges())
 
 
 def save_note_version(note_id, content, category, importance, 
-                      emotional_tone=None, emotional_intensity=None, emotional_reflection=None):
+                      emotional_tone=None, emotional_intensity=None, emotional_reflection=None,
+                      conn=None):
     """
     Save current note state as a version before updating
-    Keeps last 5 versions by default
+    Keeps last NOTE_VERSIONS_KEEP versions: seq counts saves per note and
+    version_number is its ring slot (1..NOTE_VERSIONS_KEEP), so the oldest
+    slot is overwritten in place - one statement, no pruning DELETE.
+    Returns the slot written.
     """
-    with get_connection() as conn:
+    with _reuse_or(conn, write_connection) as conn:
         cursor = conn.cursor()
-        
-        # Get current max version number for this note
-        cursor.execute(
-            "SELECT COALESCE(MAX(version_number), 0) FROM note_versions WHERE note_id = ?",
-            (note_id,)
-        )
-        max_version = cursor.fetchone()[0]
-        new_version = max_version + 1
-        
-        # Insert new version
-        cursor.execute("""
-            INSERT INTO note_versions 
-            (note_id, version_number, content, category, importance, 
-             emotional_tone, emotional_intensity, emotional_reflection, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (note_id, new_version, content, category, importance,
-              emotional_tone, emotional_intensity, emotional_reflection,
-              datetime.now().isoformat()))
-        
-        # Keep only last 5 versions - delete older ones
-        cursor.execute("""
-            DELETE FROM note_versions 
-            WHERE note_id = ? AND version_number <= ?
-        """, (note_id, new_version - 5))
-        
-        return new_version
+        cursor.execute(SQL_SAVE_NOTE_VERSION, (
+            note_id, NOTE_VERSIONS_KEEP,
+            content, category, importance,
+            emotional_tone, emotional_intensity, emotional_reflection,
+            datetime.now().isoformat(), note_id
+        ))
+        return cursor.fetchone()[0]
 
 
 def get_note_history(note_id, limit=5):
     """Get version history for a note"""
-    with get_connection() as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT version_number, content, category, importance,
                    emotional_tone, emotional_intensity, emotional_reflection, created_at
             FROM note_versions
             WHERE note_id = ?
-            ORDER BY version_number DESC
+            ORDER BY seq DESC
             LIMIT ?
         """, (note_id, limit))
         
@@ -658,9 +1450,37 @@ def get_note_history(note_id, limit=5):
         return versions
 
 
+def list_note_versions(note_id, limit=NOTE_VERSIONS_KEEP):
+    """Lightweight version list (newest first) for pickers: no content TEXT,
+    only its length. Fetch a full version with get_note_version().
+    """
+    with read_connection() as conn:
+        cursor = conn.execute("""
+            SELECT version_number, created_at, category, importance,
+                   LENGTH(content) AS content_len
+            FROM note_versions
+            WHERE note_id = ?
+            ORDER BY seq DESC
+            LIMIT ?
+        """, (note_id, limit))
+        return [dict(row) for row in cursor]
+
+
+def get_note_version(note_id, version_number, conn=None):
+    """Get one full version of a note, or None"""
+    with _reuse_or(conn, read_connection) as conn:
+        row = conn.execute("""
+            SELECT version_number, content, category, importance,
+                   emotional_tone, emotional_intensity, emotional_reflection, created_at
+            FROM note_versions
+            WHERE note_id = ? AND version_number = ?
+        """, (note_id, version_number)).fetchone()
+        return dict(row) if row else None
+
+
 def get_version_count(note_id):
     """Get total number of versions for a note"""
-    with get_connection() as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT COUNT(*) FROM note_versions WHERE note_id = ?",
@@ -669,25 +1489,16 @@ def get_version_count(note_id):
         return cursor.fetchone()[0]
 
 
-def restore_note_version(note_id, version_number):
-    """Restore a note to a previous version"""
-    with get_connection() as conn:
+def restore_note_version(note_id, version_number, conn=None):
+    """Restore a note to a previous version (version save + UPDATE in one transaction)"""
+    with _reuse_or(conn, write_connection) as conn:
         cursor = conn.cursor()
         
         # Get the version data
-        cursor.execute("""
-            SELECT content, category, importance, emotional_tone, 
-                   emotional_intensity, emotional_reflection
-            FROM note_versions
-            WHERE note_id = ? AND version_number = ?
-        """, (note_id, version_number))
-        
-        version = cursor.fetchone()
-        if not version:
+        version_dict = get_note_version(note_id, version_number, conn=conn)
+        if not version_dict:
             return None
         
-        version_dict = dict(version)
-        
         # Save current state as a version before restoring
         cursor.execute("SELECT * FROM nodes WHERE id = ?", (note_id,))
         current = cursor.fetchone()
@@ -700,7 +1511,8 @@ def restore_note_version(note_id, version_number):
                 current_dict['importance'],
                 current_dict.get('emotional_tone'),
                 current_dict.get('emotional_intensity'),
-                current_dict.get('emotional_reflection')
+                current_dict.get('emotional_reflection'),
+                conn=conn
             )
         
         # Restore the version
@@ -713,5 +1525,6 @@ def restore_note_version(note_id, version_number):
         """, (version_dict['content'], version_dict['category'], version_dict['importance'],
               version_dict['emotional_tone'], version_dict['emotional_intensity'],
               version_dict['emotional_reflection'], datetime.now().isoformat(), note_id))
+        _neighbors_touched(note_id)
         
         return cursor.rowcount > 0
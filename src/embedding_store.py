@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Structure-of-arrays copy of the stored note embeddings for linear scans.
+
+SQLite keeps one embedding BLOB per node (the source of truth, also used by
+the ANN index and the maintenance scripts). Scanning those means one
+np.frombuffer per row; this module keeps them as a single contiguous
+(N, D) float32 matrix instead, so a scan is one matrix-vector product.
+
+The matrix follows database.get_embeddings_version(): new notes are
+appended in place, anything else (deletes, rewritten embeddings, a
+different DB_PATH) rebuilds it from SQLite.
+"""
+import os
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from database import get_embeddings_version, read_connection
+
+try:
+    from simsimd import cdist as _simd_cdist
+except ImportError:
+    _simd_cdist = None
+
+# Linear scans (ANN disabled) compare against int8-quantized embeddings
+# instead of float32: 4x less memory traffic, ~1e-3 cosine error.
+# Needs simsimd for the int8 kernels; ignored without it.
+EMBEDDING_SCAN_INT8 = os.getenv("EMBEDDING_SCAN_INT8", "false").lower() == "true"
+# Back the matrix with a memory-mapped scratch file in this directory instead
+# of anonymous memory, so the OS can page out cold rows of large collections.
+# The file is private to the process and deleted on close.
+EMBEDDING_MATRIX_MMAP_DIR = os.getenv("EMBEDDING_MATRIX_MMAP_DIR", "")
+EMBEDDING_MATRIX_MIN_CAPACITY = 1024
+
+
+def _quantize_int8(v: np.ndarray) -> np.ndarray:
+    """Symmetric int8 quantization per row: the largest |component| maps to 127"""
+    scale = np.abs(v).max(axis=-1, keepdims=True)
+    scale[scale == 0] = 1.0
+    return np.round(v * (127.0 / scale)).astype(np.int8)
+
+
+def _allocate(shape: Tuple[int, int], dtype) -> np.ndarray:
+    if not EMBEDDING_MATRIX_MMAP_DIR or shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    scratch = tempfile.TemporaryFile(dir=EMBEDDING_MATRIX_MMAP_DIR, prefix="embeddings-")
+    # The mapping keeps the (already unlinked) file alive until the array is freed
+    return np.memmap(scratch, dtype=dtype, mode="w+", shape=shape)
+
+
+class EmbeddingMatrix:
+    """
+    Embeddings of one dimension as rows of a growable float32 matrix
+
+    Row i holds the unit-length embedding of node ids[i] (insertion order,
+    capacity doubles on append; rows are rescaled to unit length on append).
+    Embeddings of another dimension are skipped.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.size = 0
+        self.version = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._matrix_i8: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _reserve(self, rows: int):
+        capacity = len(self._ids)
+        if self.size + rows <= capacity:
+            return
+        capacity = max(EMBEDDING_MATRIX_MIN_CAPACITY, capacity * 2, self.size + rows)
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self.size] = self._ids[:self.size]
+        matrix = _allocate((capacity, self.dim), np.float32)
+        matrix[:self.size] = self._matrix[:self.size]
+        if self._matrix_i8 is not None:
+            matrix_i8 = np.empty((capacity, self.dim), dtype=np.int8)
+            matrix_i8[:self.size] = self._matrix_i8[:self.size]
+            self._matrix_i8 = matrix_i8
+        self._ids, self._matrix = ids, matrix
+
+    def _append(self, rows):
+        """Append (node_id, embedding BLOB) rows"""
+        nbytes = self.dim * 4
+        ids, blobs = [], []
+        for node_id, blob in rows:
+            if blob is not None and len(blob) == nbytes:
+                ids.append(node_id)
+                blobs.append(blob)
+        if ids:
+            self._reserve(len(ids))
+            end = self.size + len(ids)
+            self._ids[self.size:end] = ids
+            block = self._matrix[self.size:end]
+            block[:] = np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(ids), self.dim)
+            # database.py stores unit vectors, but raw-SQL writers may not:
+            # rescale here so scores stay cosines whoever wrote the row
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            np.divide(block, norms, out=block, where=norms > 0)
+            if self._matrix_i8 is not None:
+                self._matrix_i8[self.size:end] = _quantize_int8(block)
+            self.size = end
+
+    def _rebuild(self, max_id: int):
+        self.size = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, self.dim), dtype=np.float32)
+        self._matrix_i8 = np.empty((0, self.dim), dtype=np.int8) \
+            if EMBEDDING_SCAN_INT8 and _simd_cdist is not None else None
+        with read_connection() as conn:
+            self._append(conn.execute("SELECT id, embedding FROM nodes WHERE id <= ? ORDER BY id", (max_id,)))
+
+    def sync(self):
+        """Bring the matrix up to date with the database"""
+        version = get_embeddings_version()
+        if version == self.version:
+            return
+        old = self.version
+        old_max, new_max = (old[2] or 0) if old else 0, version[2] or 0
+        # Reads are bounded by the version's MAX(id) so rows inserted meanwhile
+        # are picked up by the next sync rather than twice.
+        # Same database and no rewrites since last sync: if only new rows
+        # appeared (higher ids, count grew by exactly that many), append them
+        if old is not None and old[0] == version[0] and old[3] == version[3] and old_max <= new_max:
+            with read_connection() as conn:
+                rows = conn.execute("SELECT id, embedding FROM nodes WHERE id > ? AND id <= ? ORDER BY id",
+                                    (old_max, new_max)).fetchall()
+            if old[1] + len(rows) == version[1]:
+                self._append(rows)
+                self.version = version
+                return
+        self._rebuild(new_max)
+        self.version = version
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Sync, then return (ids, matrix, int8 matrix or None) views of the live rows"""
+        with self._lock:
+            self.sync()
+            size = self.size
+            matrix_i8 = self._matrix_i8[:size] if self._matrix_i8 is not None else None
+            return self._ids[:size], self._matrix[:size], matrix_i8
+
+
+_matrices: Dict[int, EmbeddingMatrix] = {}
+_matrices_lock = threading.Lock()
+
+
+def _get_matrix(dim: int) -> EmbeddingMatrix:
+    with _matrices_lock:
+        matrix = _matrices.get(dim)
+        if matrix is None:
+            matrix = _matrices[dim] = EmbeddingMatrix(dim)
+        return matrix
+
+
+def get_embedding_matrix(dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (ids, matrix): node ids (int64) and their unit-length embeddings
+    as rows of a float32 matrix. Embeddings of another dimension are skipped.
+    """
+    ids, matrix, _ = _get_matrix(dim).snapshot()
+    return ids, matrix
+
+
+def embedding_similarities(query_emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cosine similarity of a unit-length query against every stored embedding.
+
+    Returns:
+        (ids, sims) arrays aligned with get_embedding_matrix() rows
+    """
+    ids, matrix, matrix_i8 = _get_matrix(len(query_emb)).snapshot()
+    if len(ids) == 0 or not query_emb.any():
+        return ids, np.zeros(len(ids), dtype=np.float32)
+    if matrix_i8 is not None:
+        distances = np.asarray(_simd_cdist(_quantize_int8(query_emb)[None], matrix_i8, metric="cosine"))
+        return ids, 1.0 - distances[0]
+    return ids, matrix @ query_emb
@@ -6,16 +6,40 @@ Multilingual: English (en_core_web_sm) + any other language (xx_ent_wiki_sm)
 """
 import re
 import os
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
 from typing import List, Tuple, Dict
 
+import numpy as np
+
+# Light module: the gliner backend itself is imported lazily on first use
+from gliner_client import (
+    is_available as gliner_available,
+    extract_entities_gliner,
+    extract_entities_gliner_with_confidence,
+    _text_key,
+)
+
+try:
+    import ahocorasick  # pyahocorasick: single-pass KNOWN_ENTITIES scan
+except ImportError:
+    ahocorasick = None
+
 EXTRACTOR_TYPE = os.getenv("ENTITY_EXTRACTOR", "regex")
 # Priority chain: gliner (best) → spacy → regex
 
 # Entity filtering configuration
 MIN_ENTITY_LENGTH = 2  # Skip single-character entities
 
+# Docs per nlp.pipe batch in extract_entities_spacy_batch
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+# Recent spaCy extraction results, keyed by a digest of the text
+SPACY_CACHE_SIZE = int(os.getenv("SPACY_CACHE_SIZE", "8192"))
+
 # Generic stopwords to filter out (too common/meaningless)
-GENERIC_STOPWORDS = {
+GENERIC_STOPWORDS = frozenset({
     # English ordinals and sequence words
     "first", "second", "third", "fourth", "fifth", "last", "next", "previous",
     # English number words
@@ -42,7 +66,7 @@ GENERIC_STOPWORDS = {
     "не", "но", "да", "нет", "вот", "так", "все", "всё", "мне", "мой", "моя", "моё",
     # Russian multi-word stopwords
     "моё имя", "мое имя", "на самом деле", "в том числе", "в первую очередь",
-}# Expanded known entities with tech stack, concepts, and tools
+})# Expanded known entities with tech stack, concepts, and tools
 KNOWN_ENTITIES = {
     # Programming languages
     "python": ("Python", "tech"),
@@ -213,6 +237,11 @@ SPACY_LABEL_MAP = {
     "MISC": "concept",
 }
 
+# Intern entity names/types so the tuples handed out on every extraction
+# share one string object per value and compare by identity.
+KNOWN_ENTITIES = {k: (sys.intern(n), sys.intern(t)) for k, (n, t) in KNOWN_ENTITIES.items()}
+SPACY_LABEL_MAP = {k: sys.intern(v) for k, v in SPACY_LABEL_MAP.items()}
+
 # Unicode ranges for non-Latin scripts → use multilingual model
 _NON_LATIN_RANGES = [
     (0x0400, 0x052F),   # Cyrillic (Russian, Ukrainian, Bulgarian, etc.)
@@ -227,6 +256,47 @@ _NON_LATIN_RANGES = [
     (0x0400, 0x04FF),   # Cyrillic extended
 ]
 
+# Language is judged on the first N characters; results are LRU-cached so
+# re-processed notes skip the per-character scan.
+LANG_DETECT_PREFIX = 256
+# Below this length the plain Python loop beats numpy's call overhead
+LANG_DETECT_NUMPY_MIN = 64
+
+
+def _merged_range_bounds(ranges):
+    """Flatten (lo, hi) ranges into sorted [start, end) bounds of disjoint intervals."""
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return np.array([b for lo, hi in merged for b in (lo, hi + 1)], dtype=np.uint32)
+
+
+# A code point is non-Latin iff searchsorted(..., side='right') lands on an odd index
+_NON_LATIN_BOUNDS = _merged_range_bounds(_NON_LATIN_RANGES)
+
+
+def _count_scripts(text: str) -> Tuple[int, int]:
+    """Return (non_latin, latin) character counts."""
+    if len(text) < LANG_DETECT_NUMPY_MIN:
+        non_latin = 0
+        latin = 0
+        for ch in text:
+            cp = ord(ch)
+            if any(lo <= cp <= hi for lo, hi in _NON_LATIN_RANGES):
+                non_latin += 1
+            elif 'A' <= ch <= 'Z' or 'a' <= ch <= 'z':
+                latin += 1
+        return non_latin, latin
+    cps = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    non_latin = int((np.searchsorted(_NON_LATIN_BOUNDS, cps, side='right') & 1).sum())
+    upper = cps & ~np.uint32(0x20)  # fold a-z onto A-Z
+    latin = int(((upper >= 0x41) & (upper <= 0x5A)).sum())
+    return non_latin, latin
+
+
 def detect_language(text: str) -> str:
     """
     Detect whether text is primarily English or non-English.
@@ -236,14 +306,12 @@ def detect_language(text: str) -> str:
     """
     if not text:
         return "en"
-    non_latin = 0
-    latin = 0
-    for ch in text:
-        cp = ord(ch)
-        if any(lo <= cp <= hi for lo, hi in _NON_LATIN_RANGES):
-            non_latin += 1
-        elif 'A' <= ch <= 'Z' or 'a' <= ch <= 'z':
-            latin += 1
+    return _detect_language_cached(text[:LANG_DETECT_PREFIX])
+
+
+@lru_cache(maxsize=4096)
+def _detect_language_cached(text: str) -> str:
+    non_latin, latin = _count_scripts(text)
     total = non_latin + latin
     if total == 0:
         return "en"
@@ -256,6 +324,12 @@ def is_valid_entity(text: str) -> bool:
     Filter out noise entities.
     Returns True if entity should be kept, False if filtered out.
     """
+    if text.isalpha():
+        # Single word, letters only: no strip/split/isdigit work needed
+        normalized = text.lower()
+        if len(normalized) < MIN_ENTITY_LENGTH or normalized in GENERIC_STOPWORDS:
+            return False
+        return len(normalized) != 1 or normalized in {'i', 'a'}
     normalized = text.lower().strip()
     if len(normalized) < MIN_ENTITY_LENGTH:
         return False
@@ -324,10 +398,14 @@ def normalize_emotional_tag(tag: str) -> str:
     """Normalize emotional tone tag to canonical EN form."""
     return EMOTIONAL_TAG_SYNONYMS.get(tag.strip().lower(), tag.strip().lower())
 
+_ENTITY_BORDER_PUNCT = ".,!?;:'\"()[]{}"
+
+
+@lru_cache(maxsize=8192)
 def normalize_entity(text: str) -> str:
     """Normalize entity text for deduplication. Applies synonym mapping."""
     text = " ".join(text.split())
-    text = text.strip(".,!?;:'\"()[]{}").lower()
+    text = text.strip(_ENTITY_BORDER_PUNCT).lower()
     text = SYNONYMS.get(text, text)
     return text
 
@@ -369,6 +447,15 @@ def normalize_query(text: str) -> str:
             i += 1
     return " ".join(result_tokens)
 
+def __getattr__(name):
+    """PEP 562: import spaCy only when it is first touched."""
+    if name == "spacy":
+        import spacy
+        globals()[name] = spacy
+        return spacy
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def _get_spacy_model(lang: str):
     """
     Load and cache the appropriate spaCy model based on language.
@@ -377,7 +464,7 @@ def _get_spacy_model(lang: str):
     """
     cache_attr = f"_nlp_{lang}"
     if not hasattr(_get_spacy_model, cache_attr):
-        import spacy
+        spacy = __getattr__("spacy")
         if lang == "en":
             model = spacy.load("en_core_web_sm")
         else:
@@ -392,25 +479,103 @@ def _get_spacy_model(lang: str):
     return getattr(_get_spacy_model, cache_attr)
 
 
+# Precompiled KNOWN_ENTITIES matchers, rebuilt lazily if the keys change:
+# an Aho-Corasick automaton walks the text once for all keys, and one
+# alternation regex finds whole-word hits for short keys (<= 3 chars).
+_known_keys = None
+_known_automaton = None
+_short_keys_re = None
+_short_key_order = {}
+# Static per-key results: the (name, etype, 1.0) triple handed out on a match,
+# and the keys whose curated name passes is_valid_entity
+KNOWN_ENTITY_TRIPLES: Dict[str, Tuple[str, str, float]] = {}
+KNOWN_ENTITY_VALID = frozenset()
+
+
+def _get_known_matchers():
+    global _known_keys, _known_automaton, _short_keys_re, _short_key_order
+    global KNOWN_ENTITY_TRIPLES, KNOWN_ENTITY_VALID
+    keys = tuple(KNOWN_ENTITIES)
+    if _known_keys != keys:
+        automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for order, key in enumerate(keys):
+                automaton.add_word(key, (order, len(key)))
+            automaton.make_automaton()
+        short_order = {key: order for order, key in enumerate(keys) if len(key) <= 3}
+        short = sorted(short_order, key=len, reverse=True)
+        _short_keys_re = re.compile(r'(?<!\w)(' + '|'.join(re.escape(k) for k in short) + r')(?!\w)')
+        KNOWN_ENTITY_TRIPLES = {k: (n, t, 1.0) for k, (n, t) in KNOWN_ENTITIES.items()}
+        KNOWN_ENTITY_VALID = frozenset(k for k, (n, _) in KNOWN_ENTITIES.items() if is_valid_entity(n))
+        _known_keys, _known_automaton, _short_key_order = keys, automaton, short_order
+    return _known_automaton, _short_keys_re
+
+
+def _match_known_keys(text_lower: str, short_key_boundaries: bool = False) -> List[str]:
+    """
+    Find KNOWN_ENTITIES keys occurring in text_lower.
+    Keys of length <= 3 only count as whole words when short_key_boundaries is set.
+    Returns keys in KNOWN_ENTITIES order.
+    """
+    automaton, short_re = _get_known_matchers()
+    keys = _known_keys
+    hits = set()
+    if automaton is None:
+        for order, key in enumerate(keys):
+            if not (short_key_boundaries and len(key) <= 3) and key in text_lower:
+                hits.add(order)
+    else:
+        for _end_idx, (order, klen) in automaton.iter(text_lower):
+            if not (short_key_boundaries and klen <= 3):
+                hits.add(order)
+    if short_key_boundaries:
+        for m in short_re.finditer(text_lower):
+            hits.add(_short_key_order[m.group(1)])
+    return [keys[order] for order in sorted(hits)]
+
+
 def extract_entities_regex(text: str) -> List[Tuple[str, str, float]]:
     """
     Extract entities using regex patterns.
     Returns: List of (entity_text, entity_type, confidence)
     """
+    return _extract_regex_impl(text, text.lower())
+
+
+def _extract_regex_impl(text: str, text_lower: str) -> List[Tuple[str, str, float]]:
+    """Regex extraction over an already lowercased copy of text."""
     entities = []
-    text_lower = text.lower()
-    for key, (name, etype) in KNOWN_ENTITIES.items():
-        if key in text_lower:
-            if is_valid_entity(name):
-                entities.append((name, etype, 1.0))
     seen = set()
-    unique = []
-    for entity_text, entity_type, confidence in entities:
-        normalized = normalize_entity(entity_text)
-        if normalized not in seen:
-            seen.add(normalized)
-            unique.append((entity_text, entity_type, confidence))
-    return unique
+    for key in _match_known_keys(text_lower):
+        if key in KNOWN_ENTITY_VALID:
+            triple = KNOWN_ENTITY_TRIPLES[key]
+            normalized = normalize_entity(triple[0])
+            if normalized not in seen:
+                seen.add(normalized)
+                entities.append(triple)
+    return entities
+
+_spacy_cache = OrderedDict()
+_spacy_cache_lock = threading.Lock()
+
+
+def _spacy_cache_get(key: bytes):
+    with _spacy_cache_lock:
+        entities = _spacy_cache.get(key)
+        if entities is not None:
+            _spacy_cache.move_to_end(key)
+        return entities
+
+
+def _spacy_cache_put(key: bytes, entities: List[Tuple[str, str, float]]):
+    if SPACY_CACHE_SIZE <= 0:
+        return
+    with _spacy_cache_lock:
+        _spacy_cache[key] = entities
+        if len(_spacy_cache) > SPACY_CACHE_SIZE:
+            _spacy_cache.popitem(last=False)
+
 
 def extract_entities_spacy(text: str) -> List[Tuple[str, str, float]]:
     """
@@ -418,53 +583,85 @@ def extract_entities_spacy(text: str) -> List[Tuple[str, str, float]]:
     Detects language, routes to appropriate model.
     Returns: List of (entity_text, entity_type, confidence)
     """
+    key = _text_key(text)
+    cached = _spacy_cache_get(key)
+    if cached is not None:
+        return list(cached)
+    text_lower = text.lower()
     try:
-        lang = detect_language(text)
-        nlp = _get_spacy_model(lang)
-        doc = nlp(text)
-
-        entities = []
-        text_lower = text.lower()
-
-        # First, add known entities (high confidence)
-        import re
-        for key, (name, etype) in KNOWN_ENTITIES.items():
-            if len(key) <= 3:
-                if re.search(r'\b' + re.escape(key) + r'\b', text_lower):
-                    if is_valid_entity(name):
-                        entities.append((name, etype, 1.0))
-            else:
-                if key in text_lower and is_valid_entity(name):
-                    entities.append((name, etype, 1.0))
-
-        # Then, add spaCy detected entities
-        for ent in doc.ents:
-            if not is_valid_entity(ent.text):
-                continue
-            normalized = normalize_entity(ent.text)
-            if any(normalize_entity(e[0]) == normalized for e in entities):
-                continue
-            entity_type = SPACY_LABEL_MAP.get(ent.label_, "concept")
-            if entity_type == "number":
-                continue
-            if entity_type == "measurement":
-                continue
-            confidence = 0.8
-            entities.append((ent.text, entity_type, confidence))
-
-        # Deduplicate
-        seen = set()
-        unique = []
-        for entity_text, entity_type, confidence in entities:
-            normalized = normalize_entity(entity_text)
-            if normalized not in seen:
-                seen.add(normalized)
-                unique.append((entity_text, entity_type, confidence))
-        return unique
-
+        entities = _extract_spacy_impl(text, text_lower, detect_language(text))
+        _spacy_cache_put(key, entities)
+        return list(entities)
     except Exception as e:
         print(f"⚠️  spaCy extraction failed: {e}, falling back to regex")
-        return extract_entities_regex(text)
+        return _extract_regex_impl(text, text_lower)
+
+
+def extract_entities_spacy_batch(texts: List[str]) -> List[List[Tuple[str, str, float]]]:
+    """
+    Batched extract_entities_spacy: texts are grouped by detected language
+    and run through nlp.pipe. Returns one entity list per input text, in order.
+    """
+    texts_lower = [t.lower() for t in texts]
+    try:
+        keys = [_text_key(t) for t in texts]
+        results = [None] * len(texts)
+        groups = defaultdict(list)
+        for i, text in enumerate(texts):
+            cached = _spacy_cache_get(keys[i])
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                groups[detect_language(text)].append(i)
+        for lang, indices in groups.items():
+            nlp = _get_spacy_model(lang)
+            docs = nlp.pipe((texts[i] for i in indices), batch_size=SPACY_BATCH_SIZE)
+            for i, doc in zip(indices, docs):
+                entities = _entities_from_doc(doc, texts_lower[i])
+                _spacy_cache_put(keys[i], entities)
+                results[i] = list(entities)
+        return results
+    except Exception as e:
+        print(f"⚠️  spaCy batch extraction failed: {e}, falling back to regex")
+        return [_extract_regex_impl(t, tl) for t, tl in zip(texts, texts_lower)]
+
+
+def _extract_spacy_impl(text: str, text_lower: str, lang: str) -> List[Tuple[str, str, float]]:
+    """spaCy extraction with the lowercased text and language already computed."""
+    nlp = _get_spacy_model(lang)
+    return _entities_from_doc(nlp(text), text_lower)
+
+
+def _entities_from_doc(doc, text_lower: str) -> List[Tuple[str, str, float]]:
+    """Known entities from text_lower followed by spaCy's doc.ents, deduplicated."""
+    entities = []
+    known_norms = set()  # normalized forms already in entities (dedup)
+
+    # First, add known entities (high confidence)
+    for key in _match_known_keys(text_lower, short_key_boundaries=True):
+        if key in KNOWN_ENTITY_VALID:
+            triple = KNOWN_ENTITY_TRIPLES[key]
+            normalized = normalize_entity(triple[0])
+            if normalized not in known_norms:
+                known_norms.add(normalized)
+                entities.append(triple)
+
+    # Then, add spaCy detected entities
+    for ent in doc.ents:
+        if not is_valid_entity(ent.text):
+            continue
+        normalized = normalize_entity(ent.text)
+        if normalized in known_norms:
+            continue
+        entity_type = SPACY_LABEL_MAP.get(ent.label_, "concept")
+        if entity_type == "number":
+            continue
+        if entity_type == "measurement":
+            continue
+        confidence = 0.8
+        known_norms.add(normalized)
+        entities.append((ent.text, entity_type, confidence))
+    return entities
 
 def extract_entities(text: str, min_confidence: float = 0.5) -> List[Tuple[str, str]]:
     """
@@ -472,7 +669,6 @@ def extract_entities(text: str, min_confidence: float = 0.5) -> List[Tuple[str,
     Upgrade chain: gliner (best) → spacy → regex
     """
     if EXTRACTOR_TYPE == "gliner":
-        from gliner_client import is_available as gliner_available, extract_entities_gliner
         if gliner_available():
             entities = extract_entities_gliner(text)
             if entities:
@@ -496,7 +692,6 @@ def extract_entities_with_confidence(text: str) -> List[Tuple[str, str, float]]:
     Extract entities with confidence scores.
     """
     if EXTRACTOR_TYPE == "gliner":
-        from gliner_client import is_available as gliner_available, extract_entities_gliner_with_confidence
         if gliner_available():
             entities = extract_entities_gliner_with_confidence(text)
             if entities:
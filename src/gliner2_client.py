@@ -8,10 +8,13 @@ Used in sleep_compute.py (Deep Sleep phase) to build typed edges between
 entity nodes in the knowledge graph.
 """
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Optional
 
 GLINER2_MODEL = os.getenv("GLINER2_MODEL", "fastino/gliner2-large-v1")
 GLINER2_THRESHOLD = float(os.getenv("GLINER2_THRESHOLD", "0.3"))
+# Texts per model call in extract_relations_batch
+GLINER2_BATCH_SIZE = int(os.getenv("GLINER2_BATCH_SIZE", "8"))
 
 # Relation types for HippoGraph knowledge graph
 # Designed to work with our entity taxonomy:
@@ -39,8 +42,8 @@ def _load_model():
     global _model
     if _model is None:
         try:
-            from gliner2 import GLiNER2
-            _model = GLiNER2.from_pretrained(GLINER2_MODEL)
+            from gliner_client import place_model
+            _model = place_model(__getattr__("GLiNER2").from_pretrained(GLINER2_MODEL), "GLiNER2")
             print(f"✅ GLiNER2 loaded: {GLINER2_MODEL}")
         except ImportError:
             print("⚠️ gliner2 package not installed. Run: pip install gliner2")
@@ -51,6 +54,15 @@ def _load_model():
     return _model if _model is not False else None
 
 
+def __getattr__(name):
+    """PEP 562: import the gliner2 backend only when GLiNER2 is first touched."""
+    if name == "GLiNER2":
+        from gliner2 import GLiNER2
+        globals()[name] = GLiNER2
+        return GLiNER2
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def is_available() -> bool:
     """Check if GLiNER2 is available."""
     global _available
@@ -70,6 +82,44 @@ def reset_availability():
     _model = None
 
 
+def _parse_relations(raw: dict, threshold: float) -> List[Tuple[str, str, str]]:
+    """Turn one GLiNER2 relation output into deduplicated (head, relation, tail) triples."""
+    # GLiNER2 wraps output: {'relation_extraction': {'works_for': [...], ...}}
+    result = raw.get("relation_extraction", raw)
+    triples = []
+    seen = set()
+
+    for rel_type, pairs in result.items():
+        if not isinstance(pairs, list):
+            continue
+        for pair in pairs:
+            # GLiNER2 returns dicts with 'head', 'tail', optionally 'score'
+            if isinstance(pair, dict):
+                try:
+                    head = pair["head"].strip()
+                    tail = pair["tail"].strip()
+                except KeyError:
+                    continue  # malformed pair; an empty head/tail is skipped below anyway
+                score = pair.get("score", 1.0)
+            elif isinstance(pair, (list, tuple)) and len(pair) >= 2:
+                head, tail = str(pair[0]).strip(), str(pair[1]).strip()
+                score = pair[2] if len(pair) > 2 else 1.0
+            else:
+                continue
+
+            if not head or not tail or len(head) < 2 or len(tail) < 2:
+                continue
+            if float(score) < threshold:
+                continue
+
+            key = (head.lower(), rel_type, tail.lower())
+            if key not in seen:
+                seen.add(key)
+                triples.append((head, rel_type, tail))
+
+    return triples
+
+
 def extract_relations(
     text: str,
     relations: Optional[List[str]] = None,
@@ -92,37 +142,7 @@ def extract_relations(
 
     try:
         raw = model.extract_relations(text, relations)
-        # GLiNER2 wraps output: {'relation_extraction': {'works_for': [...], ...}}
-        result = raw.get("relation_extraction", raw)
-        triples = []
-        seen = set()
-
-        for rel_type, pairs in result.items():
-            if not isinstance(pairs, list):
-                continue
-            for pair in pairs:
-                # GLiNER2 returns dicts with 'head', 'tail', optionally 'score'
-                if isinstance(pair, dict):
-                    head = pair.get("head", "").strip()
-                    tail = pair.get("tail", "").strip()
-                    score = pair.get("score", 1.0)
-                elif isinstance(pair, (list, tuple)) and len(pair) >= 2:
-                    head, tail = str(pair[0]).strip(), str(pair[1]).strip()
-                    score = pair[2] if len(pair) > 2 else 1.0
-                else:
-                    continue
-
-                if not head or not tail or len(head) < 2 or len(tail) < 2:
-                    continue
-                if float(score) < threshold:
-                    continue
-
-                key = (head.lower(), rel_type, tail.lower())
-                if key not in seen:
-                    seen.add(key)
-                    triples.append((head, rel_type, tail))
-
-        return triples
+        return _parse_relations(raw, threshold)
 
     except Exception as e:
         print(f"⚠️ GLiNER2 relation extraction failed: {e}")
@@ -133,11 +153,15 @@ def extract_relations_batch(
     texts: List[str],
     relations: Optional[List[str]] = None,
     threshold: Optional[float] = None,
-    batch_size: int = 8
+    batch_size: Optional[int] = None
 ) -> List[List[Tuple[str, str, str]]]:
     """
     Batch relation extraction for multiple texts.
     Returns one list of triples per input text.
+
+    Texts go to the model batch_size at a time; parsing of each finished
+    batch runs on a worker thread while the model (which releases the GIL)
+    works on the next one.
     """
     model = _load_model()
     if model is None:
@@ -147,41 +171,23 @@ def extract_relations_batch(
         relations = GLINER2_RELATIONS
     if threshold is None:
         threshold = GLINER2_THRESHOLD
+    if not batch_size:
+        batch_size = GLINER2_BATCH_SIZE
+
+    def parse_all(batch_results):
+        return [_parse_relations(raw, threshold) for raw in batch_results]
 
     try:
-        batch_results = model.batch_extract_relations(
-            texts, relations, batch_size=batch_size
-        )
+        parsed = []
+        with ThreadPoolExecutor(max_workers=1) as parser:
+            for start in range(0, len(texts), batch_size):
+                batch_results = model.batch_extract_relations(
+                    texts[start:start + batch_size], relations, batch_size=batch_size
+                )
+                parsed.append(parser.submit(parse_all, batch_results))
         output = []
-        for raw in batch_results:
-            # GLiNER2 wraps: {'relation_extraction': {'rel_type': [...], ...}}
-            result = raw.get("relation_extraction", raw)
-            triples = []
-            seen = set()
-            for rel_type, pairs in result.items():
-                if not isinstance(pairs, list):
-                    continue
-                for pair in pairs:
-                    if isinstance(pair, dict):
-                        head = pair.get("head", "").strip()
-                        tail = pair.get("tail", "").strip()
-                        score = pair.get("score", 1.0)
-                    elif isinstance(pair, (list, tuple)) and len(pair) >= 2:
-                        head, tail = str(pair[0]).strip(), str(pair[1]).strip()
-                        score = pair[2] if len(pair) > 2 else 1.0
-                    else:
-                        continue
-
-                    if not head or not tail or len(head) < 2 or len(tail) < 2:
-                        continue
-                    if float(score) < threshold:
-                        continue
-
-                    key = (head.lower(), rel_type, tail.lower())
-                    if key not in seen:
-                        seen.add(key)
-                        triples.append((head, rel_type, tail))
-            output.append(triples)
+        for future in parsed:
+            output.extend(future.result())
         return output
 
     except Exception as e:
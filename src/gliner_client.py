@@ -5,12 +5,20 @@ Zero-shot NER using bidirectional transformer — quality of LLM, speed of spaCy
 Model: urchade/gliner_multi-v2.1 (~600MB, CPU-optimized)
 """
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List, Tuple, Optional
 
 # Configurable model
 GLINER_MODEL = os.getenv("GLINER_MODEL", "urchade/gliner_multi-v2.1")
 GLINER_THRESHOLD = float(os.getenv("GLINER_THRESHOLD", "0.4"))
 
+# Inference placement, shared with gliner2_client
+GLINER_DEVICE = os.getenv("GLINER_DEVICE", "auto")  # auto | cpu | cuda | cuda:N | mps
+GLINER_DTYPE = os.getenv("GLINER_DTYPE", "auto")  # auto (fp16 on CUDA, else fp32) | float16 | bfloat16 | float32
+GLINER_NUM_THREADS = int(os.getenv("GLINER_NUM_THREADS", "0"))  # CPU torch threads, 0 = torch default
+
 # Entity types matching HippoGraph taxonomy
 GLINER_LABELS = [
     "person", "organization", "location", "technology",
@@ -21,14 +29,48 @@ GLINER_LABELS = [
 _model = None
 _available = None
 
+# Recent predictions keyed by (text digest, labels, threshold)
+GLINER_CACHE_SIZE = int(os.getenv("GLINER_CACHE_SIZE", "8192"))
+_results_cache = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def place_model(model, name: str = "GLiNER"):
+    """
+    Move a loaded GLiNER/GLiNER2 model to GLINER_DEVICE / GLINER_DTYPE and
+    switch it to eval mode. Falls back to CPU float32 if the move fails.
+    """
+    import torch
+    device = GLINER_DEVICE
+    if device == "auto":
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+    dtype_name = GLINER_DTYPE
+    if dtype_name == "auto":
+        dtype_name = "float16" if device.startswith("cuda") else "float32"
+    if device == "cpu" and GLINER_NUM_THREADS > 0:
+        torch.set_num_threads(GLINER_NUM_THREADS)
+    try:
+        model.to(device=device, dtype=getattr(torch, dtype_name))
+    except Exception as e:
+        print(f"⚠️ {name}: cannot run on {device}/{dtype_name} ({e}), using cpu/float32")
+        model.to(device="cpu", dtype=torch.float32)
+        device, dtype_name = "cpu", "float32"
+    model.eval()
+    print(f"🖥️  {name} inference on {device} ({dtype_name})")
+    return model
+
 
 def _load_model():
     """Load GLiNER model (cached singleton)."""
     global _model
     if _model is None:
         try:
-            from gliner import GLiNER
-            _model = GLiNER.from_pretrained(GLINER_MODEL)
+            _model = place_model(__getattr__("GLiNER").from_pretrained(GLINER_MODEL), "GLiNER")
             print(f"✅ GLiNER loaded: {GLINER_MODEL}")
         except Exception as e:
             print(f"⚠️ GLiNER load failed: {e}")
@@ -36,6 +78,15 @@ def _load_model():
     return _model if _model is not False else None
 
 
+def __getattr__(name):
+    """PEP 562: import the gliner backend only when GLiNER is first touched."""
+    if name == "GLiNER":
+        from gliner import GLiNER
+        globals()[name] = GLiNER
+        return GLiNER
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def is_available() -> bool:
     """Check if GLiNER is available."""
     global _available
@@ -53,6 +104,54 @@ def reset_availability():
     global _available, _model
     _available = None
     _model = None
+    with _results_lock:
+        _results_cache.clear()
+
+
+def _text_key(text: str) -> bytes:
+    """Fixed-size cache key so cached entries don't pin long note texts."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _predict(model, text: str, labels: List[str], threshold: float) -> Optional[List[Tuple[str, str, float]]]:
+    """(entity_text, entity_type, confidence) predictions, LRU-cached; None on failure."""
+    key = (_text_key(text), tuple(labels), threshold)
+    with _results_lock:
+        cached = _results_cache.get(key)
+        if cached is not None:
+            _results_cache.move_to_end(key)
+            return cached
+
+    try:
+        predictions = model.predict_entities(text, labels, threshold=threshold)
+    except Exception as e:
+        print(f"⚠️ GLiNER extraction failed: {e}")
+        return None
+
+    seen = set()
+    entities = []
+    for pred in predictions:
+        name = pred["text"].strip()
+        etype = pred["label"]
+        score = pred.get("score", 0.8)
+
+        # Map "technology" -> "tech" for consistency with HippoGraph
+        if etype == "technology":
+            etype = "tech"
+        # Skip noise
+        if len(name) < 2:
+            continue
+        key_lower = name.lower()
+        if key_lower not in seen:
+            seen.add(key_lower)
+            entities.append((name, etype, score))
+
+    if GLINER_CACHE_SIZE > 0:
+        with _results_lock:
+            _results_cache[key] = entities
+            if len(_results_cache) > GLINER_CACHE_SIZE:
+                _results_cache.popitem(last=False)
+    return entities
 
 
 def extract_entities_gliner(text: str,
@@ -72,32 +171,10 @@ def extract_entities_gliner(text: str,
     if threshold is None:
         threshold = GLINER_THRESHOLD
 
-    try:
-        predictions = model.predict_entities(text, labels, threshold=threshold)
-
-        # Deduplicate and normalize
-        seen = set()
-        entities = []
-        for pred in predictions:
-            name = pred["text"].strip()
-            etype = pred["label"]
-
-            # Map "technology" -> "tech" for consistency with HippoGraph
-            if etype == "technology":
-                etype = "tech"
-
-            # Skip noise
-            if len(name) < 2:
-                continue
-            key = name.lower()
-            if key not in seen:
-                seen.add(key)
-                entities.append((name, etype))
-
-        return entities
-    except Exception as e:
-        print(f"⚠️ GLiNER extraction failed: {e}")
+    entities = _predict(model, text, labels, threshold)
+    if entities is None:
         return []
+    return [(name, etype) for name, etype, _ in entities]
 
 
 def extract_entities_gliner_with_confidence(
@@ -118,26 +195,7 @@ def extract_entities_gliner_with_confidence(
     if threshold is None:
         threshold = GLINER_THRESHOLD
 
-    try:
-        predictions = model.predict_entities(text, labels, threshold=threshold)
-
-        seen = set()
-        entities = []
-        for pred in predictions:
-            name = pred["text"].strip()
-            etype = pred["label"]
-            score = pred.get("score", 0.8)
-
-            if etype == "technology":
-                etype = "tech"
-            if len(name) < 2:
-                continue
-            key = name.lower()
-            if key not in seen:
-                seen.add(key)
-                entities.append((name, etype, score))
-
-        return entities
-    except Exception as e:
-        print(f"⚠️ GLiNER extraction failed: {e}")
+    entities = _predict(model, text, labels, threshold)
+    if entities is None:
         return []
+    return list(entities)
@@ -3,23 +3,83 @@
 In-Memory Graph Cache for Fast Edge Traversal
 Eliminates SQLite bottleneck in spreading activation
 """
-from typing import Dict, List, Tuple, Optional
+import os
+from typing import Dict, Iterable, List, Tuple, Optional
 from collections import defaultdict
 
+import numpy as np
+
+from graph_cache_kernels import spread as _spread_kernel, spread_active as _spread_active_kernel
+
+# Pending add_edge() entries are folded into the CSR arrays once this many accumulate
+GRAPH_CACHE_COMPACT_EVERY = int(os.getenv("GRAPH_CACHE_COMPACT_EVERY", "4096"))
+# spread() walks only the edges of active rows while they are at most this
+# fraction of all edges, and does a full pass over the CSR arrays otherwise
+GRAPH_CACHE_SPARSE_SPREAD = float(os.getenv("GRAPH_CACHE_SPARSE_SPREAD", "0.25"))
+# Edge weight storage: float32 (default) or float16 to halve traversal bandwidth;
+# activation scores are thresholded afterwards, so half precision is enough
+GRAPH_CACHE_WEIGHT_DTYPE = np.dtype(os.getenv("GRAPH_CACHE_WEIGHT_DTYPE", "float32"))
+if GRAPH_CACHE_WEIGHT_DTYPE not in (np.float32, np.float16):
+    print(f"⚠️  GRAPH_CACHE_WEIGHT_DTYPE={GRAPH_CACHE_WEIGHT_DTYPE} unsupported, using float32")
+    GRAPH_CACHE_WEIGHT_DTYPE = np.dtype(np.float32)
+
 
 class GraphCache:
     """
     In-memory cache of graph structure (edges)
     
-    Structure: {node_id: [(neighbor_id, weight, edge_type), ...]}
+    Compressed sparse row layout, both directions of every edge:
+        row = row_of[node_id]
+        indices/weights/etypes[indptr[row]:indptr[row + 1]]
+    Edge type strings live once in edge_types (etypes holds uint8 ids).
+    Edges added with add_edge() sit in a small overflow bucket until the
+    next compact() (automatic every GRAPH_CACHE_COMPACT_EVERY edges);
+    spread() scatters them on top of the CSR pass.
     """
     
     def __init__(self):
-        self.edges: Dict[int, List[Tuple[int, float, str]]] = defaultdict(list)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.neighbor_rows = np.empty(0, dtype=np.int32)
+        self.node_ids = np.empty(0, dtype=np.int64)
+        self.weights = np.empty(0, dtype=GRAPH_CACHE_WEIGHT_DTYPE)
+        self.etypes = np.empty(0, dtype=np.uint8)
+        self.row_of: Dict[int, int] = {}
+        self.edge_types: List[str] = []
+        self._edge_type_ids: Dict[str, int] = {}
+        self._pending: Dict[int, List[Tuple[int, float, int]]] = defaultdict(list)
+        self._pending_count = 0
+        self._pending_arrays = None
         self.enabled = True
         self.edge_count = 0
     
-    def build(self, all_edges: List[dict]) -> int:
+    def _edge_type_id(self, edge_type: str) -> int:
+        type_id = self._edge_type_ids.get(edge_type)
+        if type_id is None:
+            if len(self.edge_types) > np.iinfo(np.uint8).max:
+                raise ValueError(f"Too many distinct edge types for uint8 ids: {edge_type!r}")
+            type_id = len(self.edge_types)
+            self.edge_types.append(edge_type)
+            self._edge_type_ids[edge_type] = type_id
+        return type_id
+    
+    def _freeze(self, owners: np.ndarray, neighbors: np.ndarray, weights: np.ndarray, etypes: np.ndarray):
+        """Sort directed (owner -> neighbor) entries by owner into the CSR arrays."""
+        order = np.argsort(owners, kind="stable")
+        owners = owners[order]
+        node_ids, degrees = np.unique(owners, return_counts=True)
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        self.indptr = indptr
+        self.indices = neighbors[order].astype(np.int32, copy=False)
+        # Neighbors are owners too (edges are stored both ways), so each has a row
+        self.neighbor_rows = np.searchsorted(node_ids, self.indices).astype(np.int32)
+        self.node_ids = node_ids
+        self.weights = weights[order].astype(GRAPH_CACHE_WEIGHT_DTYPE, copy=False)
+        self.etypes = etypes[order].astype(np.uint8, copy=False)
+        self.row_of = {node_id: row for row, node_id in enumerate(node_ids.tolist())}
+    
+    def build(self, all_edges: Iterable[dict]) -> int:
         """
         Build cache from all edges
         
@@ -29,24 +89,155 @@ class GraphCache:
         Returns:
             Number of edges cached
         """
-        self.edges.clear()
-        self.edge_count = 0
+        self._pending.clear()
+        self._pending_count = 0
+        self._pending_arrays = None
+        self.edge_types.clear()
+        self._edge_type_ids.clear()
+        
+        all_edges = all_edges if isinstance(all_edges, list) else list(all_edges)
+        count = len(all_edges)
+        sources = np.fromiter((e["source_id"] for e in all_edges), dtype=np.int64, count=count)
+        targets = np.fromiter((e["target_id"] for e in all_edges), dtype=np.int64, count=count)
+        weights = np.fromiter((e.get("weight", 0.5) for e in all_edges), dtype=np.float64, count=count)
+        type_id = self._edge_type_id
+        type_ids = np.fromiter((type_id(e.get("edge_type", "semantic")) for e in all_edges),
+                               dtype=np.uint8, count=count)
+        self.edge_count = count
         
-        for edge in all_edges:
-            source_id = edge["source_id"]
-            target_id = edge["target_id"]
-            weight = edge.get("weight", 0.5)
-            edge_type = edge.get("edge_type", "semantic")
-            
-            # Bidirectional: source -> target and target -> source
-            self.edges[source_id].append((target_id, weight, edge_type))
-            self.edges[target_id].append((source_id, weight, edge_type))
-            
-            self.edge_count += 1
+        # Bidirectional: source -> target and target -> source
+        self._freeze(np.concatenate((sources, targets)),
+                     np.concatenate((targets, sources)),
+                     np.concatenate((weights, weights)).astype(GRAPH_CACHE_WEIGHT_DTYPE),
+                     np.concatenate((type_ids, type_ids)))
         
-        print(f"✅ Built graph cache: {self.edge_count} edges, {len(self.edges)} nodes")
+        print(f"✅ Built graph cache: {self.edge_count} edges, {len(self.row_of)} nodes")
         return self.edge_count
     
+    def compact(self):
+        """Fold pending add_edge() entries into the CSR arrays."""
+        if not self._pending:
+            return
+        owners = [np.repeat(self.node_ids, np.diff(self.indptr))]
+        neighbors, weights, etypes = [self.indices], [self.weights], [self.etypes]
+        for node_id, entries in self._pending.items():
+            ids, ws, ts = zip(*entries)
+            owners.append(np.full(len(entries), node_id, dtype=np.int64))
+            neighbors.append(np.array(ids, dtype=np.int32))
+            weights.append(np.array(ws, dtype=GRAPH_CACHE_WEIGHT_DTYPE))
+            etypes.append(np.array(ts, dtype=np.uint8))
+        self._freeze(np.concatenate(owners), np.concatenate(neighbors),
+                     np.concatenate(weights), np.concatenate(etypes))
+        self._pending.clear()
+        self._pending_count = 0
+        self._pending_arrays = None
+    
+    def pending_node_ids(self) -> np.ndarray:
+        """Sorted ids that only have pending add_edge() entries (no CSR row yet)."""
+        return np.array(sorted(nid for nid in self._pending if nid not in self.row_of), dtype=np.int64)
+    
+    def _pending_edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Pending entries as (owner ids, neighbor ids, weights, type ids), cached until the next add."""
+        if self._pending_arrays is None:
+            entries = [(owner, *entry) for owner, bucket in self._pending.items() for entry in bucket]
+            owners, neighbors, weights, etypes = zip(*entries) if entries else ((), (), (), ())
+            self._pending_arrays = (np.array(owners, dtype=np.int64), np.array(neighbors, dtype=np.int64),
+                                    np.array(weights, dtype=np.float64), np.array(etypes, dtype=np.uint8))
+        return self._pending_arrays
+    
+    def _slots(self, ids: np.ndarray, extra_ids: np.ndarray) -> np.ndarray:
+        """Map node ids to CSR rows, or to len(node_ids) + position in extra_ids."""
+        n_rows = len(self.node_ids)
+        rows = np.searchsorted(self.node_ids, ids)
+        in_csr = rows < n_rows
+        in_csr[in_csr] = self.node_ids[rows[in_csr]] == ids[in_csr]
+        missing = ids[~in_csr]
+        extra = np.searchsorted(extra_ids, missing)
+        if np.any(extra >= len(extra_ids)) or np.any(extra_ids[extra] != missing):
+            raise ValueError("extra_ids must list every pending node without a CSR row")
+        rows[~in_csr] = n_rows + extra
+        return rows
+    
+    def spread(self, activation: np.ndarray, decay: float,
+               edge_scale: Optional[Dict[str, float]] = None,
+               extra_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        One spreading-activation step over the whole graph.
+        
+        Pending add_edge() entries are scattered on top of the CSR pass, so
+        searches never force a compact().
+        
+        Args:
+            activation: Per-slot activation: CSR rows (align with node_ids / row_of),
+                then one slot per entry of extra_ids
+            decay: Multiplier applied to every propagated contribution
+            edge_scale: Optional extra weight multiplier per edge type
+            extra_ids: Sorted ids without a CSR row; must include pending_node_ids()
+        
+        Returns:
+            Array of incoming activation per slot
+        """
+        n_rows = len(self.node_ids)
+        extra_ids = np.empty(0, dtype=np.int64) if extra_ids is None else np.asarray(extra_ids, dtype=np.int64)
+        if len(activation) != n_rows + len(extra_ids):
+            raise ValueError(f"activation has {len(activation)} entries, graph cache has "
+                             f"{n_rows} rows + {len(extra_ids)} extra slots")
+        type_scale = None
+        if edge_scale:
+            type_scale = np.ones(len(self.edge_types), dtype=np.float32)
+            for edge_type, factor in edge_scale.items():
+                type_id = self._edge_type_ids.get(edge_type)
+                if type_id is not None:
+                    type_scale[type_id] = factor
+        
+        row_activation = activation[:n_rows]
+        active_rows = np.flatnonzero(row_activation)
+        active_edges = int((self.indptr[active_rows + 1] - self.indptr[active_rows]).sum())
+        if active_edges <= GRAPH_CACHE_SPARSE_SPREAD * len(self.indices):
+            incoming = _spread_active_kernel(self.indptr, self.neighbor_rows, self.weights,
+                                             row_activation, active_rows, decay, self.etypes, type_scale)
+        else:
+            weights = self.weights
+            if type_scale is not None:
+                weights = (weights * type_scale[self.etypes]).astype(weights.dtype, copy=False)
+            incoming = _spread_kernel(self.indptr, self.neighbor_rows, weights, row_activation, decay)
+        if not self._pending and not len(extra_ids):
+            return incoming
+        
+        out = np.zeros(len(activation), dtype=incoming.dtype)
+        out[:n_rows] = incoming
+        if self._pending:
+            owners, neighbors, weights, etypes = self._pending_edges()
+            contrib = activation[self._slots(owners, extra_ids)] * weights * decay
+            if type_scale is not None:
+                contrib *= type_scale[etypes]
+            scattered = np.bincount(self._slots(neighbors, extra_ids), weights=contrib, minlength=len(out))
+            out += scattered.astype(out.dtype, copy=False)
+        return out
+    
+    def get_neighbor_arrays(self, node_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get neighbors of a node as parallel arrays
+        
+        Returns:
+            (neighbor_ids int32[], weights[], edge_type_ids uint8[]);
+            weights use GRAPH_CACHE_WEIGHT_DTYPE,
+            map type ids back to strings through edge_types
+        """
+        row = self.row_of.get(node_id)
+        if row is None:
+            arrays = _EMPTY_NEIGHBORS
+        else:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            arrays = (self.indices[start:end], self.weights[start:end], self.etypes[start:end])
+        pending = self._pending.get(node_id)
+        if pending:
+            ids, weights, types = zip(*pending)
+            arrays = (np.concatenate((arrays[0], np.array(ids, dtype=np.int32))),
+                      np.concatenate((arrays[1], np.array(weights, dtype=GRAPH_CACHE_WEIGHT_DTYPE))),
+                      np.concatenate((arrays[2], np.array(types, dtype=np.uint8))))
+        return arrays
+    
     def get_neighbors(self, node_id: int) -> List[Tuple[int, float, str]]:
         """
         Get all neighbors of a node (O(1) lookup)
@@ -57,7 +248,9 @@ class GraphCache:
         Returns:
             List of (neighbor_id, weight, edge_type) tuples
         """
-        return self.edges.get(node_id, [])
+        ids, weights, types = self.get_neighbor_arrays(node_id)
+        edge_types = self.edge_types
+        return list(zip(ids.tolist(), weights.tolist(), [edge_types[t] for t in types.tolist()]))
     
     def add_edge(self, source_id: int, target_id: int, weight: float = 0.5, edge_type: str = "semantic"):
         """
@@ -69,21 +262,32 @@ class GraphCache:
             weight: Edge weight
             edge_type: Type of edge
         """
+        type_id = self._edge_type_id(edge_type)
         # Bidirectional
-        self.edges[source_id].append((target_id, weight, edge_type))
-        self.edges[target_id].append((source_id, weight, edge_type))
+        self._pending[source_id].append((target_id, weight, type_id))
+        self._pending[target_id].append((source_id, weight, type_id))
+        self._pending_count += 1
+        self._pending_arrays = None
         self.edge_count += 1
+        if self._pending_count >= GRAPH_CACHE_COMPACT_EVERY:
+            self.compact()
     
     def get_stats(self) -> dict:
         """Get cache statistics"""
+        node_count = len(self.row_of.keys() | self._pending.keys())
         return {
             "enabled": self.enabled,
             "edge_count": self.edge_count,
-            "node_count": len(self.edges),
-            "avg_degree": self.edge_count * 2 / len(self.edges) if self.edges else 0
+            "node_count": node_count,
+            "avg_degree": self.edge_count * 2 / node_count if node_count else 0
         }
 
 
+_EMPTY_NEIGHBORS = (np.empty(0, dtype=np.int32), np.empty(0, dtype=GRAPH_CACHE_WEIGHT_DTYPE), np.empty(0, dtype=np.uint8))
+for _arr in _EMPTY_NEIGHBORS:
+    _arr.flags.writeable = False
+
+
 # Global singleton
 _global_cache: Optional[GraphCache] = None
 
@@ -96,9 +300,8 @@ def get_graph_cache() -> GraphCache:
         
         # Auto-build if empty
         if _global_cache.edge_count == 0:
-            from database import get_all_edges
-            edges = get_all_edges()
-            _global_cache.build(edges)
+            from database import iter_edges
+            _global_cache.build(iter_edges())
     
     return _global_cache
 
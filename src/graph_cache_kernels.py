@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Spreading-activation kernels over the GraphCache CSR arrays.
+
+Uses numba (parallel, cached JIT) when installed; otherwise a numpy
+gather + reduceat implementation with the same results.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, parallel=True)
+    def _spread_numba(indptr, neighbor_rows, weights, activation_in, activation_out, decay):
+        # Pull form: every edge is stored in both directions with the same
+        # weight, so each row can sum its own neighbors without write races.
+        for v in prange(activation_out.size):
+            total = 0.0
+            for k in range(indptr[v], indptr[v + 1]):
+                total += activation_in[neighbor_rows[k]] * weights[k]
+            activation_out[v] = total * decay
+
+
+def _spread_numpy(indptr, neighbor_rows, weights, activation_in, activation_out, decay):
+    if neighbor_rows.size == 0:
+        activation_out[:] = 0.0
+        return
+    contrib = activation_in[neighbor_rows] * weights
+    # Every CSR row has at least one entry, so reduceat never sees an empty slice
+    np.multiply(np.add.reduceat(contrib, indptr[:-1]), decay, out=activation_out)
+
+
+def spread_active(indptr: np.ndarray, neighbor_rows: np.ndarray, weights: np.ndarray,
+                  activation_in: np.ndarray, active_rows: np.ndarray, decay: float,
+                  etypes: np.ndarray = None, type_scale: np.ndarray = None) -> np.ndarray:
+    """
+    Same result as spread(), but only walks the edges of active_rows (rows
+    with non-zero activation): push form with a bincount scatter, cheaper
+    when few rows are active. type_scale[etypes[k]] optionally scales edge k.
+    """
+    starts = indptr[active_rows]
+    counts = indptr[active_rows + 1] - starts
+    total = int(counts.sum())
+    # Edge positions of all active rows, concatenated
+    edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    contrib = np.repeat(activation_in[active_rows], counts) * weights[edges]
+    if type_scale is not None:
+        contrib *= type_scale[etypes[edges]]
+    out = np.bincount(neighbor_rows[edges], weights=contrib, minlength=len(indptr) - 1)
+    out *= decay
+    return out.astype(activation_in.dtype, copy=False)
+
+
+def spread(indptr: np.ndarray, neighbor_rows: np.ndarray, weights: np.ndarray,
+           activation_in: np.ndarray, decay: float) -> np.ndarray:
+    """
+    One propagation step: out[v] = decay * sum(activation_in[u] * w(u, v)) over neighbors u.
+    Arrays are indexed by CSR row, not node id.
+    """
+    activation_out = np.empty(len(indptr) - 1, dtype=activation_in.dtype)
+    # numba has no float16 arithmetic; half-precision weights take the numpy path
+    if NUMBA_AVAILABLE and weights.dtype != np.float16:
+        _spread_numba(indptr, neighbor_rows, weights, activation_in, activation_out, decay)
+    else:
+        _spread_numpy(indptr, neighbor_rows, weights, activation_in, activation_out, decay)
+    return activation_out
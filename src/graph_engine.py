@@ -7,20 +7,32 @@ Implements spreading activation search and automatic linking
 import numpy as np
 import os
 from late_chunking import late_chunk_encode, LC_ENABLED, LC_PARENTLESS
+import heapq
+import itertools
 import math
+import time
+from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Dict, Any
 
 from database import (
-    create_node, get_node, get_all_nodes, touch_node,
+    create_node, get_node, get_nodes_by_ids, touch_node,
     create_edge, get_connected_nodes,
     get_or_create_entity, link_node_to_entity, get_nodes_by_entity,
-    get_entity_counts_batch, get_connection
+    get_entity_counts_batch, get_connection, read_connection, unit_embedding
 )
 from stable_embeddings import get_model
 from entity_extractor import extract_entities, normalize_query
 from ann_index import get_ann_index
 from graph_cache import get_graph_cache
+from embedding_store import embedding_similarities
+from bm25_index import get_bm25_index
+from query_decomposer import decompose_temporal_query, compute_temporal_order_scores
+from temporal_extractor import extract_temporal_expressions, compute_temporal_overlap
+from rrf_fusion import FUSION_METHOD, rrf_fuse
+from reranker import get_reranker, RERANK_ENABLED, RERANK_TOP_N
+from search_logger import get_search_logger
 
 # Configuration from environment
 ACTIVATION_ITERATIONS = int(os.getenv("ACTIVATION_ITERATIONS", "3"))
@@ -42,9 +54,25 @@ KA_MIN = 80  # skip very short notes
 KA_SKIP = {'lc-chunk', 'abstract-topic', 'atomic-fact', 'keyword-anchor'}
 
 
+try:
+    from simsimd import cosine as _simd_cosine, dot as _simd_dot  # AVX2/AVX-512/NEON kernels
+except ImportError:
+    _simd_cosine = _simd_dot = None
+
+
 def cosine_similarity(a, b):
     """Calculate cosine similarity between two vectors"""
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    if _simd_cosine is not None and getattr(a, "dtype", None) == np.float32 and getattr(b, "dtype", None) == np.float32:
+        return 1.0 - float(_simd_cosine(a, b))
+    return float(np.dot(a, b) / np.sqrt(np.dot(a, a) * np.dot(b, b)))
+
+
+def cosine_similarity_normed(a, b):
+    """Cosine similarity of two unit vectors (stored embeddings are unit length,
+    see database.unit_embedding): just the dot product"""
+    if _simd_dot is not None and getattr(a, "dtype", None) == np.float32 and getattr(b, "dtype", None) == np.float32:
+        return float(_simd_dot(a, b))
+    return float(np.dot(a, b))
 
 
 # Anchor Memory: categories exempt from temporal decay
@@ -63,6 +91,17 @@ CATEGORY_DECAY_MULTIPLIERS = {
 }
 
 
+@lru_cache(maxsize=100_000)
+def _parse_iso(timestamp_str):
+    """ISO timestamp string -> epoch seconds (naive strings are local time)"""
+    return datetime.fromisoformat(timestamp_str).timestamp()
+
+
+def _age_days(timestamp_str, now_ts):
+    """Whole days since timestamp_str, floored like timedelta.days"""
+    return (now_ts - _parse_iso(timestamp_str)) // 86400
+
+
 def recency_factor(last_accessed_str, created_str=None, half_life_days=HALF_LIFE_DAYS, category=None):
     """
     Calculate temporal decay factor based on last access time.
@@ -90,8 +129,7 @@ def recency_factor(last_accessed_str, created_str=None, half_life_days=HALF_LIFE
         return 0.5
     
     try:
-        timestamp = datetime.fromisoformat(timestamp_str)
-        age_days = (datetime.now() - timestamp).days
+        age_days = _age_days(timestamp_str, time.time())
         
         # Minimum factor to prevent old notes from completely disappearing
         min_factor = 0.1
@@ -107,10 +145,17 @@ def recency_factor(last_accessed_str, created_str=None, half_life_days=HALF_LIFE
             return max(min_factor, protected_decay)
         
         return base_decay
-    except:
+    except (TypeError, ValueError, OverflowError):
         return 0.5
 
 
+IMPORTANCE_BASE_FACTORS = {
+    'critical': 1.5,
+    'normal': 1.0,
+    'low': 0.7
+}
+
+
 def importance_factor(importance, access_count=0):
     """
     Calculate importance multiplier for activation.
@@ -122,12 +167,7 @@ def importance_factor(importance, access_count=0):
     
     Also applies small boost for frequently accessed notes.
     """
-    base_factors = {
-        'critical': 1.5,
-        'normal': 1.0,
-        'low': 0.7
-    }
-    base = base_factors.get(importance, 1.0)
+    base = IMPORTANCE_BASE_FACTORS.get(importance, 1.0)
     
     # Small boost for frequently accessed notes (max +20%)
     # access_count of 10 gives +10%, 20 gives +20%
@@ -136,6 +176,48 @@ def importance_factor(importance, access_count=0):
     return base + access_boost
 
 
+# The node columns search_with_activation reads; candidates are loaded as
+# these tuples rather than full node dicts
+SearchRow = namedtuple("SearchRow", "id content category timestamp importance access_count "
+                                    "last_accessed emotional_tone emotional_intensity")
+
+
+def score_factors(nodes, half_life_days=HALF_LIFE_DAYS, now_ts=None):
+    """
+    recency_factor() * importance_factor() for a list of SearchRow nodes, as
+    one array. Only the timestamp parsing stays per node; the decay math runs
+    vectorized over the whole candidate set.
+    """
+    now_ts = now_ts or time.time()
+    count = len(nodes)
+    ages = np.full(count, np.nan)  # NaN = no usable timestamp -> 0.5
+    multipliers = np.ones(count)
+    anchors = np.zeros(count, dtype=bool)
+    base = np.ones(count)
+    access = np.zeros(count)
+    for i, node in enumerate(nodes):
+        category = node.category
+        anchors[i] = category in ANCHOR_CATEGORIES
+        multipliers[i] = CATEGORY_DECAY_MULTIPLIERS.get(category, 1.0)
+        base[i] = IMPORTANCE_BASE_FACTORS.get(node.importance, 1.0)
+        access[i] = node.access_count or 0
+        timestamp_str = node.last_accessed or node.timestamp
+        if timestamp_str:
+            try:
+                ages[i] = _age_days(timestamp_str, now_ts)
+            except (TypeError, ValueError):
+                pass
+    
+    min_factor = 0.1
+    base_decay = np.maximum(min_factor, np.power(0.5, ages / half_life_days))
+    protected_decay = np.maximum(min_factor, 1.0 - (1.0 - base_decay) * multipliers)
+    recency = np.where(multipliers < 1.0, protected_decay, base_decay)
+    recency[np.isnan(ages)] = 0.5
+    recency[anchors] = 1.0
+    
+    return recency * (base + np.minimum(0.2, access * 0.01))
+
+
 # Deduplication thresholds
 DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.95"))  # Block creation
 SIMILAR_THRESHOLD = float(os.getenv("SIMILAR_THRESHOLD", "0.90"))  # Warn about similar
@@ -149,28 +231,35 @@ def find_similar_notes(content, threshold=SIMILAR_THRESHOLD, limit=5):
     Useful for deduplication and finding related notes.
     """
     model = get_model()
-    query_emb = model.encode(content)[0]
+    query_emb = unit_embedding(model.encode(content)[0])
+    
+    ids, sims = embedding_similarities(query_emb)
+    hits = np.flatnonzero(sims >= threshold)
+    if len(hits) > limit:
+        hits = hits[np.argpartition(-sims[hits], limit - 1)[:limit]]
+    hits = hits[np.argsort(-sims[hits], kind="stable")]
+    if len(hits) == 0:
+        return []
+    
+    hit_ids = [int(i) for i in ids[hits]]
+    with read_connection() as conn:
+        rows = conn.execute(
+            f"SELECT id, substr(content, 1, 200), category FROM nodes "
+            f"WHERE id IN ({','.join('?' * len(hit_ids))})", hit_ids).fetchall()
+    meta = {row[0]: (row[1], row[2]) for row in rows}
     
-    all_nodes = get_all_nodes()
     similarities = []
-    
-    for node in all_nodes:
-        if node["embedding"] is None:
+    for node_id, idx in zip(hit_ids, hits):
+        if node_id not in meta:  # deleted since the matrix was built
             continue
-        
-        node_emb = np.frombuffer(node["embedding"], dtype=np.float32)
-        sim = cosine_similarity(query_emb, node_emb)
-        
-        if sim >= threshold:
-            similarities.append({
-                "id": node["id"],
-                "similarity": round(sim, 4),
-                "content": node["content"][:200],
-                "category": node["category"]
-            })
-    
-    similarities.sort(key=lambda x: x["similarity"], reverse=True)
-    return similarities[:limit]
+        preview, category = meta[node_id]
+        similarities.append({
+            "id": node_id,
+            "similarity": round(float(sims[idx]), 4),
+            "content": preview,
+            "category": category
+        })
+    return similarities
 
 
 
@@ -292,7 +381,7 @@ def _create_keyword_anchor(content, category, engram_id, emotional_tone, emotion
         _anchor_id = create_node(
             _anchor_text[:300],
             'keyword-anchor',
-            _anchor_emb.astype(_np.float32).tobytes(),
+            _anchor_emb,
             'low',
             emotional_tone,
             emotional_intensity,
@@ -350,6 +439,12 @@ def add_engram_with_links(content, category="general", importance="normal", forc
     # Get ANN index once (used for both duplicate check and semantic links)
     ann_index = get_ann_index()
     
+    # Without ANN, one linear scan serves both the duplicate check and the
+    # semantic links below (the new note is not stored yet, so it is not in it)
+    scan_ids = scan_sims = None
+    if not ann_index.enabled:
+        scan_ids, scan_sims = embedding_similarities(unit_embedding(embedding))
+    
     # Check for duplicates unless forced
     # OPTIMIZED: Use ANN index for O(log n) instead of O(n) linear scan
     if not force:
@@ -362,20 +457,20 @@ def add_engram_with_links(content, category="general", importance="normal", forc
                 if en: return {"error": "duplicate", "message": f"Similar note exists ({sim:.2%})", "existing_id": eid, "existing_content": en["content"][:200], "similarity": round(sim, 4)}
         else:
             # Fallback to linear scan if ANN not enabled
-            for n in get_all_nodes():
-                if n["embedding"] is None: continue
-                sim = cosine_similarity(embedding, np.frombuffer(n["embedding"], dtype=np.float32))
-                if sim >= DUPLICATE_THRESHOLD: return {"error": "duplicate", "message": f"Similar note exists ({sim:.2%})", "existing_id": n["id"], "existing_content": n["content"][:200], "similarity": round(sim, 4)}
+            best = int(np.argmax(scan_sims)) if len(scan_sims) else -1
+            if best >= 0 and scan_sims[best] >= DUPLICATE_THRESHOLD:
+                eid, sim = int(scan_ids[best]), float(scan_sims[best])
+                en = get_node(eid)
+                if en: return {"error": "duplicate", "message": f"Similar note exists ({sim:.2%})", "existing_id": eid, "existing_content": en["content"][:200], "similarity": round(sim, 4)}
     
     # Create the node with emotional context
-    engram_id = create_node(content, category, embedding.tobytes(), importance, emotional_tone, emotional_intensity, emotional_reflection, tags=tags)
+    engram_id = create_node(content, category, embedding, importance, emotional_tone, emotional_intensity, emotional_reflection, tags=tags)
     
     # Add to ANN index incrementally (enables immediate search for this note)
     if ann_index.enabled:
         ann_index.add_vector(engram_id, embedding)
     
     # Update BM25 index
-    from bm25_index import get_bm25_index
     bm25 = get_bm25_index()
     if bm25.is_built:
         bm25_text = (content + " " + (tags or "")).strip()
@@ -408,13 +503,10 @@ def add_engram_with_links(content, category="general", importance="normal", forc
         # Request 2x candidates to account for self-reference filtering
         sims = [(n,s) for n,s in ann_index.search(embedding, k=MAX_SEMANTIC_LINKS*2, min_similarity=SIMILARITY_THRESHOLD) if n!=engram_id]
     else:
-        # Fallback to linear scan if ANN not enabled
-        sims = []
-        for n in get_all_nodes():
-            if n["id"]==engram_id or n["embedding"] is None: continue
-            sim = cosine_similarity(embedding, np.frombuffer(n["embedding"], dtype=np.float32))
-            if sim >= SIMILARITY_THRESHOLD: sims.append((n["id"], sim))
-        sims.sort(key=lambda x: x[1], reverse=True)
+        # Fallback: reuse the linear scan from the duplicate check
+        hits = np.flatnonzero(scan_sims >= SIMILARITY_THRESHOLD)
+        hits = hits[np.argsort(-scan_sims[hits], kind="stable")]
+        sims = list(zip(scan_ids[hits].tolist(), scan_sims[hits].tolist()))
     
     # Create edges for top MAX_SEMANTIC_LINKS similar nodes
     for rid,sim in sims[:MAX_SEMANTIC_LINKS]:
@@ -484,7 +576,7 @@ def add_engram_with_links(content, category="general", importance="normal", forc
                 ch_engram_id = create_node(
                     ch['text'],
                     'lc-chunk',
-                    ch['embedding'].tobytes(),
+                    ch['embedding'],
                     'low',
                     emotional_tone,
                     emotional_intensity,
@@ -531,6 +623,114 @@ def add_engram_with_links(content, category="general", importance="normal", forc
     return result
 
 
+def spread_activation(graph_cache, activations, iterations, decay, subgraph_nodes=None, query_is_temporal=False):
+    """
+    Spread activation over the graph cache for a number of iterations.
+    
+    Each iteration: nodes below 0.01 drop out, every remaining node keeps
+    decay * activation and passes activation * weight * decay to each
+    neighbor (only into subgraph_nodes if given; temporal edges count 1.5x
+    for temporal queries), the third iteration applies lateral inhibition,
+    and scores are normalized to max 1.0.
+    
+    Runs as a sparse matrix-vector product over the CSR rows of graph_cache;
+    seeds without edges and nodes that only have pending (not yet compacted)
+    edges get extra slots after the last row.
+    
+    Returns:
+        {node_id: activation} for every node with non-zero activation
+    """
+    if not activations or iterations <= 0:
+        return activations
+    
+    row_ids = graph_cache.node_ids
+    n_rows = len(row_ids)
+    row_of = graph_cache.row_of
+    extra_ids = np.union1d(np.array([nid for nid in activations if nid not in row_of], dtype=np.int64),
+                           graph_cache.pending_node_ids())
+    extra_slot = {nid: n_rows + i for i, nid in enumerate(extra_ids.tolist())}
+    slot_ids = np.concatenate((row_ids, extra_ids))
+    act = np.zeros(len(slot_ids), dtype=np.float64)
+    for engram_id, activation in activations.items():
+        slot = row_of.get(engram_id)
+        act[slot if slot is not None else extra_slot[engram_id]] = activation
+    
+    target_mask = None
+    if subgraph_nodes is not None:
+        target_mask = np.isin(slot_ids, np.fromiter(subgraph_nodes, dtype=np.int64, count=len(subgraph_nodes)))
+    edge_scale = {'TEMPORAL_BEFORE': 1.5, 'TEMPORAL_AFTER': 1.5} if query_is_temporal else None
+    
+    for iteration in range(iterations):
+        act[act < 0.01] = 0.0
+        incoming = graph_cache.spread(act, decay, edge_scale=edge_scale, extra_ids=extra_ids)
+        if target_mask is not None:
+            incoming *= target_mask
+        act *= decay
+        act += incoming
+        
+        if iteration == 2 and INHIBITION_STRENGTH > 0:
+            try:
+                from graph_metrics import get_graph_metrics
+                _metrics = get_graph_metrics()
+                if _metrics.is_computed:
+                    _slots = np.flatnonzero(act)
+                    _comms = np.array([_metrics.get_community(nid) for nid in slot_ids[_slots].tolist()], dtype=np.int64)
+                    _slots, _comms = _slots[_comms != -1], _comms[_comms != -1]
+                    if _slots.size:
+                        # Everyone but the strongest node of each community is inhibited
+                        _order = np.lexsort((-act[_slots], _comms))
+                        _is_winner = np.r_[True, _comms[_order][1:] != _comms[_order][:-1]]
+                        act[_slots[_order][~_is_winner]] *= (1.0 - INHIBITION_STRENGTH * 0.5)
+            except Exception: pass
+        
+        # One reduction for the max; any active node means the normalized max is exactly 1.0
+        max_activation = act.max()
+        if max_activation > 0:
+            act /= max_activation
+        
+        active = np.flatnonzero(act)
+        if active.size:
+            print(f"  Iteration {iteration+1}: {active.size} nodes, max=1.0000, sum={act.sum():.4f}")
+    
+    return dict(zip(slot_ids[active].tolist(), act[active].tolist()))
+
+
+def weighted_blend(node_ids, weighted_signals):
+    """
+    sum(weight * signal.get(node_id, 0.0)) for every node id, as an array.
+    
+    weighted_signals is a list of (weight, {node_id: score}); terms with a
+    zero weight or an empty signal are skipped instead of multiplied out,
+    so the common alpha/beta-only profile costs two vector passes.
+    """
+    total = np.zeros(len(node_ids))
+    for weight, signal in weighted_signals:
+        if weight and signal:
+            total += weight * np.fromiter((signal.get(nid, 0.0) for nid in node_ids),
+                                          dtype=np.float64, count=len(node_ids))
+    return total
+
+
+def _ranked_items(scores, head):
+    """
+    Rank scores.items() by descending score (ties in insertion order, like a
+    stable sort) without sorting everything up front.
+    
+    Returns:
+        (top, rest): the first `head` items as a list (heap selection), and a
+        lazy iterator over the remaining items that sorts them only if
+        consumed. Both reflect the scores at call time.
+    """
+    items = list(scores.items())
+    top = heapq.nlargest(head, items, key=lambda x: x[1])
+    
+    def rest():
+        if len(items) > len(top):
+            yield from sorted(items, key=lambda x: x[1], reverse=True)[len(top):]
+    
+    return top, rest()
+
+
 def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, decay=ACTIVATION_DECAY, 
                           category_filter=None, time_after=None, time_before=None, entity_type_filter=None):
     """
@@ -562,8 +762,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     
     # Initialize search logger
     try:
-        from search_logger import SearchLogger
-        slog = SearchLogger()
+        slog = get_search_logger()
         slog.start()
     except Exception:
         slog = None
@@ -573,7 +772,6 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     temporal_direction = None
     search_query = query
     try:
-        from query_decomposer import decompose_temporal_query
         search_query, query_is_temporal, temporal_direction = decompose_temporal_query(query)
         if query_is_temporal:
             print(f"🕐 Temporal query detected (direction={temporal_direction}): '{query}' → content='{search_query}'")
@@ -581,7 +779,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
         pass
     
     search_query = normalize_query(search_query)
-    query_emb = model.encode(search_query)[0]
+    query_emb = unit_embedding(model.encode(search_query)[0])
     if slog: slog.mark("embedding")
 
     # M3 variant 3: detect identity/consciousness queries -> boost self-ref categories in SA
@@ -599,7 +797,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     _q_lower = search_query.lower()
     _is_identity_query = any(kw in _q_lower for kw in IDENTITY_KEYWORDS)
 
-    all_nodes = get_all_nodes()
+    graph_cache = get_graph_cache()
     
     # Step 1: Initialize activation from semantic similarity
     # Try ANN index first (O(log n)), fallback to linear scan (O(n))
@@ -615,59 +813,59 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
             semantic_sims[engram_id] = sim
     else:
         # Fallback: linear scan through all nodes
-        for node in all_nodes:
-            if node["embedding"] is None:
-                continue
-            node_emb = np.frombuffer(node["embedding"], dtype=np.float32)
-            sim = cosine_similarity(query_emb, node_emb)
-            if sim >= 0.3:
-                activations[node["id"]] = sim
-                semantic_sims[node["id"]] = sim
+        ids, all_sims = embedding_similarities(query_emb)
+        hits = np.flatnonzero(all_sims >= 0.3)
+        for engram_id, sim in zip(ids[hits].tolist(), all_sims[hits].tolist()):
+            activations[engram_id] = sim
+            semantic_sims[engram_id] = sim
         print(f"⚠️  Linear search: {len(activations)} initial candidates (ANN disabled)")
     
     if slog: slog.mark("ann")
 
     # M3 variant 3: apply identity boost to self-ref nodes if identity query detected
     if _is_identity_query and IDENTITY_BOOST > 0:
-        for node in all_nodes:
-            if node.get('category') in IDENTITY_BOOST_CATS:
-                nid = node['id']
-                if nid in activations:
-                    activations[nid] = min(1.0, activations[nid] + IDENTITY_BOOST)
-                else:
-                    # Also add nodes not in ANN top-k but in self-ref categories
-                    if node.get('embedding'):
-                        node_emb = np.frombuffer(node['embedding'], dtype=np.float32)
-                        sim = cosine_similarity(query_emb, node_emb)
-                        if sim >= 0.1:  # low threshold for identity nodes
-                            activations[nid] = sim + IDENTITY_BOOST
-                            semantic_sims[nid] = sim
+        with read_connection() as conn:
+            identity_rows = conn.execute(
+                f"SELECT id, embedding FROM nodes WHERE category IN ({','.join('?' * len(IDENTITY_BOOST_CATS))})",
+                tuple(IDENTITY_BOOST_CATS)).fetchall()
+        for nid, embedding in identity_rows:
+            if nid in activations:
+                activations[nid] = min(1.0, activations[nid] + IDENTITY_BOOST)
+            else:
+                # Also add nodes not in ANN top-k but in self-ref categories
+                if embedding:
+                    node_emb = np.frombuffer(embedding, dtype=np.float32)
+                    sim = cosine_similarity_normed(query_emb, node_emb)
+                    if sim >= 0.1:  # low threshold for identity nodes
+                        activations[nid] = sim + IDENTITY_BOOST
+                        semantic_sims[nid] = sim
 
     # Prospective Memory: boost pending intentions
     PROSPECTIVE_BOOST = float(os.getenv('PROSPECTIVE_BOOST', '0.20'))
     if PROSPECTIVE_BOOST > 0:
-        for node in all_nodes:
-            if node.get('category') == 'prospective' and node.get('tags') and 'pending' in str(node.get('tags', '')):
-                nid = node['id']
-                if nid in activations:
-                    activations[nid] = min(1.0, activations[nid] + PROSPECTIVE_BOOST)
-                elif node.get('embedding'):
-                    node_emb = np.frombuffer(node['embedding'], dtype=np.float32)
-                    sim = cosine_similarity(query_emb, node_emb)
-                    if sim >= 0.05:  # very low threshold - pending intentions should always surface
-                        activations[nid] = sim + PROSPECTIVE_BOOST
-                        semantic_sims[nid] = sim
+        with read_connection() as conn:
+            prospective_rows = conn.execute(
+                "SELECT id, embedding FROM nodes "
+                "WHERE category = 'prospective' AND instr(tags, 'pending') > 0").fetchall()
+        for nid, embedding in prospective_rows:
+            if nid in activations:
+                activations[nid] = min(1.0, activations[nid] + PROSPECTIVE_BOOST)
+            elif embedding:
+                node_emb = np.frombuffer(embedding, dtype=np.float32)
+                sim = cosine_similarity_normed(query_emb, node_emb)
+                if sim >= 0.05:  # very low threshold - pending intentions should always surface
+                    activations[nid] = sim + PROSPECTIVE_BOOST
+                    semantic_sims[nid] = sim
 
     # Step 2a: Build subgraph (Subgraph Sampling optimization)
     import os as _os
     sa_subgraph = _os.getenv("SA_SUBGRAPH_ENABLED", "true").lower() == "true"
     if sa_subgraph and activations:
-        graph_cache = get_graph_cache()
         subgraph_nodes = set(activations.keys())
         for seed_id in list(activations.keys()):
             for neighbor_id, _, _ in graph_cache.get_neighbors(seed_id):
                 subgraph_nodes.add(neighbor_id)
-        print(f"  Subgraph: {len(subgraph_nodes)} nodes (from {len(activations)} ANN seeds, full graph={len(get_all_nodes())})") 
+        print(f"  Subgraph: {len(subgraph_nodes)} nodes (from {len(activations)} ANN seeds, full graph={len(graph_cache.row_of)})")
     else:
         subgraph_nodes = None
 
@@ -683,12 +881,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
                 if comm != -1:
                     seed_communities.add(comm)
             if seed_communities:
-                graph_cache = get_graph_cache()
-                community_nodes = set()
-                all_nodes_list = get_all_nodes()
-                for node in all_nodes_list:
-                    if metrics.get_community(node['id']) in seed_communities:
-                        community_nodes.add(node['id'])
+                community_nodes = metrics.get_community_members(seed_communities)
                 boundary = community_nodes.copy()
                 for nid in boundary:
                     for neighbor_id, _, _ in graph_cache.get_neighbors(nid):
@@ -703,55 +896,8 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
             print('  Community routing skipped: {}'.format(e))
 
     # Step 2: Spreading activation with normalization and damping
-    for iteration in range(iterations):
-        new_activations = {}
-        
-        for engram_id, activation in activations.items():
-            if activation < 0.01:
-                continue
-            
-            new_activations[engram_id] = new_activations.get(engram_id, 0) + activation * decay
-            
-            graph_cache = get_graph_cache()
-            neighbors = graph_cache.get_neighbors(engram_id)
-            for neighbor_id, edge_weight, edge_type in neighbors:
-                
-                if subgraph_nodes is not None and neighbor_id not in subgraph_nodes:
-                    continue
-                
-                spread = activation * edge_weight * decay
-                
-                if query_is_temporal and edge_type in ('TEMPORAL_BEFORE', 'TEMPORAL_AFTER'):
-                    spread *= 1.5
-
-                new_activations[neighbor_id] = new_activations.get(neighbor_id, 0) + spread
-        
-        if iteration == 2 and INHIBITION_STRENGTH > 0 and new_activations:
-            try:
-                from graph_metrics import get_graph_metrics
-                _metrics = get_graph_metrics()
-                if _metrics.is_computed:
-                    _comm_groups = {}
-                    for _nid, _score in new_activations.items():
-                        _comm = _metrics.get_community(_nid)
-                        if _comm != -1: _comm_groups.setdefault(_comm, []).append((_nid, _score))
-                    for _c_id, _m_list in _comm_groups.items():
-                        _win_id, _win_score = max(_m_list, key=lambda x: x[1])
-                        for _nid, _score in _m_list:
-                            if _nid != _win_id:
-                                new_activations[_nid] *= (1.0 - INHIBITION_STRENGTH * 0.5)
-            except Exception: pass
-
-        if new_activations:
-            max_activation = max(new_activations.values())
-            if max_activation > 0:
-                for engram_id in new_activations:
-                    new_activations[engram_id] /= max_activation
-        
-        activations = new_activations
-        
-        if activations:
-            print(f"  Iteration {iteration+1}: {len(activations)} nodes, max={max(activations.values()):.4f}, sum={sum(activations.values()):.4f}")
+    activations = spread_activation(graph_cache, activations, iterations, decay,
+                                    subgraph_nodes=subgraph_nodes, query_is_temporal=query_is_temporal)
 
     if slog: slog.mark("spreading")
 
@@ -759,7 +905,6 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     import os as _os_m1
     if _os_m1.getenv('LC_MODE', 'parent').lower() == 'parentless' and activations:
         try:
-            graph_cache_m1 = get_graph_cache()
             parent_map = {}
 
             def _find(x):
@@ -774,7 +919,7 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
                     parent_map[rb] = ra
 
             for nid in list(activations.keys()):
-                for neighbor_id, _, edge_type in graph_cache_m1.get_neighbors(nid):
+                for neighbor_id, _, edge_type in graph_cache.get_neighbors(nid):
                     if edge_type == 'NEXT_CHUNK' and neighbor_id in activations:
                         _union(nid, neighbor_id)
 
@@ -800,18 +945,14 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     # === end M1 ===
 
     # Step 3: Apply temporal decay and importance scoring
-    node_map = {n["id"]: n for n in all_nodes}
-    for engram_id in activations:
-        if engram_id in node_map:
-            node = node_map[engram_id]
-            last_accessed = node.get("last_accessed")
-            created = node.get("timestamp")
-            importance = node.get("importance", "normal")
-            access_count = node.get("access_count", 0)
-            category = node.get("category", "general")
-            
-            activations[engram_id] *= recency_factor(last_accessed, created, category=category)
-            activations[engram_id] *= importance_factor(importance, access_count)
+    # Only candidate rows are loaded (no embeddings); BM25/temporal-only
+    # candidates are added to node_map after they are scored
+    node_map = get_nodes_by_ids(activations, row_type=SearchRow)
+    scored_ids = [engram_id for engram_id in activations if engram_id in node_map]
+    if scored_ids:
+        factors = score_factors([node_map[engram_id] for engram_id in scored_ids])
+        for engram_id, factor in zip(scored_ids, factors.tolist()):
+            activations[engram_id] *= factor
     
     # Step 4: Blend scoring
     if activations:
@@ -840,7 +981,6 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     
     bm25_scores = {}
     if gamma > 0:
-        from bm25_index import get_bm25_index
         bm25_raw = get_bm25_index().search(query, top_k=100)
         if bm25_raw:
             max_bm25 = max(bm25_raw.values())
@@ -853,42 +993,47 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     temporal_scores = {}
     if delta > 0 or query_is_temporal:
         try:
-            from temporal_extractor import extract_temporal_expressions, compute_temporal_overlap
             query_temporal = extract_temporal_expressions(query)
-            if query_temporal["t_event_start"] and query_temporal["t_event_end"]:
-                with get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id, t_event_start, t_event_end FROM nodes WHERE t_event_start IS NOT NULL")
-                    for row in cursor.fetchall():
-                        nid, ns, ne = row
-                        overlap = compute_temporal_overlap(
-                            query_temporal["t_event_start"], query_temporal["t_event_end"], ns, ne)
-                        if overlap > 0:
-                            temporal_scores[nid] = overlap
+            has_range = bool(query_temporal["t_event_start"] and query_temporal["t_event_end"])
+            order_ids = set()
+            if query_is_temporal and temporal_direction:
+                order_ids = set(activations.keys()) | set(bm25_scores.keys())
+            # One read serves both signals: every note with an event range
+            # (overlap) plus the candidates (order by event or creation time)
+            conditions, params = [], []
+            if has_range:
+                conditions.append("t_event_start IS NOT NULL")
+            if order_ids:
+                conditions.append(f"id IN ({','.join('?' * len(order_ids))})")
+                params.extend(order_ids)
+            rows = []
+            if conditions:
+                with read_connection() as conn:
+                    rows = conn.execute(
+                        "SELECT id, timestamp, t_event_start, t_event_end FROM nodes "
+                        f"WHERE {' OR '.join(conditions)} ORDER BY id", params).fetchall()
+            
+            if has_range:
+                for nid, _, ns, ne in rows:
+                    if ns is None:
+                        continue
+                    overlap = compute_temporal_overlap(
+                        query_temporal["t_event_start"], query_temporal["t_event_end"], ns, ne)
+                    if overlap > 0:
+                        temporal_scores[nid] = overlap
                 print(f"🕐 Temporal overlap: {len(temporal_scores)} notes matched")
             
-            if query_is_temporal and temporal_direction:
-                from query_decomposer import compute_temporal_order_score
-                candidate_ids = set(activations.keys()) | set(bm25_scores.keys())
-                if candidate_ids:
-                    node_timestamps = {}
-                    with get_connection() as conn:
-                        cursor = conn.cursor()
-                        placeholders = ','.join('?' * len(candidate_ids))
-                        cursor.execute(f"SELECT id, timestamp, t_event_start FROM nodes WHERE id IN ({placeholders})", 
-                                      list(candidate_ids))
-                        for row in cursor.fetchall():
-                            nid = row[0]
-                            ts = row[2] if row[2] else row[1]
-                            if ts:
-                                node_timestamps[nid] = ts
-                    
-                    all_ts = list(node_timestamps.values())
-                    for nid, ts in node_timestamps.items():
-                        order_score = compute_temporal_order_score(ts, temporal_direction, all_ts)
-                        existing = temporal_scores.get(nid, 0.0)
-                        temporal_scores[nid] = max(existing, order_score)
-                    print(f"🕐 Temporal order ({temporal_direction}): {len(node_timestamps)} notes scored")
+            if order_ids:
+                node_timestamps = {}
+                for nid, ts, ns, _ in rows:
+                    if nid in order_ids and (ns or ts):
+                        node_timestamps[nid] = ns or ts
+                
+                order_scores = compute_temporal_order_scores(node_timestamps, temporal_direction)
+                for nid, order_score in order_scores.items():
+                    existing = temporal_scores.get(nid, 0.0)
+                    temporal_scores[nid] = max(existing, order_score)
+                print(f"🕐 Temporal order ({temporal_direction}): {len(node_timestamps)} notes scored")
         except Exception as e:
             print(f"⚠️ Temporal scoring failed: {e}")
     
@@ -900,9 +1045,10 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     if slog: slog.mark("temporal")
     
     all_engram_ids = set(activations.keys()) | set(bm25_scores.keys()) | set(temporal_scores.keys())
+    node_map.update(get_nodes_by_ids(all_engram_ids - node_map.keys(), row_type=SearchRow))
     
-    from rrf_fusion import FUSION_METHOD, rrf_fuse
-    
+    # Fusion and the score penalties below run on arrays aligned to
+    # blend_ids; blended becomes a dict again for the per-node steps after them
     if FUSION_METHOD == "rrf":
         signals = [
             ("semantic", sem_normalized),
@@ -910,50 +1056,49 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
             ("bm25", bm25_scores),
             ("temporal", temporal_scores),
         ]
-        blended = rrf_fuse(signals)
+        fused = rrf_fuse(signals)
+        blend_ids = list(fused)
+        blend_scores = np.fromiter(fused.values(), dtype=np.float64, count=len(fused))
     else:
-        for engram_id in all_engram_ids:
-            sem = sem_normalized.get(engram_id, 0.0)
-            spread = spread_normalized.get(engram_id, 0.0)
-            bm25 = bm25_scores.get(engram_id, 0.0)
-            temp = temporal_scores.get(engram_id, 0.0)
-            blended[engram_id] = alpha * sem + beta * spread + gamma * bm25 + effective_delta * temp
+        blend_ids = list(all_engram_ids)
+        blend_scores = weighted_blend(blend_ids, [
+            (alpha, sem_normalized),
+            (beta, spread_normalized),
+            (gamma, bm25_scores),
+            (effective_delta, temporal_scores),
+        ])
     
-    print(f"🔀 {FUSION_METHOD.upper()} scoring: {len(blended)} nodes scored")
+    print(f"🔀 {FUSION_METHOD.upper()} scoring: {len(blend_ids)} nodes scored")
     
+    # Hub penalty: notes with more than 20 entities scale by 20 / count
     entity_counts = get_entity_counts_batch()
-    for engram_id in blended:
-        ec = entity_counts.get(engram_id, 0)
-        if ec > 20:
-            blended[engram_id] *= 20.0 / ec
+    ec = np.fromiter((entity_counts.get(nid, 0) for nid in blend_ids), dtype=np.float64, count=len(blend_ids))
+    blend_scores *= 20.0 / np.maximum(ec, 20.0)
     
-    graph_cache = get_graph_cache()
-    for engram_id in list(blended.keys()):
+    blend_index = {nid: i for i, nid in enumerate(blend_ids)}
+    for i, engram_id in enumerate(blend_ids):
         for neighbor_id, _, edge_type in graph_cache.get_neighbors(engram_id):
-            if edge_type == 'CONTRADICTS' and neighbor_id in blended:
-                if blended[neighbor_id] > 0.3:
-                    blended[engram_id] *= 0.3
+            if edge_type == 'CONTRADICTS' and neighbor_id in blend_index:
+                if blend_scores[blend_index[neighbor_id]] > 0.3:
+                    blend_scores[i] *= 0.3
                     break
 
-    if INHIBITION_STRENGTH > 0 and blended:
+    if INHIBITION_STRENGTH > 0 and blend_ids:
         try:
             from graph_metrics import get_graph_metrics
             _metrics = get_graph_metrics()
             if _metrics.is_computed:
-                _comm_groups = {}
-                for _nid, _score in blended.items():
-                    _comm = _metrics.get_community(_nid)
-                    if _comm != -1:
-                        _comm_groups.setdefault(_comm, []).append((_nid, _score))
-                for _comm_id, _members in _comm_groups.items():
-                    if len(_members) < 2:
-                        continue
-                    _winner_id = max(_members, key=lambda x: x[1])[0]
-                    for _nid, _score in _members:
-                        if _nid != _winner_id:
-                            blended[_nid] *= (1.0 - INHIBITION_STRENGTH)
+                _comms = np.array([_metrics.get_community(nid) for nid in blend_ids], dtype=np.int64)
+                _rows = np.flatnonzero(_comms != -1)
+                if _rows.size:
+                    # Everyone but the strongest node of each community is inhibited
+                    _order = _rows[np.lexsort((-blend_scores[_rows], _comms[_rows]))]
+                    _is_winner = np.r_[True, _comms[_order][1:] != _comms[_order][:-1]]
+                    blend_scores[_order[~_is_winner]] *= (1.0 - INHIBITION_STRENGTH)
         except Exception:
             pass
+    
+    blended = dict(zip(blend_ids, blend_scores.tolist()))
 
     # M4: Chunk-aware inhibition — stronger suppression within same lc-chunk ring
     # lc-chunks sharing the same PART_OF parent get extra penalty
@@ -990,15 +1135,14 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
         except Exception as _m4e:
             pass  # never block retrieval
 
-    from reranker import get_reranker, RERANK_ENABLED, RERANK_TOP_N
     if RERANK_ENABLED:
         reranker = get_reranker()
         if reranker.is_available:
-            pre_sorted = sorted(blended.items(), key=lambda x: x[1], reverse=True)[:RERANK_TOP_N]
+            pre_sorted = heapq.nlargest(RERANK_TOP_N, blended.items(), key=lambda x: x[1])
             rerank_candidates = []
             for engram_id, score in pre_sorted:
                 node = node_map.get(engram_id)
-                content = node.get("content", "") if node else ""
+                content = node.content if node else ""
                 rerank_candidates.append((engram_id, score, content))
             
             reranked = reranker.rerank(query, rerank_candidates, top_k=RERANK_TOP_N)
@@ -1007,9 +1151,11 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
     
     if slog: slog.mark("rerank")
     
-    sorted_nodes = sorted(blended.items(), key=lambda x: x[1], reverse=True)
+    # Filters below reject some candidates; rank a few times `limit` up front
+    top_nodes, other_nodes = _ranked_items(blended, max(limit * 4, 10))
+    sorted_nodes = itertools.chain(top_nodes, other_nodes)
     
-    for engram_id, _ in sorted_nodes[:10]:
+    for engram_id, _ in top_nodes[:10]:
         if engram_id not in node_map:
             print(f"⚠️  NODE {engram_id} in blended but NOT in node_map")
             break
@@ -1031,6 +1177,15 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
         _fact_parent_cache[fact_engram_id] = parent_id
         return parent_id
 
+    entity_type_ids = None
+    if entity_type_filter:
+        with read_connection() as conn:
+            entity_type_ids = {row[0] for row in conn.execute("""
+                SELECT DISTINCT ne.node_id FROM node_entities ne
+                JOIN entities e ON ne.entity_id = e.id
+                WHERE e.entity_type = ?
+            """, (entity_type_filter,))}
+
     results = []
     seen_ids = set()
     for engram_id, activation in sorted_nodes:
@@ -1039,28 +1194,22 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
             continue
 
         # abstract-topic: exclude entirely
-        if node.get("category") == 'abstract-topic':
+        if node.category == 'abstract-topic':
             continue
 
         # atomic-fact / enriched-fragment / keyword-anchor: replace with parent (Small-to-Big)
-        if node.get("category") in ('atomic-fact', 'enriched-fragment', 'keyword-anchor'):
+        if node.category in ('atomic-fact', 'enriched-fragment', 'keyword-anchor'):
             parent_id = _get_fact_parent(engram_id)
             if parent_id and parent_id not in seen_ids:
                 parent_node = node_map.get(parent_id)
                 if not parent_node:
                     try:
-                        with get_connection() as conn_p:
-                            row = conn_p.execute(
-                                'SELECT id, content, category, importance, emotional_tone, '
-                                'emotional_intensity, timestamp FROM nodes WHERE id=?',
-                                (parent_id,)
-                            ).fetchone()
-                            if row:
-                                parent_node = dict(row)
-                                node_map[parent_id] = parent_node
+                        parent_node = get_nodes_by_ids([parent_id], row_type=SearchRow).get(parent_id)
+                        if parent_node:
+                            node_map[parent_id] = parent_node
                     except Exception:
                         pass
-                if parent_node and parent_node.get("category") not in ('abstract-topic', 'atomic-fact', 'enriched-fragment'):
+                if parent_node and parent_node.category not in ('abstract-topic', 'atomic-fact', 'enriched-fragment'):
                     blended[parent_id] = max(blended.get(parent_id, 0), activation * 1.2)
                     node = parent_node
                     engram_id = parent_id
@@ -1069,28 +1218,19 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
             else:
                 continue
 
-        if category_filter and node.get("category") != category_filter:
+        if category_filter and node.category != category_filter:
             continue
         
         if time_after or time_before:
-            node_timestamp = node.get("timestamp")
+            node_timestamp = node.timestamp
             if node_timestamp:
                 if time_after and node_timestamp < time_after:
                     continue
                 if time_before and node_timestamp > time_before:
                     continue
         
-        if entity_type_filter:
-            with get_connection() as conn:
-                has_entity_type = conn.execute("""
-                    SELECT 1 FROM node_entities ne
-                    JOIN entities e ON ne.entity_id = e.id
-                    WHERE ne.node_id = ? AND e.entity_type = ?
-                    LIMIT 1
-                """, (engram_id, entity_type_filter)).fetchone()
-            
-            if not has_entity_type:
-                continue
+        if entity_type_ids is not None and engram_id not in entity_type_ids:
+            continue
             
         touch_node(engram_id)
         if engram_id in seen_ids:
@@ -1098,13 +1238,13 @@ def search_with_activation(query, limit=5, iterations=ACTIVATION_ITERATIONS, dec
         seen_ids.add(engram_id)
         results.append({
             "id": engram_id,
-            "content": node["content"],
-            "category": node["category"],
+            "content": node.content,
+            "category": node.category,
             "activation": round(activation, 4),
-            "timestamp": node.get("timestamp"),
-            "importance": node.get("importance", "normal"),
-            "emotional_tone": node.get("emotional_tone"),
-            "emotional_intensity": node.get("emotional_intensity", 5)
+            "timestamp": node.timestamp,
+            "importance": node.importance,
+            "emotional_tone": node.emotional_tone,
+            "emotional_intensity": node.emotional_intensity
         })
         
         if len(results) >= limit:
@@ -1193,6 +1333,14 @@ def estimate_tokens(text):
     """Rough token estimation: ~4 chars per token"""
     return len(text) // 4
 
+def estimate_results_tokens(results):
+    """
+    estimate_tokens(str(results)) for a list, without building the whole
+    string: str(list) is "[" + ", ".join(map(repr, items)) + "]".
+    """
+    chars = 2 + 2 * max(len(results) - 1, 0) + sum(len(repr(r)) for r in results)
+    return chars // 4
+
 def search_with_activation_protected(query, limit=5, max_results=10, detail_mode="full",
                                    iterations=ACTIVATION_ITERATIONS, decay=ACTIVATION_DECAY, 
                                    category_filter=None, time_after=None, time_before=None, 
@@ -1224,7 +1372,7 @@ def search_with_activation_protected(query, limit=5, max_results=10, detail_mode
         "total_activated": total_activated,
         "returned": len(formatted_results),
         "detail_mode": detail_mode,
-        "estimated_tokens": estimate_tokens(str(formatted_results)),
+        "estimated_tokens": estimate_results_tokens(formatted_results),
         "truncated": total_activated > len(formatted_results),
         "has_more": total_activated > len(formatted_results)
     }
@@ -3,87 +3,555 @@
 Graph Metrics for Neural Memory Graph
 Computes PageRank and community detection, cached at startup.
 """
+import glob
+import hashlib
+import heapq
+import itertools
 import os
+import threading
 import time
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 # PageRank weight in final scoring (small boost, not dominant)
 PAGERANK_BOOST = float(os.getenv("PAGERANK_BOOST", "0.1"))
 COMMUNITY_RESOLUTION = float(os.getenv("COMMUNITY_RESOLUTION", "2.0"))  # Higher = more sub-communities
+# greedy = networkx greedy modularity (default); louvain = igraph multilevel
+# (C, needs python-igraph), else networkx louvain_communities
+COMMUNITY_ALGORITHM = os.getenv("COMMUNITY_ALGORITHM", "greedy").lower()
+COMMUNITY_SEED = 42
+# Components at least this large use networkit's parallel Louvain (PLM) when
+# networkit is installed, whichever COMMUNITY_ALGORITHM is set
+COMMUNITY_PARALLEL_MIN_NODES = int(os.getenv("COMMUNITY_PARALLEL_MIN_NODES", "100000"))
+# Otherwise, components larger than this run detection on their strongest
+# COMM_MAX_NODES nodes only; the rest join their neighbors' community (0 = no cap)
+COMMUNITY_MAX_NODES = int(os.getenv("COMM_MAX_NODES", "50000"))
+PAGERANK_ALPHA = 0.85
+PAGERANK_MAX_ITER = 500
+PAGERANK_TOL = 1e-4
+# Scores and the transition matrix are float32: half the bytes per mat-vec
+# step, and ~1e-7 relative error is far below PAGERANK_TOL
+PAGERANK_DTYPE = np.float32
+# GraphMetrics.update(): edge deltas up to this fraction of the edge count
+# warm-start from the previous scores; larger ones restart from uniform
+PAGERANK_INCREMENTAL_MAX_DELTA = float(os.getenv("PAGERANK_INCREMENTAL_MAX_DELTA", "0.05"))
+# compute() stores PageRank + communities here, keyed by a hash of the graph
+# and settings, and reuses them when called again on an identical graph
+# (e.g. restarts). Only the latest result is kept. Empty = disabled.
+GRAPH_METRICS_CACHE_DIR = os.getenv("GRAPH_METRICS_CACHE_DIR", "")
+
+
+def _first_occurrences(ids: np.ndarray) -> np.ndarray:
+    """Unique values of ids in order of first appearance."""
+    _, first = np.unique(ids, return_index=True)
+    return ids[np.sort(first)]
+
+
+_EDGE_DTYPE = np.dtype([("src", np.int64), ("tgt", np.int64), ("weight", np.float64)])
+
+
+def _edge_arrays(edges: Iterable[Tuple[int, int, float]],
+                 count: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (source ids, target ids, weights) arrays of (src, tgt, weight) tuples.
+    edges is consumed once, so it can be a generator or a DB cursor;
+    count (or len(edges), if it has one) preallocates the arrays.
+    """
+    if count is None and hasattr(edges, "__len__"):
+        count = len(edges)
+    rows = np.fromiter(edges, dtype=_EDGE_DTYPE, count=-1 if count is None else count)
+    return (np.ascontiguousarray(rows["src"]), np.ascontiguousarray(rows["tgt"]),
+            np.ascontiguousarray(rows["weight"]))
+
+
+def _index_edges(src_ids: np.ndarray, tgt_ids: np.ndarray, weights: np.ndarray,
+                 nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Map edges given by node id onto contiguous node indices.
+    
+    Returns (nodes, src, tgt, weights): nodes are the given (unique) nodes
+    followed by any edge endpoints missing from them (first-appearance
+    order, as a networkx graph built edge by edge would hold them); src/tgt
+    index into nodes. Repeated (source, target) pairs keep the last weight.
+    """
+    count = len(src_ids)
+    endpoints = np.column_stack((src_ids, tgt_ids)).ravel()
+    missing = endpoints[~np.isin(endpoints, nodes)]
+    if missing.size:
+        nodes = np.concatenate((nodes, _first_occurrences(missing)))
+    
+    sorter = np.argsort(nodes, kind="stable")
+    src = sorter[np.searchsorted(nodes, src_ids, sorter=sorter)]
+    tgt = sorter[np.searchsorted(nodes, tgt_ids, sorter=sorter)]
+    
+    # Last weight wins for repeated pairs
+    keys = src * len(nodes) + tgt
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = np.sort(count - 1 - last)
+    return nodes, src[keep], tgt[keep], weights[keep]
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _pagerank_step_numba(indptr, indices, data, x, x_new, dangling, alpha, teleport):
+        # One power-iteration step over the transposed transition matrix
+        # (pull form, one target row per thread); returns the L1 change
+        n = x.size
+        dangle = 0.0
+        for k in range(dangling.size):
+            dangle += x[dangling[k]]
+        dangle /= n
+        err = 0.0
+        for i in prange(n):
+            total = 0.0
+            for k in range(indptr[i], indptr[i + 1]):
+                total += data[k] * x[indices[k]]
+            value = alpha * (total + dangle) + teleport
+            x_new[i] = value
+            err += abs(value - x[i])
+        return err
+
+
+def _pagerank_csr(src: np.ndarray, tgt: np.ndarray, weights: np.ndarray, n: int,
+                  alpha: float = PAGERANK_ALPHA, max_iter: int = PAGERANK_MAX_ITER,
+                  tol: float = PAGERANK_TOL, x0: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    Weighted PageRank by power iteration on a scipy CSR matrix, with the
+    same update and stopping rule as networkx.pagerank (uniform teleport,
+    dangling mass spread uniformly, stop when the L1 change < n * tol).
+    Starts from x0 (summing to 1) when given, else from uniform scores.
+    Iterates in PAGERANK_DTYPE; returns None if it does not converge
+    within max_iter.
+    
+    Iterates with a parallel numba kernel when numba is installed, otherwise
+    with scipy's sparse mat-vec.
+    """
+    import scipy.sparse as sp
+    
+    adjacency = sp.csr_matrix((weights, (src, tgt)), shape=(n, n))
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    out_inv = np.zeros(n)
+    np.divide(1.0, out_weight, out=out_inv, where=out_weight != 0)
+    # transition.T @ x == x @ transition: row-stochastic rows, pulled per target
+    transition_t = (sp.diags(out_inv) @ adjacency).T.tocsr().astype(PAGERANK_DTYPE)
+    dangling = np.flatnonzero(out_weight == 0)
+    teleport = (1.0 - alpha) / n
+    
+    x = np.full(n, 1.0 / n, dtype=PAGERANK_DTYPE) if x0 is None else np.array(x0, dtype=PAGERANK_DTYPE)
+    if NUMBA_AVAILABLE:
+        x_new = np.empty(n, dtype=PAGERANK_DTYPE)
+        for _ in range(max_iter):
+            err = _pagerank_step_numba(transition_t.indptr, transition_t.indices, transition_t.data,
+                                       x, x_new, dangling, alpha, teleport)
+            x, x_new = x_new, x
+            if err < n * tol:
+                return x
+        return None
+    
+    for _ in range(max_iter):
+        x_last = x
+        x = alpha * (transition_t @ x_last + x_last[dangling].sum() / n) + teleport
+        if np.abs(x - x_last).sum() < n * tol:
+            return x
+    return None
+
+
+def _undirected_edges(src: np.ndarray, tgt: np.ndarray,
+                      weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse directed index edges into undirected (lo, hi, weight) edges.
+    When both directions exist, the edge whose source comes later in node
+    order supplies the weight, as DiGraph.to_undirected() does.
+    """
+    lo = np.minimum(src, tgt)
+    hi = np.maximum(src, tgt)
+    order = np.lexsort((src, hi, lo))
+    lo, hi, weights = lo[order], hi[order], weights[order]
+    last = np.r_[(lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1]), True]
+    return lo[last], hi[last], weights[last]
+
+
+def _component_edges(in_component: np.ndarray, nodes: np.ndarray, u: np.ndarray, v: np.ndarray,
+                     w: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Edges of one connected component, re-indexed densely.
+    Returns (component node ids, u, v, weights).
+    """
+    remap = np.cumsum(in_component) - 1
+    keep = in_component[u]
+    return nodes[in_component], remap[u[keep]], remap[v[keep]], w[keep]
+
+
+def _igraph_communities(comp_ids, u, v, w) -> Optional[List[Set[int]]]:
+    """Louvain communities from igraph's C multilevel; None if igraph is not installed."""
+    try:
+        import igraph as ig
+    except ImportError:
+        return None
+    
+    g = ig.Graph(n=len(comp_ids), edges=np.column_stack((u, v)).tolist())
+    g.es['weight'] = w.tolist()
+    partition = g.community_multilevel(weights='weight', resolution=COMMUNITY_RESOLUTION)
+    return [set(comp_ids[members].tolist()) for members in partition]
+
+
+def _parallel_louvain_communities(comp_ids, u, v, w) -> Optional[List[Set[int]]]:
+    """
+    Communities from networkit's parallel Louvain (PLM, all cores).
+    None if networkit is not installed.
+    """
+    try:
+        import networkit as nk
+    except ImportError:
+        return None
+    
+    nk.engineering.setNumberOfThreads(os.cpu_count() or 1)
+    g = nk.Graph(len(comp_ids), weighted=True)
+    for a, b, weight in zip(u.tolist(), v.tolist(), w.tolist()):
+        g.addEdge(a, b, weight)
+    plm = nk.community.PLM(g, refine=True, gamma=COMMUNITY_RESOLUTION, par="balanced")
+    plm.run()
+    labels = np.asarray(plm.getPartition().getVector())
+    return [set(comp_ids[labels == comm].tolist()) for comm in np.unique(labels)]
+
+
+def _local_communities(comp_ids, u, v, w) -> List[Set[int]]:
+    """Communities of one component with COMMUNITY_ALGORITHM (single process)."""
+    if COMMUNITY_ALGORITHM == "louvain":
+        comms = _igraph_communities(comp_ids, u, v, w)
+        if comms is not None:
+            return comms
+    
+    import networkx as nx
+    UG = nx.Graph()
+    UG.add_nodes_from(comp_ids.tolist())
+    UG.add_weighted_edges_from(zip(comp_ids[u].tolist(), comp_ids[v].tolist(), w.tolist()))
+    if COMMUNITY_ALGORITHM == "louvain":
+        return nx.community.louvain_communities(
+            UG, weight='weight', resolution=COMMUNITY_RESOLUTION, seed=COMMUNITY_SEED)
+    from networkx.algorithms.community import greedy_modularity_communities
+    return greedy_modularity_communities(UG, weight='weight', resolution=COMMUNITY_RESOLUTION)
+
+
+def _sampled_communities(comp_ids, u, v, w, max_nodes: int) -> List[Set[int]]:
+    """
+    Communities of a component too large for _local_communities().
+    Detection runs on the max_nodes nodes with the highest weighted degree;
+    every other node then takes the community with the most edge weight
+    among its labeled neighbors, spreading outward until all are labeled.
+    """
+    n = len(comp_ids)
+    strength = np.bincount(u, weights=w, minlength=n) + np.bincount(v, weights=w, minlength=n)
+    in_sample = np.zeros(n, dtype=bool)
+    in_sample[np.argsort(-strength, kind="stable")[:max_nodes]] = True
+    comms = _local_communities(*_component_edges(in_sample, comp_ids, u, v, w))
+    
+    labels = np.full(n, -1, dtype=np.int64)
+    sorter = np.argsort(comp_ids, kind="stable")
+    for comm_id, comm_nodes in enumerate(comms):
+        members = np.fromiter(comm_nodes, dtype=np.int64, count=len(comm_nodes))
+        labels[sorter[np.searchsorted(comp_ids, members, sorter=sorter)]] = comm_id
+    
+    # Both directions of every edge: (node, neighbor, weight)
+    a, b, ab_w = np.concatenate((u, v)), np.concatenate((v, u)), np.concatenate((w, w))
+    n_comms = max(len(comms), 1)
+    while True:
+        votes = (labels[a] < 0) & (labels[b] >= 0)
+        if not votes.any():
+            break
+        keys, inverse = np.unique(a[votes] * n_comms + labels[b[votes]], return_inverse=True)
+        totals = np.bincount(inverse, weights=ab_w[votes])
+        voter, label = keys // n_comms, keys % n_comms
+        order = np.lexsort((-totals, voter))
+        first = np.r_[True, voter[order][1:] != voter[order][:-1]]
+        labels[voter[order][first]] = label[order][first]
+    
+    return [set(comp_ids[labels == comm_id].tolist()) for comm_id in range(len(comms))]
+
+
+def _metrics_cache_path(nodes: np.ndarray, src: np.ndarray, tgt: np.ndarray, weights: np.ndarray) -> str:
+    """Cache file for this graph under GRAPH_METRICS_CACHE_DIR."""
+    digest = hashlib.blake2b(digest_size=16)
+    settings = (COMMUNITY_ALGORITHM, COMMUNITY_RESOLUTION, COMMUNITY_SEED, COMMUNITY_MAX_NODES,
+                COMMUNITY_PARALLEL_MIN_NODES, PAGERANK_ALPHA, PAGERANK_MAX_ITER, PAGERANK_TOL)
+    digest.update(repr(settings).encode())
+    for arr in (nodes, src, tgt, weights):
+        digest.update(np.ascontiguousarray(arr).tobytes())
+    return os.path.join(GRAPH_METRICS_CACHE_DIR, f"graph-metrics-{digest.hexdigest()}.npz")
 
 
 class GraphMetrics:
     """Cached graph metrics: PageRank scores and community labels."""
     
     def __init__(self):
-        self._pagerank: Dict[int, float] = {}
-        self._communities: Dict[int, int] = {}  # node_id → community_id
+        # PageRank as parallel arrays: _pr[i] is the normalized score of node _pr_ids[i]
+        self._pr_ids = np.empty(0, dtype=np.int64)
+        self._pr = np.empty(0, dtype=PAGERANK_DTYPE)
+        self._pr_boost = np.empty(0, dtype=PAGERANK_DTYPE)  # 1.0 + PAGERANK_BOOST * _pr
+        self._id2idx: Dict[int, int] = {}
+        self._comm = np.empty(0, dtype=np.int32)  # community of _pr_ids[i], -1 = isolated
         self._community_sizes: Dict[int, int] = {}
         self._computed_at: float = 0
-        self._node_count: int = 0
+        # (nodes, src, tgt, weights, raw scores) of the last PageRank run, for update()
+        self._pr_graph: Optional[Tuple[np.ndarray, ...]] = None
+        # recompute_async(): the latest request wins the swap
+        self._swap_lock = threading.Lock()
+        self._recompute_generation = 0
     
-    def compute(self, edges: List[Tuple[int, int, float]], node_ids: List[int]):
+    def compute(self, edges: Iterable[Tuple[int, int, float]], node_ids: List[int],
+                n_edges: Optional[int] = None):
         """
         Compute PageRank and communities from edge list.
         Called at startup and after significant graph changes.
-        """
-        import networkx as nx
         
+        edges may be any iterable of (src, tgt, weight) tuples (a generator,
+        a DB cursor) and is read once; pass n_edges when it has no len().
+        """
         start = time.time()
         
-        G = nx.DiGraph()
-        for nid in node_ids:
-            G.add_node(nid)
-        for src, tgt, w in edges:
-            G.add_edge(src, tgt, weight=w)
+        graph, listed = None, None
+        try:
+            listed = _first_occurrences(np.fromiter(node_ids, dtype=np.int64, count=len(node_ids)))
+            graph = _index_edges(*_edge_arrays(edges, n_edges), listed)
+        except Exception as e:
+            print(f"⚠️  Invalid edge list: {e}")
         
-        # PageRank
-        if G.number_of_edges() > 0:
-            try:
-                self._pagerank = nx.pagerank(G, weight='weight', max_iter=500, alpha=0.85, tol=1e-4)
-            except Exception:
-                self._pagerank = {nid: 1.0 / max(len(node_ids), 1) for nid in node_ids}
-        else:
-            self._pagerank = {nid: 1.0 / max(len(node_ids), 1) for nid in node_ids}
+        cache_path = None
+        if GRAPH_METRICS_CACHE_DIR and graph is not None and len(graph[1]):
+            cache_path = _metrics_cache_path(*graph)
+            if self._load_cached(cache_path, graph):
+                print(f"📊 Graph metrics loaded from cache in {time.time() - start:.2f}s: "
+                      f"{len(self._pr)} PR scores, "
+                      f"{len(self._community_sizes)} communities")
+                return
         
-        # Normalize PageRank to 0-1 range
-        if self._pagerank:
-            max_pr = max(self._pagerank.values())
+        # PageRank (sparse power iteration; falls back to uniform scores)
+        pr_ids, pr = None, None
+        self._pr_graph = None
+        if graph is not None:
+            nodes, src, tgt, weights = graph
+            try:
+                if len(src):
+                    scores = _pagerank_csr(src, tgt, weights, len(nodes))
+                    if scores is not None:
+                        pr_ids, pr = nodes, scores.copy()
+                        self._pr_graph = (nodes, src, tgt, weights, scores)
+                elif len(nodes):
+                    empty = np.empty(0, dtype=np.int64)
+                    self._pr_graph = (nodes, empty, empty, np.empty(0),
+                                      np.full(len(nodes), 1.0 / len(nodes), dtype=PAGERANK_DTYPE))
+            except Exception as e:
+                print(f"⚠️  PageRank failed: {e}")
+        if pr is None:
+            # Uniform scores, already normalized
+            pr_ids = listed if listed is not None else np.fromiter(dict.fromkeys(node_ids), dtype=np.int64)
+            pr = np.ones(len(pr_ids), dtype=PAGERANK_DTYPE)
+        elif len(pr):
+            # Normalize PageRank to 0-1 range
+            max_pr = pr.max()
             if max_pr > 0:
-                self._pagerank = {k: v / max_pr for k, v in self._pagerank.items()}
-        
-        # Community detection (on undirected graph)
-        UG = G.to_undirected()
-        components = sorted(nx.connected_components(UG), key=len, reverse=True)
+                pr /= max_pr
+        self._set_pagerank(pr_ids, pr)
         
-        if len(components) > 0 and len(components[0]) > 4:
+        # Community detection (on the undirected graph, largest component only);
+        # everything outside it stays -1
+        self._community_sizes = {}
+        if graph is not None and len(graph[1]):
             try:
-                from networkx.algorithms.community import greedy_modularity_communities
-                largest = UG.subgraph(components[0]).copy()
-                comms = greedy_modularity_communities(largest, weight='weight', resolution=COMMUNITY_RESOLUTION)
-                comms = sorted(comms, key=len, reverse=True)
-                for comm_id, comm_nodes in enumerate(comms):
-                    self._community_sizes[comm_id] = len(comm_nodes)
-                    for nid in comm_nodes:
-                        self._communities[nid] = comm_id
+                self._detect_communities(*graph)
             except Exception as e:
                 print(f"⚠️  Community detection failed: {e}")
+                cache_path = None
         
-        # Mark isolated nodes as community -1
-        for nid in node_ids:
-            if nid not in self._communities:
-                self._communities[nid] = -1
-        
+        if cache_path and self._pr_graph is not None:
+            self._save_cached(cache_path)
         self._computed_at = time.time()
-        self._node_count = len(node_ids)
         elapsed = time.time() - start
         print(f"📊 Graph metrics computed in {elapsed:.2f}s: "
-              f"{len(self._pagerank)} PR scores, "
+              f"{len(self._pr)} PR scores, "
               f"{len(self._community_sizes)} communities")
     
+    def _load_cached(self, path: str, graph: Tuple[np.ndarray, ...]) -> bool:
+        """Restore compute() results saved for this graph; False on a miss."""
+        try:
+            with np.load(path) as data:
+                scores, comm, sizes = data["scores"], data["comm"], data["sizes"]
+        except (OSError, KeyError, ValueError):
+            return False
+        nodes = graph[0]
+        if len(scores) != len(nodes) or len(comm) != len(nodes):
+            return False
+        
+        self._pr_graph = (*graph, scores)
+        pr = scores.copy()
+        max_pr = pr.max()
+        if max_pr > 0:
+            pr /= max_pr
+        self._set_pagerank(nodes, pr)
+        self._comm = comm.astype(np.int32, copy=False)
+        self._community_sizes = dict(enumerate(sizes.tolist()))
+        self._computed_at = time.time()
+        return True
+    
+    def _save_cached(self, path: str):
+        """Write raw PageRank + communities to path, replacing older cache files."""
+        try:
+            os.makedirs(GRAPH_METRICS_CACHE_DIR, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, scores=self._pr_graph[4], comm=self._comm,
+                         sizes=np.array([self._community_sizes[i] for i in range(len(self._community_sizes))],
+                                        dtype=np.int64))
+            os.replace(tmp, path)
+            for old in glob.glob(os.path.join(GRAPH_METRICS_CACHE_DIR, "graph-metrics-*.npz")):
+                if old != path:
+                    os.remove(old)
+        except OSError as e:
+            print(f"⚠️  Could not write graph metrics cache: {e}")
+    
+    def recompute_async(self, edges: Iterable[Tuple[int, int, float]], node_ids: List[int],
+                        n_edges: Optional[int] = None) -> threading.Thread:
+        """
+        compute() in a background thread without blocking the caller.
+        
+        The work is done on a fresh GraphMetrics and its results are swapped
+        in under a lock when finished; until then readers keep the previous
+        scores (or none, before the first compute). If several recomputes
+        overlap, only the most recently requested one is swapped in.
+        """
+        with self._swap_lock:
+            self._recompute_generation += 1
+            generation = self._recompute_generation
+        
+        def _worker():
+            fresh = GraphMetrics()
+            try:
+                fresh.compute(edges, node_ids, n_edges)
+            except Exception as e:
+                print(f"⚠️  Background graph metrics failed: {e}")
+                return
+            state = {k: v for k, v in fresh.__dict__.items()
+                     if k not in ("_swap_lock", "_recompute_generation")}
+            with self._swap_lock:
+                if generation == self._recompute_generation:
+                    self.__dict__.update(state)
+        
+        thread = threading.Thread(target=_worker, daemon=True, name="graph-metrics-recompute")
+        thread.start()
+        return thread
+    
+    def _detect_communities(self, nodes: np.ndarray, src: np.ndarray, tgt: np.ndarray, weights: np.ndarray):
+        """Label the largest connected component (if > 4 nodes) with communities."""
+        import scipy.sparse as sp
+        from scipy.sparse.csgraph import connected_components
+        
+        u, v, w = _undirected_edges(src, tgt, weights)
+        n = len(nodes)
+        adjacency = sp.csr_matrix((np.ones(len(u)), (u, v)), shape=(n, n))
+        _, labels = connected_components(adjacency, directed=False)
+        sizes = np.bincount(labels)
+        largest_id = int(np.argmax(sizes))
+        if sizes[largest_id] <= 4:
+            return
+        
+        component = _component_edges(labels == largest_id, nodes, u, v, w)
+        comms = None
+        if sizes[largest_id] >= COMMUNITY_PARALLEL_MIN_NODES:
+            comms = _parallel_louvain_communities(*component)
+        if comms is None and 0 < COMMUNITY_MAX_NODES < sizes[largest_id]:
+            comms = _sampled_communities(*component, COMMUNITY_MAX_NODES)
+        if comms is None:
+            comms = _local_communities(*component)
+        
+        comms = sorted(comms, key=len, reverse=True)
+        sizes = np.fromiter(map(len, comms), dtype=np.int64, count=len(comms))
+        self._community_sizes = dict(enumerate(sizes.tolist()))
+        # Label every member in one scatter: ids -> rows of _pr_ids by binary search
+        members = np.fromiter(itertools.chain.from_iterable(comms), dtype=np.int64, count=int(sizes.sum()))
+        member_comm = np.repeat(np.arange(len(comms), dtype=np.int32), sizes)
+        sorter = np.argsort(self._pr_ids, kind="stable")
+        pos = np.minimum(np.searchsorted(self._pr_ids, members, sorter=sorter), max(len(sorter) - 1, 0))
+        rows = sorter[pos]
+        known = self._pr_ids[rows] == members
+        self._comm[rows[known]] = member_comm[known]
+    
+    def update(self, added_edges: List[Tuple[int, int, float]] = (),
+               removed_edges: List[Tuple[int, int]] = ()) -> bool:
+        """
+        Refresh PageRank after a small edge change without a full compute().
+        
+        The delta is applied to the edge arrays kept from the last run
+        (added edges overwrite existing weights, removed edges are (src, tgt)
+        pairs) and power iteration restarts from the previous scores, so it
+        converges in a few steps. Deltas larger than
+        PAGERANK_INCREMENTAL_MAX_DELTA of the edge count start from uniform.
+        Communities are left as they are; new nodes read -1 until the next
+        compute().
+        
+        Returns False (nothing changed) if there is no PageRank state from
+        compute() or the iteration does not converge.
+        """
+        if self._pr_graph is None:
+            return False
+        start = time.time()
+        nodes, src, tgt, weights, raw = self._pr_graph
+        add_src, add_tgt, add_w = _edge_arrays(added_edges)
+        new_nodes, new_src, new_tgt, new_weights = _index_edges(
+            np.concatenate((nodes[src], add_src)), np.concatenate((nodes[tgt], add_tgt)),
+            np.concatenate((weights, add_w)), nodes)
+        n = len(new_nodes)
+        
+        if len(removed_edges):
+            rem_src = np.fromiter((e[0] for e in removed_edges), dtype=np.int64, count=len(removed_edges))
+            rem_tgt = np.fromiter((e[1] for e in removed_edges), dtype=np.int64, count=len(removed_edges))
+            known = np.isin(rem_src, new_nodes) & np.isin(rem_tgt, new_nodes)
+            sorter = np.argsort(new_nodes, kind="stable")
+            rem_keys = (sorter[np.searchsorted(new_nodes, rem_src[known], sorter=sorter)] * n
+                        + sorter[np.searchsorted(new_nodes, rem_tgt[known], sorter=sorter)])
+            keep = ~np.isin(new_src * n + new_tgt, rem_keys)
+            new_src, new_tgt, new_weights = new_src[keep], new_tgt[keep], new_weights[keep]
+        
+        x0 = None
+        if len(added_edges) + len(removed_edges) <= PAGERANK_INCREMENTAL_MAX_DELTA * max(len(src), 1):
+            x0 = np.concatenate((raw, np.full(n - len(nodes), 1.0 / n)))
+            x0 /= x0.sum()
+        scores = _pagerank_csr(new_src, new_tgt, new_weights, n, x0=x0)
+        if scores is None:
+            print("⚠️  PageRank update did not converge; keeping previous scores")
+            return False
+        
+        self._pr_graph = (new_nodes, new_src, new_tgt, new_weights, scores)
+        # new_nodes extends nodes, so existing community labels keep their rows
+        communities = np.full(n, -1, dtype=np.int32)
+        communities[:len(nodes)] = self._comm[:len(nodes)]
+        max_pr = scores.max()
+        self._set_pagerank(new_nodes, scores / max_pr if max_pr > 0 else scores.copy())
+        self._comm = communities
+        self._computed_at = time.time()
+        print(f"📊 PageRank updated in {time.time() - start:.2f}s "
+              f"(+{len(added_edges)}/-{len(removed_edges)} edges, "
+              f"{'warm' if x0 is not None else 'cold'} start)")
+        return True
+    
+    def _set_pagerank(self, node_ids: np.ndarray, scores: np.ndarray):
+        """Install new scores and id map; community labels reset to -1."""
+        self._pr_ids = node_ids
+        self._pr = scores
+        self._pr_boost = 1.0 + PAGERANK_BOOST * scores
+        self._id2idx = dict(zip(node_ids.tolist(), range(len(node_ids))))
+        self._comm = np.full(len(node_ids), -1, dtype=np.int32)
+    
     def get_pagerank(self, node_id: int) -> float:
         """Get normalized PageRank score (0-1) for a node."""
-        return self._pagerank.get(node_id, 0.0)
+        idx = self._id2idx.get(node_id)
+        return 0.0 if idx is None else float(self._pr[idx])
     
     def get_pagerank_boost(self, node_id: int) -> float:
         """
@@ -91,25 +559,48 @@ class GraphMetrics:
         Returns 1.0 + PAGERANK_BOOST * normalized_pr
         So top nodes get ~1.1x boost, bottom nodes get ~1.0x.
         """
-        pr = self.get_pagerank(node_id)
-        return 1.0 + PAGERANK_BOOST * pr
+        idx = self._id2idx.get(node_id)
+        return 1.0 if idx is None else float(self._pr_boost[idx])
+    
+    def get_pagerank_boost_batch(self, node_ids) -> np.ndarray:
+        """get_pagerank_boost() for a sequence of node ids, as an array."""
+        idx = np.fromiter((self._id2idx.get(nid, -1) for nid in node_ids), dtype=np.int64)
+        boost = np.ones(len(idx))
+        hit = idx >= 0
+        boost[hit] = self._pr_boost[idx[hit]]
+        return boost
     
     def get_community(self, node_id: int) -> int:
         """Get community ID for a node. -1 = isolated."""
-        return self._communities.get(node_id, -1)
+        idx = self._id2idx.get(node_id)
+        return -1 if idx is None else int(self._comm[idx])
+    
+    def get_community_members(self, community_ids: Set[int]) -> Set[int]:
+        """Node ids belonging to any of community_ids."""
+        members = np.isin(self._comm, np.fromiter(community_ids, dtype=np.int32, count=len(community_ids)))
+        return set(self._pr_ids[members].tolist())
+    
+    def _top_pagerank(self, k: int) -> List[Tuple[int, float]]:
+        """(node_id, normalized score) of the k highest-ranked nodes, best first."""
+        pr = self._pr
+        if k < len(pr):
+            top = np.argpartition(-pr, k - 1)[:k]
+        else:
+            top = np.arange(len(pr))
+        # Best first; equal scores in id-map order
+        top = top[np.lexsort((top, -pr[top]))]
+        return list(zip(self._pr_ids[top].tolist(), pr[top].tolist()))
     
     def get_stats(self) -> Dict:
         """Get summary statistics for neural_stats tool."""
         return {
             "pagerank_computed": self._computed_at > 0,
-            "top_pagerank_nodes": sorted(
-                self._pagerank.items(), key=lambda x: -x[1]
-            )[:10],
+            "top_pagerank_nodes": self._top_pagerank(10),
             "communities": len(self._community_sizes),
-            "community_sizes": dict(sorted(
-                self._community_sizes.items(), key=lambda x: -x[1]
-            )[:10]),
-            "isolated_nodes": sum(1 for v in self._communities.values() if v == -1),
+            "community_sizes": dict(heapq.nlargest(
+                10, self._community_sizes.items(), key=lambda x: x[1]
+            )),
+            "isolated_nodes": int(np.count_nonzero(self._comm == -1)),
         }
     
     @property
@@ -4,11 +4,12 @@ MCP SSE Handler for Neural Memory Graph
 Implements Model Context Protocol with Server-Sent Events
 """
 
-from flask import Response, request, jsonify, stream_with_context
+from flask import Response, request, jsonify
 import json
-import hashlib
 import hmac
 import os
+import queue
+import threading
 
 from database import get_stats, get_node, delete_node as db_delete_node, update_node as db_update_node, get_note_history, restore_note_version
 from graph_engine import add_engram_with_links
@@ -18,21 +19,23 @@ from stable_embeddings import get_model
 
 # Authentication - use environment variable
 API_KEY = os.getenv("NEURAL_API_KEY", "change_me_in_production")
-API_KEY_HASH = hashlib.sha256(API_KEY.encode()).hexdigest()
+_API_KEY_BYTES = API_KEY.encode()
+# SSE comment frames sent while a request is still running, so proxies
+# don't close idle streams during long searches
+MCP_SSE_HEARTBEAT_SECONDS = float(os.getenv("MCP_SSE_HEARTBEAT_SECONDS", "15"))
 
 
 def verify_auth(req):
     """Verify API key from URL parameter or Authorization header"""
+    # compare_digest is constant-time in the contents (only the length can
+    # leak), so the raw key is compared directly instead of a SHA-256 of it
     url_key = req.args.get("api_key")
     if url_key:
-        key_hash = hashlib.sha256(url_key.encode()).hexdigest()
-        return hmac.compare_digest(key_hash, API_KEY_HASH)
+        return hmac.compare_digest(url_key.encode(), _API_KEY_BYTES)
     
     auth_header = req.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header[7:]
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
-        return hmac.compare_digest(token_hash, API_KEY_HASH)
+        return hmac.compare_digest(auth_header[7:].encode(), _API_KEY_BYTES)
     
     return False
 
@@ -616,7 +619,7 @@ def tool_update_engram(engram_id: int, content: str, category: str = None, emoti
     final_tone = emotional_tone if emotional_tone is not None else existing.get("emotional_tone")
     final_intensity = emotional_intensity if emotional_intensity is not None else existing.get("emotional_intensity", 5)
     final_reflection = emotional_reflection if emotional_reflection is not None else existing.get("emotional_reflection")
-    db_update_node(note_id, content, category, embedding.tobytes(),
+    db_update_node(note_id, content, category, embedding,
                    emotional_tone=final_tone, emotional_intensity=final_intensity,
                    emotional_reflection=final_reflection)
 
@@ -739,6 +742,38 @@ def tool_find_similar(content: str, threshold: float = 0.7, limit: int = 5):
     return {"content": [{"type": "text", "text": text}]}
 
 
+def _mcp_error_event(e):
+    error = {"jsonrpc": "2.0", "id": 1, "error": {"code": -32603, "message": str(e)}}
+    return f"data: {json.dumps(error)}\n\n"
+
+
+def _answer_mcp(data, events):
+    """Run one MCP request and put its SSE event on events"""
+    try:
+        method = data.get("method", "initialize")
+        params = data.get("params", {})
+        req_id = data.get("id", 1)
+        
+        result = handle_mcp_request(method, params)
+        response = {"jsonrpc": "2.0", "id": req_id, "result": result}
+        events.put(f"data: {json.dumps(response)}\n\n")
+    
+    except Exception as e:
+        events.put(_mcp_error_event(e))
+
+
+def _stream_events(events):
+    """Yield heartbeats until the request's event arrives, then the event"""
+    while True:
+        try:
+            event = events.get(timeout=MCP_SSE_HEARTBEAT_SECONDS)
+        except queue.Empty:
+            yield ": heartbeat\n\n"
+            continue
+        yield event
+        return
+
+
 def create_mcp_endpoint(app):
     """Register MCP SSE endpoint with Flask app"""
     
@@ -748,23 +783,18 @@ def create_mcp_endpoint(app):
         if not verify_auth(request):
             return jsonify({"error": "Unauthorized"}), 401
         
-        def generate():
-            try:
-                data = request.get_json() if request.method == "POST" else {}
-                method = data.get("method", "initialize")
-                params = data.get("params", {})
-                req_id = data.get("id", 1)
-                
-                result = handle_mcp_request(method, params)
-                response = {"jsonrpc": "2.0", "id": req_id, "result": result}
-                yield f"data: {json.dumps(response)}\n\n"
-            
-            except Exception as e:
-                error = {"jsonrpc": "2.0", "id": 1, "error": {"code": -32603, "message": str(e)}}
-                yield f"data: {json.dumps(error)}\n\n"
+        # The MCP call runs on its own thread and hands back the finished
+        # event through a queue; the stream only waits on the queue
+        events = queue.Queue(maxsize=1)
+        try:
+            data = request.get_json() if request.method == "POST" else {}
+        except Exception as e:
+            events.put(_mcp_error_event(e))
+        else:
+            threading.Thread(target=_answer_mcp, args=(data, events), daemon=True, name="mcp-request").start()
         
         return Response(
-            stream_with_context(generate()),
+            _stream_events(events),
             mimetype="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
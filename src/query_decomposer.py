@@ -202,4 +202,39 @@ def compute_temporal_order_score(note_timestamp: str, direction: str,
         return position
     else:
         # "when" / "order" - slight boost for having temporal data, no ordering preference
-        return 0.5
\ No newline at end of file
+        return 0.5
+
+def compute_temporal_order_scores(note_timestamps: dict, direction: str) -> dict:
+    """
+    compute_temporal_order_score() for every note of {note_id: timestamp},
+    ranked against all of them. Parses each timestamp once instead of once
+    per note pair.
+    """
+    from datetime import datetime
+    parsed = {}
+    for note_id, ts in note_timestamps.items():
+        try:
+            parsed[note_id] = datetime.fromisoformat(ts)
+        except (ValueError, TypeError):
+            continue
+
+    scores = dict.fromkeys(note_timestamps, 0.0)
+    if not parsed:
+        return scores
+
+    min_ts = min(parsed.values())
+    max_ts = max(parsed.values())
+    total_range = (max_ts - min_ts).total_seconds()
+
+    for note_id, note_ts in parsed.items():
+        if total_range == 0:
+            scores[note_id] = 0.5
+            continue
+        position = (note_ts - min_ts).total_seconds() / total_range
+        if direction == "before":
+            scores[note_id] = 1.0 - position
+        elif direction == "after":
+            scores[note_id] = position
+        else:
+            scores[note_id] = 0.5
+    return scores
@@ -32,6 +32,7 @@ def main():
         sys.exit(1)
 
     from stable_embeddings import StableEmbeddingModel
+    from database import unit_embedding
     model = StableEmbeddingModel()
     new_dim = model.dimension
     print(f"New embedding dimension: {new_dim}")
@@ -74,7 +75,7 @@ def main():
                 embedding = embedding[0]
             conn.execute(
                 "UPDATE nodes SET embedding = ? WHERE id = ?",
-                (embedding.astype(np.float32).tobytes(), nid)
+                (unit_embedding(embedding).tobytes(), nid)
             )
             updated += 1
             if (i + 1) % 50 == 0:
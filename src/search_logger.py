@@ -6,8 +6,8 @@ latency breakdown (embedding, ANN, spreading, BM25, temporal, rerank, total),
 top result scores, and zero-result queries.
 
 Usage:
-    from search_logger import SearchLogger
-    logger = SearchLogger()
+    from search_logger import get_search_logger
+    logger = get_search_logger()  # per-thread, reused across searches
     logger.start()          # begin timing
     logger.mark("embedding") # mark phase completion
     logger.mark("ann")
@@ -15,6 +15,7 @@ Usage:
     logger.finish(query, results, params)  # save to DB
 """
 import sqlite3
+import threading
 import time
 import os
 import json
@@ -72,6 +73,22 @@ CREATE INDEX IF NOT EXISTS idx_search_logs_results ON search_logs(results_count)
 """
 
 
+# DB paths whose search_logs schema is already in place (checked once per process)
+_schema_ready = set()
+_thread_loggers = threading.local()
+
+
+def get_search_logger():
+    """
+    This thread's SearchLogger, created on first use. A logger holds the
+    timing of one search at a time, so each thread reuses its own.
+    """
+    logger = getattr(_thread_loggers, "logger", None)
+    if logger is None:
+        logger = _thread_loggers.logger = SearchLogger()
+    return logger
+
+
 class SearchLogger:
     """Tracks search timing and logs results."""
     
@@ -82,6 +99,8 @@ class SearchLogger:
         self._ensure_schema()
     
     def _ensure_schema(self):
+        if DB_PATH in _schema_ready:
+            return
         try:
             conn = sqlite3.connect(DB_PATH)
             conn.executescript(SCHEMA)
@@ -101,6 +120,7 @@ class SearchLogger:
                     pass  # column already exists
             conn.commit()
             conn.close()
+            _schema_ready.add(DB_PATH)
         except Exception as e:
             print(f"⚠️ SearchLogger schema init failed: {e}")
     
@@ -17,7 +17,7 @@ sys.path.insert(0, '/app/src')
 from database import init_database
 from mcp_sse_handler import create_mcp_endpoint
 from ann_index import rebuild_index, fix_dimension_mismatch
-from database import get_all_nodes, get_all_edges
+from database import get_all_nodes, get_all_edges, iter_nodes, iter_edges
 from graph_cache import rebuild_graph_cache
 
 
@@ -45,11 +45,12 @@ def create_app():
     edge_count = rebuild_graph_cache(edges)
     print(f"🔗 Built graph cache with {edge_count} edges")
     
-    # Compute graph metrics (PageRank, communities)
+    # Compute graph metrics (PageRank, communities) in the background;
+    # search runs without PageRank/community signals until they land
     from graph_metrics import get_graph_metrics
     node_ids = [n["id"] for n in nodes]
-    edge_tuples = [(e["source_id"], e["target_id"], e["weight"]) for e in edges]
-    get_graph_metrics().compute(edge_tuples, node_ids)
+    edge_tuples = ((e["source_id"], e["target_id"], e["weight"]) for e in edges)
+    get_graph_metrics().recompute_async(edge_tuples, node_ids, n_edges=len(edges))
     
     # Build BM25 keyword index
     from bm25_index import get_bm25_index
@@ -183,8 +184,9 @@ def create_app():
         
         brief = request.args.get('brief', 'true').lower() == 'true'
         
-        nodes = get_all_nodes()
-        edges = get_all_edges()
+        # Stream without embeddings - the viewer never needs them
+        nodes = iter_nodes()
+        edges = iter_edges()
         
         # Format nodes for viewer
         formatted_nodes = []
@@ -249,23 +249,24 @@ def step_pagerank(db_path, dry_run=False):
 
     conn = sqlite3.connect(db_path)
     nodes = [r[0] for r in conn.execute("SELECT id FROM nodes").fetchall()]
-    edges = conn.execute(
-        "SELECT source_id, target_id, weight FROM edges"
-    ).fetchall()
-    conn.close()
-
+    n_edges = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+    # Stream the edge rows straight into compute() instead of a fetchall() list
+    # (no n_edges: a write in between would make the count stale)
+    edges = conn.execute("SELECT source_id, target_id, weight FROM edges")
     metrics = GraphMetrics()
     metrics.compute(edges, nodes)
+    conn.close()
 
-    top_pr = sorted(metrics._pagerank.items(), key=lambda x: x[1], reverse=True)[:10]
-    n_communities = len(metrics._community_sizes)
-    isolated = sum(1 for v in metrics._communities.values() if v == -1)
+    stats = metrics.get_stats()
+    top_pr = stats["top_pagerank_nodes"]
+    n_communities = stats["communities"]
+    isolated = stats["isolated_nodes"]
 
-    print(f"  Nodes: {len(nodes)}, Edges: {len(edges)}")
+    print(f"  Nodes: {len(nodes)}, Edges: {n_edges}")
     print(f"  Communities: {n_communities}, Isolated: {isolated}")
     print(f"  Top PageRank: {', '.join(f'#{nid}({pr:.3f})' for nid, pr in top_pr[:5])}")
     return {
-        "nodes": len(nodes), "edges": len(edges),
+        "nodes": len(nodes), "edges": n_edges,
         "communities": n_communities, "isolated": isolated
     }
 
@@ -1373,14 +1374,14 @@ def step_emergence_check(db_path, dry_run=False):
         metrics.compute(edges_raw, node_ids)
 
     total_nodes = len(node_ids)
-    isolated = sum(1 for v in metrics._communities.values() if v == -1)
+    isolated = metrics.get_stats()["isolated_nodes"]
     n_communities = len(metrics._community_sizes)
 
     cross_cluster_edges = 0
     cross_weights = []
     for src, tgt, w in edges_raw:
-        c_src = metrics._communities.get(src, -1)
-        c_tgt = metrics._communities.get(tgt, -1)
+        c_src = metrics.get_community(src)
+        c_tgt = metrics.get_community(tgt)
         if c_src != c_tgt and c_src != -1 and c_tgt != -1:
             cross_cluster_edges += 1
             cross_weights.append(w)
@@ -2266,11 +2267,11 @@ def step_enriched_fragments(db_path, dry_run=False, variant=1, max_notes=200):
                         import sys, os
                         sys.path.insert(0, os.path.dirname(__file__))
                         from stable_embeddings import get_model
+                        from database import unit_embedding
                         model = get_model()
                         # Embed ONLY the fact for precise semantic matching
                         # (narrative would dilute the embedding signal)
-                        emb = model.encode(frag['fact'])[0]
-                        emb_bytes = emb.astype('float32').tobytes()
+                        emb_bytes = unit_embedding(model.encode(frag['fact'])[0]).tobytes()
                     except Exception:
                         emb_bytes = None
                     conn.execute(
@@ -2334,9 +2335,13 @@ def step_enriched_fragments(db_path, dry_run=False, variant=1, max_notes=200):
                         "AND embedding IS NOT NULL"
                     ).fetchall()
                     semantic_links = 0
-                    for frag_id, emb_bytes in new_frags:
-                        emb = np.frombuffer(emb_bytes, dtype=np.float32)
-                        neighbors = ann.search(emb, k=5, min_similarity=0.6)
+                    new_frags = [(fid, emb) for fid, emb in new_frags if len(emb) == ann.dimension * 4]
+                    # One batched k-NN query for all fragments
+                    frag_neighbors = ann.search_batch(
+                        np.frombuffer(b"".join(emb for _, emb in new_frags), dtype=np.float32)
+                        .reshape(-1, ann.dimension),
+                        k=5, min_similarity=0.6) if new_frags else []
+                    for (frag_id, _), neighbors in zip(new_frags, frag_neighbors):
                         for neighbor_id, sim in neighbors:
                             if neighbor_id == frag_id:
                                 continue
@@ -2612,6 +2617,15 @@ def run_all(db_path, dry_run=False):
         except Exception as e:
             print(f"  WARNING: Could not update last_sleep_at: {e}")
 
+    # The steps write through their own sqlite3 connections; drop the
+    # server's cached neighbour lists, stats and entity counts
+    if not dry_run:
+        try:
+            from database import invalidate_caches
+            invalidate_caches()
+        except Exception as e:
+            print(f"  WARNING: Could not invalidate database caches: {e}")
+
     # Also add spacy_relations step to run_all results
     elapsed = time.time() - t0
 
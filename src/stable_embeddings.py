@@ -10,6 +10,13 @@ from transformers import AutoTokenizer, AutoModel
 from typing import List, Union
 import os
 
+# Inference backend: "torch" (default) or "onnx_int8" — an int8 dynamically
+# quantized ONNX export produced by scripts/convert_model_onnx.py, run through
+# onnxruntime (VNNI int8 matmuls on modern x86). Needs optimum[onnxruntime].
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+EMBED_ONNX_PATH = os.getenv("EMBED_ONNX_PATH", "/app/data/onnx_int8")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "model_quantized.onnx")
+
 
 class StableEmbeddingModel:
     """Direct transformers implementation for stable embeddings"""
@@ -23,13 +30,22 @@ class StableEmbeddingModel:
         
         print(f"🤖 Loading embedding model: {model_name}")
         
+        self.device = torch.device("cpu")
+        self.backend = "torch"
+        
+        if EMBED_BACKEND == "onnx_int8":
+            try:
+                self._load_onnx()
+                return
+            except Exception as e:
+                print(f"⚠️  ONNX int8 backend unavailable ({e}), falling back to torch")
+        
         try:
             trust_remote = os.getenv("TRUST_REMOTE_CODE", "false").lower() == "true"
             self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=trust_remote)
             self.model = AutoModel.from_pretrained(model_name, trust_remote_code=trust_remote)
             self.model.eval()
             
-            self.device = torch.device("cpu")
             self.model.to(self.device)
             
             print(f"✅ Model loaded on {self.device}")
@@ -38,6 +54,19 @@ class StableEmbeddingModel:
             print(f"❌ Model loading failed: {e}")
             raise
 
+    def _load_onnx(self):
+        """Load the quantized ONNX export (tokenizer is saved alongside it)"""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(EMBED_ONNX_PATH)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            EMBED_ONNX_PATH,
+            file_name=EMBED_ONNX_FILE,
+            provider="CPUExecutionProvider"
+        )
+        self.backend = "onnx_int8"
+        print(f"✅ Model loaded via onnxruntime int8 ({EMBED_ONNX_PATH})")
+
     
     def encode(self, sentences: Union[str, List[str]]) -> np.ndarray:
         """Encode sentences to embeddings"""
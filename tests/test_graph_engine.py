@@ -177,6 +177,128 @@ class TestGraphCache:
         assert cache[1][1] == (3, 0.6, 'entity')
 
 
+    def test_graph_cache_arrays(self):
+        """GraphCache keeps CSR neighbor/weight/type arrays plus pending adds"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([
+            {"source_id": 1, "target_id": 2, "weight": 0.5, "edge_type": "semantic"},
+            {"source_id": 3, "target_id": 1, "weight": 0.25, "edge_type": "entity"},
+        ])
+        ids, weights, types = cache.get_neighbor_arrays(1)
+        assert ids.dtype == np.int32 and weights.dtype == np.float32 and types.dtype == np.uint8
+        assert cache.get_neighbors(1) == [(2, 0.5, 'semantic'), (3, 0.25, 'entity')]
+        assert cache.get_neighbors(2) == [(1, 0.5, 'semantic')]
+        assert cache.get_neighbors(99) == []
+
+        cache.add_edge(1, 4, weight=0.75, edge_type="NEXT_CHUNK")
+        assert cache.get_neighbors(1)[-1] == (4, 0.75, 'NEXT_CHUNK')
+        assert cache.get_neighbors(4) == [(1, 0.75, 'NEXT_CHUNK')]
+        assert cache.get_stats()["edge_count"] == 3
+        assert cache.get_stats()["node_count"] == 4
+
+        before = {n: cache.get_neighbors(n) for n in (1, 2, 3, 4)}
+        cache.compact()
+        assert cache.indptr[-1] == 6 and 4 in cache.row_of
+        assert {n: cache.get_neighbors(n) for n in (1, 2, 3, 4)} == before
+
+
+    def test_graph_cache_spread(self):
+        """spread() sums weighted neighbor activation per CSR row"""
+        from graph_cache import GraphCache
+        import graph_cache_kernels
+        cache = GraphCache()
+        cache.build([
+            {"source_id": 10, "target_id": 20, "weight": 0.5, "edge_type": "semantic"},
+            {"source_id": 20, "target_id": 30, "weight": 0.25, "edge_type": "semantic"},
+        ])
+        cache.add_edge(10, 30, weight=1.0)
+        activation = np.zeros(len(cache.node_ids), dtype=np.float32)
+        activation[cache.row_of[10]] = 1.0
+        out = cache.spread(activation, 0.5)
+        assert cache._pending  # pending edges are scattered, not compacted per call
+        assert out[cache.row_of[10]] == 0.0
+        assert out[cache.row_of[20]] == pytest.approx(0.25)
+        assert out[cache.row_of[30]] == pytest.approx(0.5)
+        cache.compact()
+        fallback = graph_cache_kernels._spread_numpy
+        expected = np.empty_like(out)
+        fallback(cache.indptr, cache.neighbor_rows, cache.weights, activation, expected, 0.5)
+        assert np.allclose(out, expected)
+
+
+    def test_graph_cache_spread_edge_scale(self):
+        """edge_scale multiplies the weight of matching edge types only"""
+        from graph_cache import GraphCache
+        cache = GraphCache()
+        cache.build([
+            {"source_id": 1, "target_id": 2, "weight": 0.4, "edge_type": "TEMPORAL_BEFORE"},
+            {"source_id": 1, "target_id": 3, "weight": 0.4, "edge_type": "semantic"},
+        ])
+        activation = np.zeros(len(cache.node_ids))
+        activation[cache.row_of[1]] = 1.0
+        out = cache.spread(activation, 1.0, edge_scale={"TEMPORAL_BEFORE": 1.5, "unknown": 9.0})
+        assert out[cache.row_of[2]] == pytest.approx(0.6)
+        assert out[cache.row_of[3]] == pytest.approx(0.4)
+        with pytest.raises(ValueError):
+            cache.spread(activation[:2], 1.0)
+
+
+    def test_graph_cache_spread_active_rows(self, monkeypatch):
+        """Walking only active rows gives the same result as the full pass"""
+        import graph_cache
+        rng = np.random.default_rng(0)
+        cache = graph_cache.GraphCache()
+        cache.build([{"source_id": int(a), "target_id": int(b), "weight": float(w),
+                      "edge_type": "semantic" if w > 0.5 else "TEMPORAL_AFTER"}
+                     for a, b, w in zip(rng.integers(0, 50, 200), rng.integers(0, 50, 200), rng.random(200))])
+        activation = np.zeros(len(cache.node_ids))
+        activation[[1, 7, 20]] = [1.0, 0.5, 0.25]
+        scale = {"TEMPORAL_AFTER": 1.5}
+        monkeypatch.setattr(graph_cache, 'GRAPH_CACHE_SPARSE_SPREAD', 1.0)
+        sparse = cache.spread(activation, 0.7, edge_scale=scale)
+        monkeypatch.setattr(graph_cache, 'GRAPH_CACHE_SPARSE_SPREAD', 0.0)
+        dense = cache.spread(activation, 0.7, edge_scale=scale)
+        assert np.allclose(sparse, dense)
+
+
+    def test_spread_activation_with_pending_edges(self):
+        """Pending edges (including new nodes) spread like compacted ones, without compacting"""
+        from graph_cache import GraphCache
+        from graph_engine import spread_activation
+        edges = [{"source_id": 1, "target_id": 2, "weight": 0.5, "edge_type": "semantic"},
+                 {"source_id": 2, "target_id": 3, "weight": 0.8, "edge_type": "TEMPORAL_AFTER"}]
+        cache = GraphCache()
+        cache.build(edges)
+        cache.add_edge(1, 4, weight=0.9, edge_type="entity")
+        cache.add_edge(4, 5, weight=0.7, edge_type="TEMPORAL_BEFORE")
+        seeds = {1: 1.0, 9: 0.5}
+        got = spread_activation(cache, dict(seeds), 3, 0.7, query_is_temporal=True)
+        assert cache._pending and 4 not in cache.row_of
+
+        compacted = GraphCache()
+        compacted.build(edges + [
+            {"source_id": 1, "target_id": 4, "weight": 0.9, "edge_type": "entity"},
+            {"source_id": 4, "target_id": 5, "weight": 0.7, "edge_type": "TEMPORAL_BEFORE"}])
+        expected = spread_activation(compacted, dict(seeds), 3, 0.7, query_is_temporal=True)
+        assert got.keys() == expected.keys() and 5 in got
+        assert all(got[n] == pytest.approx(expected[n]) for n in expected)
+
+        subgraph = spread_activation(cache, dict(seeds), 3, 0.7, subgraph_nodes={1, 4})
+        assert 5 not in subgraph and 4 in subgraph
+
+
+    def test_graph_cache_float16_weights(self, monkeypatch):
+        """GRAPH_CACHE_WEIGHT_DTYPE=float16 halves weight storage and still spreads"""
+        import graph_cache
+        monkeypatch.setattr(graph_cache, 'GRAPH_CACHE_WEIGHT_DTYPE', np.dtype(np.float16))
+        cache = graph_cache.GraphCache()
+        cache.build([{"source_id": 1, "target_id": 2, "weight": 0.6, "edge_type": "entity"}])
+        assert cache.weights.dtype == np.float16
+        out = cache.spread(np.array([1.0, 0.0], dtype=np.float32), 1.0)
+        assert out[cache.row_of[2]] == pytest.approx(0.6, abs=1e-3)
+
+
 class TestANNIndex:
     """Test ANN index functionality"""
 
@@ -204,6 +326,35 @@ class TestANNIndex:
         actual_k = min(10, index_size)
         assert actual_k == 0
 
+    @pytest.mark.parametrize("trained", [False, True])
+    def test_faiss_readd_replaces_existing_id(self, trained, monkeypatch):
+        """Re-adding an id replaces its vector instead of duplicating it"""
+        pytest.importorskip("faiss")
+        ann_index = pytest.importorskip("ann_index")
+        if trained:
+            monkeypatch.setattr(ann_index, "FAISS_IVF_NLIST", 4)
+            monkeypatch.setattr(ann_index, "FAISS_MIN_TRAIN", 256)
+            monkeypatch.setattr(ann_index, "FAISS_NPROBE", 4)
+        rng = np.random.default_rng(0)
+        n = 300 if trained else 2
+        vecs = rng.standard_normal((n, 8)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        idx = ann_index.FaissIVFPQIndex("ip", 8)
+        idx.add_items(vecs, list(range(1, n + 1)))
+        assert idx.is_trained == trained
+
+        replacement = -vecs[0:1]
+        idx.add_items(replacement, [1])
+
+        assert idx.get_current_count() == n
+        ids = idx.get_ids_list()
+        assert len(ids) == len(set(ids)) == n
+        labels, _ = idx.knn_query(replacement, k=min(n, 10))
+        assert list(labels[0]).count(1) == 1
+        assert labels[0][0] == 1
+        labels, _ = idx.knn_query(vecs[0:1], k=min(n, 10))
+        assert labels[0][0] != 1
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Unit tests for graph_metrics.py - PageRank and community detection
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+nx = pytest.importorskip("networkx")
+
+
+def _sample_graph():
+    node_ids = [10, 20, 30, 40, 50, 60]
+    edges = [(10, 20, 0.5), (20, 30, 0.7), (30, 10, 0.2), (10, 30, 0.9),
+             (40, 10, 0.3), (50, 70, 0.4), (20, 30, 0.1)]  # 70 unknown, (20, 30) repeated
+    return edges, node_ids
+
+
+class TestPageRank:
+    """Sparse power-iteration PageRank"""
+
+    def test_matches_networkx(self):
+        """Same scores (to float32 precision) and node order as networkx.pagerank on a DiGraph"""
+        from graph_metrics import GraphMetrics
+        edges, node_ids = _sample_graph()
+        G = nx.DiGraph()
+        G.add_nodes_from(node_ids)
+        for src, tgt, w in edges:
+            G.add_edge(src, tgt, weight=w)
+        expected = nx.pagerank(G, weight='weight', max_iter=500, alpha=0.85, tol=1e-4)
+        top = max(expected.values())
+
+        metrics = GraphMetrics()
+        metrics.compute(edges, node_ids)
+        assert metrics._pr_ids.tolist() == list(expected)
+        for nid, score in expected.items():
+            assert metrics.get_pagerank(nid) == pytest.approx(score / top, abs=1e-6)  # float32
+
+    def test_iterable_edges(self):
+        """Generators (with or without n_edges) give the same scores as a list"""
+        from graph_metrics import GraphMetrics
+        edges, node_ids = _sample_graph()
+        expected = GraphMetrics()
+        expected.compute(edges, node_ids)
+        for n_edges in (None, len(edges)):
+            metrics = GraphMetrics()
+            metrics.compute((e for e in edges), node_ids, n_edges=n_edges)
+            assert metrics._pr_ids.tolist() == expected._pr_ids.tolist()
+            assert metrics._pr.tolist() == expected._pr.tolist()
+
+    def test_no_edges_uniform(self):
+        from graph_metrics import GraphMetrics
+        metrics = GraphMetrics()
+        metrics.compute([], [1, 2, 3])
+        assert [metrics.get_pagerank(n) for n in (1, 2, 3)] == [1.0, 1.0, 1.0]
+        assert metrics.get_pagerank_boost_batch([3, 99]).tolist() == [metrics.get_pagerank_boost(3), 1.0]
+        assert metrics.get_community(1) == -1
+
+    def test_update_matches_full_compute(self):
+        """update() with an edge delta lands on the same scores as compute()"""
+        from graph_metrics import GraphMetrics
+        edges, node_ids = _sample_graph()
+        metrics = GraphMetrics()
+        metrics.compute(edges, node_ids)
+        added, removed = [(60, 10, 0.8), (80, 20, 0.5)], [(10, 30)]
+        assert metrics.update(added, removed)
+
+        final_edges = [e for e in edges if e[:2] != (10, 30)] + added
+        full = GraphMetrics()
+        full.compute(final_edges, node_ids)
+        assert set(metrics._pr_ids.tolist()) == set(full._pr_ids.tolist())
+        for nid in full._pr_ids.tolist():
+            assert metrics.get_pagerank(nid) == pytest.approx(full.get_pagerank(nid), abs=1e-3)
+
+    def test_update_without_compute(self):
+        from graph_metrics import GraphMetrics
+        assert GraphMetrics().update([(1, 2, 0.5)]) is False
+
+
+class TestCommunities:
+    """Community detection on the largest component"""
+
+    @pytest.mark.parametrize("algorithm", ["greedy", "louvain"])
+    def test_two_cliques(self, monkeypatch, algorithm):
+        import graph_metrics
+        monkeypatch.setattr(graph_metrics, "COMMUNITY_ALGORITHM", algorithm)
+        monkeypatch.setattr(graph_metrics, "COMMUNITY_RESOLUTION", 1.0)
+        left, right = [1, 2, 3, 4, 5], [6, 7, 8, 9, 10]
+        edges = [(a, b, 1.0) for group in (left, right) for a in group for b in group if a < b]
+        edges.append((5, 6, 0.1))
+        metrics = graph_metrics.GraphMetrics()
+        metrics.compute(edges, left + right + [11])
+        assert len({metrics.get_community(n) for n in left}) == 1
+        assert len({metrics.get_community(n) for n in right}) == 1
+        assert metrics.get_community(1) != metrics.get_community(10)
+        assert metrics.get_community(11) == -1
+
+    def test_capped_component_votes(self, monkeypatch):
+        """Nodes left out of the sample join their neighbors' community"""
+        import graph_metrics
+        monkeypatch.setattr(graph_metrics, "COMMUNITY_RESOLUTION", 1.0)
+        monkeypatch.setattr(graph_metrics, "COMMUNITY_MAX_NODES", 10)
+        left, right = [1, 2, 3, 4, 5], [6, 7, 8, 9, 10]
+        edges = [(a, b, 1.0) for group in (left, right) for a in group for b in group if a < b]
+        edges += [(5, 6, 0.1), (11, 1, 0.2), (12, 11, 0.2)]
+        metrics = graph_metrics.GraphMetrics()
+        metrics.compute(edges, left + right + [11, 12])
+        assert metrics.get_community(11) == metrics.get_community(12) == metrics.get_community(1)
+        assert metrics.get_community(1) != metrics.get_community(10)
+        assert sum(metrics._community_sizes.values()) == 12
+
+
+class TestMetricsCache:
+    """GRAPH_METRICS_CACHE_DIR memoization"""
+
+    def test_identical_graph_loads_from_cache(self, monkeypatch, tmp_path):
+        import graph_metrics
+        monkeypatch.setattr(graph_metrics, "GRAPH_METRICS_CACHE_DIR", str(tmp_path))
+        left, right = [1, 2, 3, 4, 5], [6, 7, 8, 9, 10]
+        edges = [(a, b, 1.0) for group in (left, right) for a in group for b in group if a < b]
+        edges.append((5, 6, 0.1))
+        first = graph_metrics.GraphMetrics()
+        first.compute(edges, left + right)
+        assert len(list(tmp_path.glob("graph-metrics-*.npz"))) == 1
+
+        def fail(*args):
+            raise AssertionError("community detection should not run on a cache hit")
+        monkeypatch.setattr(graph_metrics, "_local_communities", fail)
+        second = graph_metrics.GraphMetrics()
+        second.compute(edges, left + right)
+        assert second._pr.tolist() == first._pr.tolist()
+        assert second._comm.tolist() == first._comm.tolist()
+        assert second._community_sizes == first._community_sizes
+        assert second.update([(10, 1, 0.5)])
+
+    def test_changed_graph_replaces_entry(self, monkeypatch, tmp_path):
+        import graph_metrics
+        monkeypatch.setattr(graph_metrics, "GRAPH_METRICS_CACHE_DIR", str(tmp_path))
+        edges, node_ids = _sample_graph()
+        graph_metrics.GraphMetrics().compute(edges, node_ids)
+        before = list(tmp_path.glob("graph-metrics-*.npz"))
+        graph_metrics.GraphMetrics().compute(edges[:-1], node_ids)
+        after = list(tmp_path.glob("graph-metrics-*.npz"))
+        assert len(after) == 1 and after != before
+
+
+class TestRecomputeAsync:
+    """Background recompute with swap-in on completion"""
+
+    def test_swaps_in_new_scores(self):
+        from graph_metrics import GraphMetrics
+        edges, node_ids = _sample_graph()
+        metrics = GraphMetrics()
+        metrics.compute([], node_ids)
+        expected = GraphMetrics()
+        expected.compute(edges, node_ids)
+
+        metrics.recompute_async(edges, node_ids).join()
+        assert metrics._pr_ids.tolist() == expected._pr_ids.tolist()
+        assert metrics._pr.tolist() == expected._pr.tolist()
+        assert metrics._comm.tolist() == expected._comm.tolist()
+
+    def test_latest_request_wins(self):
+        from graph_metrics import GraphMetrics
+        edges, node_ids = _sample_graph()
+        metrics = GraphMetrics()
+        first = metrics.recompute_async(edges, node_ids)
+        second = metrics.recompute_async([], [1, 2])
+        first.join()
+        second.join()
+        assert metrics._pr_ids.tolist() == [1, 2]
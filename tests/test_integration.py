@@ -8,6 +8,7 @@ import sqlite3
 import tempfile
 import os
 import sys
+from collections import namedtuple
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
@@ -56,6 +57,72 @@ class TestDatabaseOperations:
         assert node['content'] == "Test content"
         assert node['category'] == "test-cat"
 
+    def test_embedding_array_stored_as_float32_blob(self):
+        """numpy embeddings are stored unit length as float32 and read back with frombuffer"""
+        import numpy as np
+        vec = np.linspace(0, 1, 8)  # float64 in, float32 stored
+        unit = vec / np.linalg.norm(vec)
+        node_id = self.db.create_node("Vec node", "test", embedding=vec)
+        stored = np.frombuffer(self.db.get_node(node_id)['embedding'], dtype=np.float32)
+        assert np.allclose(stored, unit)
+        self.db.update_node(node_id, embedding=vec[::-1])
+        stored = np.frombuffer(self.db.get_node(node_id)['embedding'], dtype=np.float32)
+        assert np.allclose(stored, unit[::-1])
+
+    def test_embedding_matrix_tracks_nodes(self):
+        """embedding_store appends new notes and rebuilds after deletes/rewrites"""
+        import numpy as np
+        import embedding_store
+        vecs = np.eye(4, dtype=np.float32)
+        a = self.db.create_node("a", "test", embedding=vecs[0])
+        b = self.db.create_node("b", "test", embedding=vecs[1])
+        ids, matrix = embedding_store.get_embedding_matrix(4)
+        assert ids.tolist() == [a, b] and np.allclose(matrix, vecs[:2])
+        c = self.db.create_node("c", "test", embedding=vecs[2])
+        self.db.create_node("no embedding", "test")
+        ids, sims = embedding_store.embedding_similarities(vecs[2])
+        assert ids.tolist() == [a, b, c] and np.allclose(sims, [0, 0, 1])
+        self.db.delete_node(a)
+        self.db.update_node(b, embedding=vecs[3])
+        ids, matrix = embedding_store.get_embedding_matrix(4)
+        assert ids.tolist() == [b, c] and np.allclose(matrix, vecs[[3, 2]])
+
+    def test_embedding_matrix_normalizes_raw_rows(self):
+        """Rows written outside database.py are rescaled to unit length on append"""
+        import numpy as np
+        import embedding_store
+        a = self.db.create_node("a", "test", embedding=np.eye(4, dtype=np.float32)[0])
+        embedding_store.get_embedding_matrix(4)
+        raw = sqlite3.connect(self.db_path)
+        raw.execute("INSERT INTO nodes (content, category, embedding) VALUES ('raw', 'test', ?)",
+                    (np.array([0, 3, 4, 0], dtype=np.float32).tobytes(),))
+        raw.commit()
+        raw.close()
+        ids, sims = embedding_store.embedding_similarities(np.array([0, 0.6, 0.8, 0], dtype=np.float32))
+        assert len(ids) == 2 and ids[0] == a
+        assert np.allclose(sims, [0, 1])
+
+    def test_raw_bytes_embedding_stored_unit_length(self):
+        """Embeddings passed as raw float32 bytes are normalized before storage"""
+        import numpy as np
+        node_id = self.db.create_node("a", "test")
+        self.db.update_node(node_id, embedding=np.array([0, 3, 4, 0], dtype=np.float32).tobytes())
+        stored = np.frombuffer(self.db.get_node(node_id)["embedding"], dtype=np.float32)
+        assert np.linalg.norm(stored) == pytest.approx(1.0)
+        assert np.allclose(stored, [0, 0.6, 0.8, 0])
+
+    def test_get_nodes_by_ids(self):
+        """get_nodes_by_ids fetches only the requested rows and columns"""
+        a = self.db.create_node("a", "test")
+        b = self.db.create_node("b", "other")
+        nodes = self.db.get_nodes_by_ids([b, a, b, 10**9])
+        assert set(nodes) == {a, b}
+        assert nodes[b]["category"] == "other" and "embedding" not in nodes[b]
+        assert self.db.get_nodes_by_ids([a], columns=("content",)) == {a: {"id": a, "content": "a"}}
+        assert self.db.get_nodes_by_ids([]) == {}
+        Row = namedtuple("Row", "id category")
+        assert self.db.get_nodes_by_ids([b], row_type=Row) == {b: Row(b, "other")}
+
     def test_entity_counts_batch(self):
         """get_entity_counts_batch returns correct counts"""
         node_id = self.db.create_node("Test node", "test")
@@ -65,6 +132,30 @@ class TestDatabaseOperations:
         self.db.link_node_to_entity(node_id, eid2)
         counts = self.db.get_entity_counts_batch()
         assert counts.get(node_id) == 2
+        assert self.db.get_entity_counts_batch() is counts  # cached until the next write
+        self.db.link_node_to_entity(node_id, self.db.get_or_create_entity("Rust", "tech"))
+        assert self.db.get_entity_counts_batch().get(node_id) == 3
+
+    def test_invalidate_caches_after_raw_writes(self):
+        """Writes through another connection show up after invalidate_caches()"""
+        n1 = self.db.create_node("Node 1", "test")
+        n2 = self.db.create_node("Node 2", "test")
+        self.db.create_edge(n1, n2, weight=0.5)
+        self.db.link_node_to_entity(n2, self.db.get_or_create_entity("Python", "tech"))
+        assert [r["id"] for r in self.db.get_connected_nodes(n1)] == [n2]
+        nodes_before = self.db.get_stats()["total_nodes"]
+        assert self.db.get_entity_counts_batch().get(n2) == 1
+        raw = sqlite3.connect(self.db_path)
+        raw.execute("PRAGMA foreign_keys = ON")
+        raw.execute("DELETE FROM edges")
+        raw.execute("DELETE FROM node_entities")
+        raw.execute("DELETE FROM nodes WHERE id = ?", (n2,))
+        raw.commit()
+        raw.close()
+        self.db.invalidate_caches()
+        assert self.db.get_connected_nodes(n1) == []
+        assert self.db.get_stats()["total_nodes"] == nodes_before - 1
+        assert self.db.get_entity_counts_batch().get(n2) is None
 
     def test_create_edge_bidirectional(self):
         """Edges stored — connected nodes retrievable"""
@@ -75,6 +166,152 @@ class TestDatabaseOperations:
         neighbors = self.db.get_connected_nodes(n1)
         neighbor_ids = [n['id'] for n in neighbors]
         assert n2 in neighbor_ids
+        assert set(neighbors[0]) == {"id", "content", "category", "importance", "weight", "edge_type"}
+
+    def test_duplicate_edge_and_link_upsert(self):
+        """Duplicate edge keeps max weight; duplicate entity link returns False"""
+        n1 = self.db.create_node("Node 1", "test")
+        n2 = self.db.create_node("Node 2", "test")
+        eid = self.db.create_edge(n1, n2, weight=0.4, edge_type="semantic")
+        assert self.db.create_edge(n1, n2, weight=0.9, edge_type="semantic") == eid
+        assert self.db.create_edge(n1, n2, weight=0.2, edge_type="semantic") == eid
+        conn = sqlite3.connect(self.db_path)
+        weights = conn.execute("SELECT weight FROM edges WHERE id = ?", (eid,)).fetchall()
+        conn.close()
+        assert weights == [(0.9,)]
+        ent = self.db.get_or_create_entity("Python", "tech")
+        assert self.db.link_node_to_entity(n1, ent) is True
+        assert self.db.link_node_to_entity(n1, ent) is False
+
+    def test_bulk_inserts(self):
+        """Bulk node/edge/link inserts return ids and counts in one transaction"""
+        ids = self.db.create_nodes_bulk([{"content": f"Bulk {i}", "category": "test"} for i in range(5)])
+        assert len(ids) == 5
+        assert [self.db.get_node(i)['content'] for i in ids] == [f"Bulk {i}" for i in range(5)]
+        assert self.db.create_edges_bulk([(ids[0], ids[1], 0.5, "semantic"),
+                                          (ids[0], ids[1], 0.8, "semantic")]) == 2
+        assert [n['weight'] for n in self.db.get_connected_nodes(ids[0])] == [0.8]
+        ent = self.db.get_or_create_entity("Python", "tech")
+        assert self.db.link_node_to_entity_bulk([(i, ent) for i in ids] + [(ids[0], ent)]) == 5
+
+    def test_stats_cache_invalidated_on_write(self):
+        """get_stats is served from cache until a write changes rows"""
+        before = self.db.get_stats()
+        assert self.db.get_stats() == before
+        self.db.create_node("Stats node", "stats-cat")
+        after = self.db.get_stats()
+        assert after["total_nodes"] == before["total_nodes"] + 1
+        assert after["nodes_by_category"]["stats-cat"] == 1
+
+    def test_neighbor_cache_invalidation(self):
+        """Cached neighbour lists follow new edges, node updates and deletes"""
+        n1 = self.db.create_node("Node 1", "test")
+        n2 = self.db.create_node("Node 2", "test")
+        n3 = self.db.create_node("Node 3", "test")
+        self.db.create_edge(n1, n2, weight=0.5)
+        assert [n['id'] for n in self.db.get_connected_nodes(n1)] == [n2]
+        self.db.create_edge(n3, n1, weight=0.5)
+        assert sorted(n['id'] for n in self.db.get_connected_nodes(n1)) == [n2, n3]
+        self.db.set_importance(n2, "critical")
+        assert {n['id']: n['importance'] for n in self.db.get_connected_nodes(n1)}[n2] == "critical"
+        assert self.db.delete_node(n3) == {"content": "Node 3", "category": "test"}
+        assert self.db.delete_node(n3) is None
+        assert [n['id'] for n in self.db.get_connected_nodes(n1)] == [n2]
+
+    def test_nodes_column_order_migration(self):
+        """Old column order is rebuilt with embedding last; edges and ids survive"""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE nodes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL,
+            category TEXT DEFAULT 'general', timestamp TEXT, embedding BLOB,
+            last_accessed TEXT, access_count INTEGER DEFAULT 0,
+            importance TEXT DEFAULT 'normal', emotional_tone TEXT,
+            emotional_intensity INTEGER DEFAULT 5, emotional_reflection TEXT,
+            t_event_start TEXT, t_event_end TEXT, temporal_expressions TEXT, tags TEXT)""")
+        conn.execute("""CREATE TABLE edges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, source_id INTEGER NOT NULL,
+            target_id INTEGER NOT NULL, weight REAL DEFAULT 0.5,
+            edge_type TEXT DEFAULT 'semantic', created_at TEXT,
+            FOREIGN KEY (source_id) REFERENCES nodes(id) ON DELETE CASCADE,
+            FOREIGN KEY (target_id) REFERENCES nodes(id) ON DELETE CASCADE,
+            UNIQUE(source_id, target_id, edge_type))""")
+        conn.executemany("INSERT INTO nodes (content) VALUES (?)", [("a",), ("b",), ("c",)])
+        conn.execute("DELETE FROM nodes WHERE id = 3")
+        conn.execute("INSERT INTO edges (source_id, target_id) VALUES (1, 2)")
+        conn.commit()
+        conn.close()
+
+        orig = self.db.DB_PATH
+        self.db.DB_PATH = path
+        try:
+            self.db.init_database()
+            conn = sqlite3.connect(path)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(nodes)")]
+            edges = conn.execute("SELECT source_id, target_id FROM edges").fetchall()
+            conn.close()
+            assert columns == [name for name, _ in self.db.NODES_COLUMNS]
+            assert edges == [(1, 2)]
+            assert self.db.create_node("d") == 4
+        finally:
+            self.db.DB_PATH = orig
+            os.unlink(path)
+
+    def test_iter_nodes_projection(self):
+        """iter_nodes streams without embeddings by default; bad columns rejected"""
+        import numpy as np
+        self.db.create_node("Iter node", "test", embedding=np.ones(4))
+        rows = list(self.db.iter_nodes())
+        assert rows and "embedding" not in rows[0] and rows[0]["content"] == "Iter node"
+        assert list(self.db.iter_nodes(["id", "category"])) == [{"id": rows[0]["id"], "category": "test"}]
+        assert self.db.get_all_nodes()[0]["embedding"] is not None
+        with pytest.raises(ValueError):
+            self.db.iter_nodes(["id; DROP TABLE nodes"])
+
+    def test_touch_node_write_behind(self):
+        """Touches are buffered and coalesced until flush_touches()"""
+        node_id = self.db.create_node("Touched", "test")
+        flush_ms, self.db.TOUCH_FLUSH_MS = self.db.TOUCH_FLUSH_MS, 60000
+        try:
+            for _ in range(3):
+                self.db.touch_node(node_id)
+            assert self.db.get_node(node_id)["access_count"] == 0
+            assert self.db.flush_touches() == 1
+        finally:
+            self.db.TOUCH_FLUSH_MS = flush_ms
+        node = self.db.get_node(node_id)
+        assert node["access_count"] == 3 and node["last_accessed"]
+
+    def test_entity_id_cache(self):
+        """Repeated lookups hit the cache; merged-away ids are evicted"""
+        a = self.db.get_or_create_entity("Python", "tech")
+        assert self.db.get_or_create_entity("python ", "tech") == a
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO entities (name, entity_type) VALUES ('docker', 'tech')")
+        conn.commit()
+        conn.close()
+        b = self.db.get_or_create_entity("Docker", "tech")
+        self.db.merge_entities(a, b)
+        assert self.db.get_or_create_entity("docker", "tech") not in (b, None)
+
+    def test_connection_pool_reuses_connections(self):
+        """Sequential calls reuse a pooled connection; nested calls get their own"""
+        with self.db.get_connection() as c1:
+            with self.db.get_connection() as nested:
+                assert nested is not c1
+        with self.db.get_connection() as c2:
+            assert c2 is c1 or c2 is nested
+
+    def test_read_write_split(self):
+        """Writer is re-entrant within a thread; read connections reject writes"""
+        import sqlite3
+        with self.db.write_connection() as w1:
+            with self.db.write_connection() as w2:
+                assert w2 is w1
+        with self.db.read_connection() as r:
+            with pytest.raises(sqlite3.OperationalError):
+                r.execute("INSERT INTO entities (name, entity_type) VALUES ('x', 'concept')")
 
 
 class TestModuleImports:
@@ -57,6 +57,15 @@ class TestMetricQueryDetection:
         assert is_temporal is True
         assert direction == 'after'
 
+    def test_order_scores_match_single_note_scores(self):
+        """Batch order scoring ranks each note against the whole set"""
+        from query_decomposer import compute_temporal_order_score, compute_temporal_order_scores
+        stamps = {1: '2026-01-01', 2: '2026-01-03', 3: '2026-01-02T12:00:00', 4: 'not a date'}
+        for direction in ('before', 'after', 'when'):
+            expected = {nid: compute_temporal_order_score(ts, direction, list(stamps.values()))
+                        for nid, ts in stamps.items()}
+            assert compute_temporal_order_scores(stamps, direction) == expected
+
 
 # ─────────────────────────────────────────────
 # Late Stage Inhibition (commit 46360a0)
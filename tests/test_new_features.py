@@ -179,6 +179,69 @@ class TestCJKDetection:
         from entity_extractor import detect_language
         assert detect_language('') == 'en'
 
+    def test_long_text_vectorized_path(self):
+        from entity_extractor import detect_language, _count_scripts
+        text = 'Память и граф знаний, hippograph memory. ' * 4
+        assert len(text) >= 64
+        assert detect_language(text) == 'xx'
+        assert _count_scripts(text) == (17 * 4, 16 * 4)
+
+    def test_detection_uses_cached_prefix(self):
+        from entity_extractor import detect_language, LANG_DETECT_PREFIX, _detect_language_cached
+        text = 'a' * LANG_DETECT_PREFIX + 'машинное обучение' * 50
+        assert detect_language(text) == 'en'
+        hits = _detect_language_cached.cache_info().hits
+        assert detect_language(text) == 'en'
+        assert _detect_language_cached.cache_info().hits == hits + 1
+
+
+class TestKnownEntityMatching:
+
+    def test_regex_path_matches_substrings_in_dict_order(self):
+        from entity_extractor import extract_entities_regex
+        result = extract_entities_regex('SQLite beats Postgres, said the Python dev')
+        assert [e[0] for e in result] == ['Python', 'SQLite', 'PostgreSQL']
+
+    def test_synonymous_keys_deduplicated(self):
+        from entity_extractor import extract_entities_regex
+        assert extract_entities_regex('cpp aka c++, postgres aka postgresql') == [
+            ('C++', 'tech', 1.0), ('PostgreSQL', 'tech', 1.0)]
+
+    def test_spacy_batch_keeps_input_order(self):
+        from entity_extractor import extract_entities_spacy_batch
+        results = extract_entities_spacy_batch(['Docker on Linux', 'Память в SQLite', ''])
+        assert len(results) == 3
+        assert ('Docker', 'tech', 1.0) in results[0]
+        assert ('SQLite', 'tech', 1.0) in results[1]
+
+    @staticmethod
+    def _no_spacy_ents(monkeypatch):
+        """Run extract_entities_spacy with a model that finds nothing itself,
+        so only the known-entity pass (short keys as whole words) contributes."""
+        import types
+        import entity_extractor
+        monkeypatch.setattr(entity_extractor, '_get_spacy_model',
+                            lambda lang: lambda text: types.SimpleNamespace(ents=[]))
+        monkeypatch.setattr(entity_extractor, '_spacy_cache', type(entity_extractor._spacy_cache)())
+        return entity_extractor
+
+    def test_short_keys_need_word_boundaries(self, monkeypatch):
+        entity_extractor = self._no_spacy_ents(monkeypatch)
+        assert ('RAG', 'concept', 1.0) in entity_extractor.extract_entities_regex('storage')
+        assert ('RAG', 'concept', 1.0) not in entity_extractor.extract_entities_spacy('storage')
+        assert ('C++', 'tech', 1.0) in entity_extractor.extract_entities_spacy('I write C++ daily')
+
+    def test_fallback_without_automaton(self, monkeypatch):
+        entity_extractor = self._no_spacy_ents(monkeypatch)
+        text = 'MCP server in Rust with Redis and LLMs'
+        expected = (entity_extractor.extract_entities_regex(text), entity_extractor.extract_entities_spacy(text))
+        assert expected[0] and expected[1]
+        monkeypatch.setattr(entity_extractor, 'ahocorasick', None)
+        monkeypatch.setattr(entity_extractor, '_known_automaton', None)
+        monkeypatch.setattr(entity_extractor, '_known_keys', None)
+        entity_extractor._spacy_cache.clear()
+        assert (entity_extractor.extract_entities_regex(text), entity_extractor.extract_entities_spacy(text)) == expected
+
 
 # ─────────────────────────────────────────────
 # .TemporaryItems filter (studio_list_dir fix)
@@ -616,3 +679,66 @@ class TestCommunityResolution:
         comms_low = greedy_modularity_communities(G, weight='weight', resolution=1.0)
         comms_high = greedy_modularity_communities(G, weight='weight', resolution=5.0)
         assert len(list(comms_high)) >= len(list(comms_low))
+
+
+# ─────────────────────────────────────────────
+# GLiNER2 relation output parsing
+# ─────────────────────────────────────────────
+
+class TestGliner2RelationParsing:
+
+    def test_parse_relations_filters_and_dedups(self):
+        from gliner2_client import _parse_relations
+        raw = {'relation_extraction': {
+            'uses': [
+                {'head': ' HippoGraph ', 'tail': 'FAISS', 'score': 0.9},
+                {'head': 'hippograph', 'tail': 'faiss', 'score': 0.8},
+                {'head': 'X', 'tail': 'FAISS', 'score': 0.9},
+                ('HippoGraph', 'SQLite', 0.1),
+            ],
+            'works_for': [('Claude', 'Anthropic')],
+            'part_of': [{'head': 'HippoGraph'}],
+            'meta': 'ignored',
+        }}
+        assert _parse_relations(raw, 0.3) == [
+            ('HippoGraph', 'uses', 'FAISS'),
+            ('Claude', 'works_for', 'Anthropic'),
+        ]
+
+
+    def test_batch_keeps_order_across_model_calls(self, monkeypatch):
+        import gliner2_client
+
+        class FakeModel:
+            def batch_extract_relations(self, texts, relations, batch_size):
+                assert len(texts) <= batch_size
+                return [{'uses': [{'head': t, 'tail': 'Python'}]} for t in texts]
+
+        monkeypatch.setattr(gliner2_client, '_model', FakeModel())
+        texts = ['Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon']
+        result = gliner2_client.extract_relations_batch(texts, batch_size=2)
+        assert result == [[(t, 'uses', 'Python')] for t in texts]
+
+
+class TestGlinerResultCache:
+
+    def test_repeated_text_served_from_cache(self):
+        import gliner_client
+
+        class FakeModel:
+            calls = 0
+
+            def predict_entities(self, text, labels, threshold):
+                FakeModel.calls += 1
+                return [{"text": " Docker ", "label": "technology", "score": 0.9},
+                        {"text": "docker", "label": "technology", "score": 0.7}]
+
+        gliner_client.reset_availability()
+        model = FakeModel()
+        first = gliner_client._predict(model, "ships Docker images", ["technology"], 0.4)
+        second = gliner_client._predict(model, "ships Docker images", ["technology"], 0.4)
+        assert first == second == [("Docker", "tech", 0.9)]
+        assert FakeModel.calls == 1
+        gliner_client._predict(model, "ships Docker images", ["technology"], 0.5)
+        assert FakeModel.calls == 2
+        gliner_client.reset_availability()
@@ -55,10 +55,11 @@ class TestTagsField:
             PRIMARY KEY (node_id, entity_id))""")
         conn.execute("""CREATE TABLE note_versions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            note_id INTEGER, version_number INTEGER,
+            note_id INTEGER, seq INTEGER, version_number INTEGER,
             content TEXT, category TEXT, importance TEXT,
             emotional_tone TEXT, emotional_intensity INTEGER,
-            emotional_reflection TEXT, created_at TEXT)""")
+            emotional_reflection TEXT, created_at TEXT,
+            UNIQUE(note_id, version_number))""")
         conn.commit()
         conn.close()
         return db
@@ -105,6 +106,146 @@ class TestTagsField:
         finally:
             database.DB_PATH = orig
 
+    def test_update_node_single_transaction(self, tmp_path):
+        """Version save + UPDATE share the caller's transaction and roll back together."""
+        import database
+        orig = database.DB_PATH
+        database.DB_PATH = self._make_db(tmp_path)
+        try:
+            node_id = database.create_node(content='v1')
+            with pytest.raises(RuntimeError):
+                with database.write_connection() as conn:
+                    database.update_node(node_id, content='v2', conn=conn)
+                    raise RuntimeError('abort')
+            assert database.get_node(node_id)['content'] == 'v1'
+            assert database.get_version_count(node_id) == 0
+
+            database.update_node(node_id, content='v2')
+            assert database.get_node(node_id)['content'] == 'v2'
+            assert database.get_version_count(node_id) == 1
+        finally:
+            database.DB_PATH = orig
+
+    def test_embeddings_version(self, tmp_path):
+        """Version token changes on insert and embedding rewrite, not on tag edits."""
+        import database
+        orig = database.DB_PATH
+        database.DB_PATH = self._make_db(tmp_path)
+        try:
+            node_id = database.create_node(content='a', embedding=np.ones(4, dtype=np.float32))
+            v1 = database.get_embeddings_version()
+            database.update_node(node_id, tags='x')
+            assert database.get_embeddings_version() == v1
+            database.update_node(node_id, embedding=np.zeros(4, dtype=np.float32))
+            v2 = database.get_embeddings_version()
+            assert v2 != v1
+            database.create_node(content='b')
+            assert database.get_embeddings_version() != v2
+        finally:
+            database.DB_PATH = orig
+
+    def test_embeddings_stored_unit_length(self, tmp_path):
+        """create_node stores unit vectors; the migration rescales raw rows."""
+        import database
+        orig = database.DB_PATH
+        database.DB_PATH = self._make_db(tmp_path)
+        try:
+            node_id = database.create_node(content='a', embedding=np.array([3.0, 4.0], dtype=np.float32))
+            stored = np.frombuffer(database.get_node(node_id)['embedding'], dtype=np.float32)
+            assert np.allclose(stored, [0.6, 0.8])
+
+            with database.write_connection() as conn:
+                conn.execute("UPDATE nodes SET embedding = ? WHERE id = ?",
+                             (np.array([0.0, 2.0], dtype=np.float32).tobytes(), node_id))
+            assert database.normalize_stored_embeddings() == 1
+            stored = np.frombuffer(database.get_node(node_id)['embedding'], dtype=np.float32)
+            assert np.allclose(stored, [0.0, 1.0])
+            assert database.normalize_stored_embeddings() == 0
+        finally:
+            database.DB_PATH = orig
+
+    def test_note_versions_ring(self, tmp_path):
+        """Versions reuse NOTE_VERSIONS_KEEP slots; history stays newest-first."""
+        import database
+        orig = database.DB_PATH
+        database.DB_PATH = self._make_db(tmp_path)
+        try:
+            node_id = database.create_node(content='v0')
+            for i in range(1, 8):
+                database.update_node(node_id, content=f'v{i}')
+            history = database.get_note_history(node_id)
+            assert database.get_version_count(node_id) == database.NOTE_VERSIONS_KEEP
+            assert [v['content'] for v in history] == ['v6', 'v5', 'v4', 'v3', 'v2']
+            assert sorted(v['version_number'] for v in history) == [1, 2, 3, 4, 5]
+            listed = database.list_note_versions(node_id)
+            assert [v['content_len'] for v in listed] == [2] * 5 and 'content' not in listed[0]
+            newest = database.get_note_version(node_id, listed[0]['version_number'])
+            assert newest['content'] == 'v6'
+            assert database.get_note_version(node_id, 99) is None
+        finally:
+            database.DB_PATH = orig
+
+    def test_note_versions_ring_clock_steps_back(self, tmp_path, monkeypatch):
+        """Slots follow the save sequence, not created_at, when the clock runs backwards."""
+        import database
+        from datetime import datetime, timedelta
+        start = datetime(2026, 10, 25, 3, 0)
+
+        class _BackwardsClock(datetime):
+            calls = 0
+
+            @classmethod
+            def now(cls, tz=None):
+                cls.calls += 1
+                return start - timedelta(minutes=cls.calls)
+
+        orig = database.DB_PATH
+        database.DB_PATH = self._make_db(tmp_path)
+        monkeypatch.setattr(database, 'datetime', _BackwardsClock)
+        try:
+            node_id = database.create_node(content='v0')
+            for i in range(1, 8):
+                database.update_node(node_id, content=f'v{i}')
+            history = database.get_note_history(node_id)
+            assert [v['content'] for v in history] == ['v6', 'v5', 'v4', 'v3', 'v2']
+            assert [v['version_number'] for v in history] == [2, 1, 5, 4, 3]
+            listed = database.list_note_versions(node_id)
+            assert [v['version_number'] for v in listed] == [2, 1, 5, 4, 3]
+        finally:
+            database.DB_PATH = orig
+
+    def test_note_versions_seq_migration(self, tmp_path):
+        """Ring tables without seq keep their save order after init_database."""
+        import database
+        db = self._make_db(tmp_path)
+        conn = sqlite3.connect(db)
+        conn.execute("DROP TABLE note_versions")
+        conn.execute("""CREATE TABLE note_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER, version_number INTEGER,
+            content TEXT, category TEXT, importance TEXT,
+            emotional_tone TEXT, emotional_intensity INTEGER,
+            emotional_reflection TEXT, created_at TEXT,
+            UNIQUE(note_id, version_number))""")
+        conn.execute("INSERT INTO nodes (id, content) VALUES (1, 'v7')")
+        # Ring after v0..v6: slots 1, 2 hold the newest lap (v5, v6)
+        for slot, (content, ts) in enumerate([('v5', '05'), ('v6', '06'), ('v2', '02'),
+                                              ('v3', '03'), ('v4', '04')], start=1):
+            conn.execute("INSERT INTO note_versions (note_id, version_number, content, created_at) "
+                         "VALUES (1, ?, ?, ?)", (slot, content, f'2026-01-01T00:00:{ts}'))
+        conn.commit()
+        conn.close()
+
+        orig = database.DB_PATH
+        database.DB_PATH = db
+        try:
+            database.init_database()
+            assert [v['content'] for v in database.get_note_history(1)] == ['v6', 'v5', 'v4', 'v3', 'v2']
+            assert database.save_note_version(1, 'v7', 'general', 'normal') == 3
+            assert [v['content'] for v in database.get_note_history(1)] == ['v7', 'v6', 'v5', 'v4', 'v3']
+        finally:
+            database.DB_PATH = orig
+
     def test_tags_migration(self, tmp_path):
         """init_database adds tags column to existing DB without it."""
         import database